@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the AI Media Empire analytics pipeline
+Generates synthetic datasets, runs every case in a fresh process against a copy
+of the dataset and records wall time and peak RSS of the measured part (setup
+excluded where the platform allows resetting the high-water mark) in a JSON file
+
+Usage:  python benchmarks/run_benchmarks.py                          # default matrix
+        python benchmarks/run_benchmarks.py --channels 10 100 1000 --months 1 12 60
+        python benchmarks/run_benchmarks.py --cases dashboard_full anomaly_detection
+        python benchmarks/run_benchmarks.py --compare benchmarks/results/a.json benchmarks/results/b.json
+"""
+
+import gc
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import resource
+import tempfile
+import subprocess
+import multiprocessing
+from queue import Empty
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+SCRIPTS_DIR = os.path.join(REPO_ROOT, 'scripts')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+sys.path.insert(0, BENCH_DIR)
+from synthetic import write_dataset
+
+# Snapshots written by the snapshot_save case (per source)
+SAVE_SNAPSHOTS = 50
+
+# Seconds one case may run before its process is killed
+CASE_TIMEOUT = 1800
+
+
+# --- Cases: each runs inside a fresh process whose cwd is a copy of the dataset,
+# --- does its untimed setup and returns the callable that is measured
+
+def case_load_csv():
+    from history_store import read_legacy_csv, LEGACY_CSV
+
+    def work():
+        for path in LEGACY_CSV.values():
+            read_legacy_csv(path)
+    return work
+
+
+def case_load_store():
+    from history_store import load_history, migrate
+    migrate()
+
+    def work():
+        load_history('youtube')
+        load_history('telegram')
+    return work
+
+
+def case_load_series():
+    from series_store import SeriesStore, import_history
+    from hourly_grid import HourlyGrid
+    for source in ['youtube', 'telegram']:
+        import_history(source)
+
+    def work():
+        # Map the files and resample them onto fresh grids (the dashboard's load phase)
+        for source in ['youtube', 'telegram']:
+            HourlyGrid.for_source(source).fold_arrays(*SeriesStore(source).arrays())
+    return work
+
+
+def case_dashboard_full():
+    from analytics_dashboard import AnalyticsDashboard
+
+    def work():
+        dashboard = AnalyticsDashboard(incremental=False)
+        dashboard.save_dashboard(dashboard.generate_dashboard())
+    return work
+
+
+def case_dashboard_full_series():
+    from analytics_dashboard import AnalyticsDashboard
+    from series_store import import_history
+    for source in ['youtube', 'telegram']:
+        import_history(source)
+
+    def work():
+        dashboard = AnalyticsDashboard(incremental=False)
+        dashboard.save_dashboard(dashboard.generate_dashboard())
+    return work
+
+
+def case_dashboard_incremental():
+    import pandas as pd
+    from analytics_dashboard import AnalyticsDashboard
+    from history_store import HistoryStore, load_history, migrate
+
+    # Persist state from a full run, then add one collection run on top
+    migrate()
+    AnalyticsDashboard(incremental=False).save_state()
+    history = load_history('youtube')
+    last_run = history.groupby('channel_id').tail(1).copy()
+    last_run['timestamp'] = last_run['timestamp'] + pd.Timedelta(hours=1)
+    last_run['subscribers'] += 1
+    HistoryStore('youtube').append(last_run)
+    del history, last_run
+
+    def work():
+        dashboard = AnalyticsDashboard(incremental=True)
+        dashboard.save_dashboard(dashboard.generate_dashboard())
+        dashboard.save_state()
+    return work
+
+
+def case_report_youtube():
+    from generate_report import generate_report
+    return generate_report
+
+
+def case_report_combined():
+    from generate_combined_report import generate_report
+    return generate_report
+
+
+def case_anomaly_detection():
+    from history_store import load_history
+    from hourly_grid import build_grid
+    from analytics_engine import compute_grid_metrics
+    from engine_state import EngineState
+    grids = {source: build_grid(source, load_history(source)) for source in ['youtube', 'telegram']}
+    # Folded once, like the persisted state an hourly run starts from
+    engines = {source: EngineState.for_source(source) for source in grids}
+    for source, grid in grids.items():
+        engines[source].update(grid)
+
+    def work():
+        for source, grid in grids.items():
+            engine = engines[source]
+            engine.update(grid)
+            compute_grid_metrics(grid.keys, **engine.series(grid, 'subscribers', None))
+    return work
+
+
+def _save_snapshots(mode):
+    import snapshot_archive
+    snapshot_archive.SNAPSHOT_MODE = mode
+
+    payloads = {}
+    for source, path in [('youtube', 'data/latest.json'), ('telegram', 'data/telegram_latest.json')]:
+        with open(path, 'r', encoding='utf-8') as f:
+            payloads[source] = json.load(f)
+
+    def work():
+        base = datetime(2030, 1, 1)
+        for i in range(SAVE_SNAPSHOTS):
+            for source, payload in payloads.items():
+                snapshot_archive.write_snapshot(source, payload, base.replace(day=1 + i // 24, hour=i % 24))
+    return work
+
+
+def case_snapshot_save_files():
+    return _save_snapshots('files')
+
+
+def case_snapshot_save_archive():
+    return _save_snapshots('archive')
+
+
+CASES = {
+    'load_csv': case_load_csv,
+    'load_store': case_load_store,
+    'load_series': case_load_series,
+    'dashboard_full': case_dashboard_full,
+    'dashboard_full_series': case_dashboard_full_series,
+    'dashboard_incremental': case_dashboard_incremental,
+    'report_youtube': case_report_youtube,
+    'report_combined': case_report_combined,
+    'anomaly_detection': case_anomaly_detection,
+    'snapshot_save_files': case_snapshot_save_files,
+    'snapshot_save_archive': case_snapshot_save_archive
+}
+
+
+def reset_peak_rss():
+    """Reset the kernel's high-water mark so only the measured part counts (Linux)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb(since_reset):
+    """Peak resident set size of this process in MB"""
+    if since_reset:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_case(name, workdir, queue):
+    """Child process entry point"""
+    os.chdir(workdir)
+    sys.path.insert(0, SCRIPTS_DIR)
+    # Keep the child quiet: the scripts print progress for humans
+    sys.stdout = open(os.devnull, 'w')
+    result = {'seconds': None, 'peak_rss_mb': None, 'error': None}
+    try:
+        work = CASES[name]()
+        gc.collect()
+        since_reset = reset_peak_rss()
+        start = time.perf_counter()
+        work()
+        result['seconds'] = time.perf_counter() - start
+        result['peak_rss_mb'] = round(peak_rss_mb(since_reset), 1)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    queue.put(result)
+
+
+def run_case(name, dataset_dir, timeout=CASE_TIMEOUT):
+    """Run one case in a fresh process against a throwaway copy of the dataset
+
+    A child that dies without reporting (crash, OOM kill) or outlives the
+    timeout is recorded as an error instead of hanging the suite.
+    """
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory(prefix=f'bench-{name}-') as workdir:
+        shutil.copytree(os.path.join(dataset_dir, 'data'), os.path.join(workdir, 'data'))
+        queue = context.Queue()
+        process = context.Process(target=_run_case, args=(name, workdir, queue))
+        process.start()
+        deadline = time.monotonic() + timeout
+        result = None
+        while result is None:
+            try:
+                result = queue.get(timeout=1)
+            except Empty:
+                if process.exitcode is not None:
+                    # A result put just before exiting may still be in the pipe
+                    try:
+                        result = queue.get(timeout=1)
+                    except Empty:
+                        result = {'seconds': None, 'peak_rss_mb': None,
+                                  'error': f"child exited with code {process.exitcode} without a result"}
+                elif time.monotonic() > deadline:
+                    process.kill()
+                    result = {'seconds': None, 'peak_rss_mb': None, 'error': f"timed out after {timeout:g}s"}
+        process.join()
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(channel_counts, months_list, cases, repeat=1, timeout=CASE_TIMEOUT):
+    """Run every case for every dataset size; returns the result document"""
+    results = []
+
+    for channels in channel_counts:
+        for months in months_list:
+            with tempfile.TemporaryDirectory(prefix='bench-data-') as dataset_dir:
+                start = time.perf_counter()
+                counts = write_dataset(dataset_dir, channels, months)
+                print(f"\n📦 {channels} channels x {months} months: "
+                      f"{counts['youtube_rows']:,} + {counts['telegram_rows']:,} rows "
+                      f"(generated in {time.perf_counter() - start:.1f}s)")
+
+                for name in cases:
+                    runs = [run_case(name, dataset_dir, timeout) for _ in range(repeat)]
+                    failed = next((run['error'] for run in runs if run['error']), None)
+                    seconds = [run['seconds'] for run in runs if run['seconds'] is not None]
+                    entry = {
+                        'case': name,
+                        'channels': channels,
+                        'months': months,
+                        **counts,
+                        'seconds': min(seconds) if seconds else None,
+                        'seconds_all': [round(s, 4) for s in seconds],
+                        'peak_rss_mb': max((run['peak_rss_mb'] for run in runs if run['peak_rss_mb'] is not None), default=None),
+                        'error': failed
+                    }
+                    results.append(entry)
+
+                    if failed:
+                        print(f"   ❌ {name:<24} {failed}")
+                    else:
+                        print(f"   ✅ {name:<24} {entry['seconds']:8.3f}s  {entry['peak_rss_mb']:8.1f} MB")
+
+    return {
+        'generated_at': datetime.now().isoformat(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'repeat': repeat,
+        'results': results
+    }
+
+
+def compare(base_path, new_path):
+    """Print per-case time and memory ratios between two result files"""
+    with open(base_path, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    with open(new_path, 'r', encoding='utf-8') as f:
+        new = json.load(f)
+
+    key = lambda entry: (entry['case'], entry['channels'], entry['months'])
+    base_results = {key(entry): entry for entry in base['results']}
+
+    print(f"📊 {base.get('commit')} -> {new.get('commit')}")
+    for entry in new['results']:
+        old = base_results.get(key(entry))
+        if not old or not old['seconds'] or not entry['seconds']:
+            continue
+        time_ratio = entry['seconds'] / old['seconds']
+        rss_ratio = entry['peak_rss_mb'] / old['peak_rss_mb'] if old['peak_rss_mb'] and entry['peak_rss_mb'] else 1.0
+        flag = '⚠️ ' if time_ratio > 1.2 or rss_ratio > 1.2 else '  '
+        print(f"{flag}{entry['case']:<24} {entry['channels']:>5}ch {entry['months']:>4}mo  "
+              f"time x{time_ratio:.2f}  rss x{rss_ratio:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the analytics pipeline on synthetic data')
+    parser.add_argument('--channels', type=int, nargs='+', default=[10, 100], help='channel counts (10 to 1000)')
+    parser.add_argument('--months', type=float, nargs='+', default=[1, 12], help='history lengths in months (1 to 60)')
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--repeat', type=int, default=1, help='runs per case (best time is reported)')
+    parser.add_argument('--timeout', type=float, default=CASE_TIMEOUT, help='seconds per case run before it is killed')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/<commit>_<time>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help='compare two result files and exit')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    document = run_suite(args.channels, args.months, args.cases, args.repeat, args.timeout)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{document['commit'] or 'local'}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2)
+
+    print(f"\n💾 Results saved to {output}")
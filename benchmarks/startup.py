@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for the entry points
+Measures module import time (python -X importtime) and end-to-end wall time of the
+quick checks, compares them with a budget and records the result in a JSON file
+
+Usage:  python benchmarks/startup.py [--repeat 5] [--output results.json]
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+SCRIPTS_DIR = os.path.join(REPO_ROOT, 'scripts')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+sys.path.insert(0, BENCH_DIR)
+from synthetic import write_dataset
+from run_benchmarks import git_commit
+
+# Import-time budgets in milliseconds (cumulative, including dependencies)
+IMPORT_BUDGETS = {
+    'quick_metrics': 50,
+    'analytics_alerts': 50,
+    'analytics_dashboard': 1500,
+    'generate_combined_report': 1500
+}
+
+# End-to-end budgets in milliseconds, measured on top of a bare interpreter start
+COMMAND_BUDGETS = {
+    'quick_metrics --offline --check': 50,
+    'scripts/analytics_alerts.py': 50
+}
+
+
+def interpreter_start_ms():
+    """Wall time of `python -c pass`, subtracted from the end-to-end measurements"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'], check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def import_time_ms(module):
+    """Cumulative import time of a module as reported by -X importtime"""
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join([REPO_ROOT, SCRIPTS_DIR])}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, env=env, cwd=REPO_ROOT
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    for line in reversed(result.stderr.splitlines()):
+        # "import time: self [us] | cumulative | imported package"
+        parts = [part.strip() for part in line.split('|')]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000
+    raise RuntimeError(f"no importtime line for {module}")
+
+
+def command_ms(argv, cwd):
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + argv, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+
+def prepare_workdir(workdir):
+    """A small dataset with a generated dashboard, so the quick checks have input"""
+    write_dataset(workdir, channels=4, months=1, snapshots=1)
+    subprocess.run(
+        [sys.executable, os.path.join(SCRIPTS_DIR, 'analytics_dashboard.py'), '--full-rebuild'],
+        cwd=workdir, check=True, stdout=subprocess.DEVNULL
+    )
+    # quick_metrics --offline reads the data/ directory next to the script
+    shutil.copy(os.path.join(REPO_ROOT, 'quick_metrics.py'), workdir)
+
+
+def run(repeat=5):
+    results = []
+    over_budget = 0
+
+    for module, budget in IMPORT_BUDGETS.items():
+        samples = [import_time_ms(module) for _ in range(repeat)]
+        results.append({'kind': 'import', 'name': module, 'ms': round(min(samples), 1), 'budget_ms': budget})
+
+    with tempfile.TemporaryDirectory(prefix='bench-startup-') as workdir:
+        prepare_workdir(workdir)
+        baseline = min(interpreter_start_ms() for _ in range(repeat))
+        commands = {
+            'quick_metrics --offline --check': ['quick_metrics.py', '--offline', '--check'],
+            'scripts/analytics_alerts.py': [os.path.join(SCRIPTS_DIR, 'analytics_alerts.py')]
+        }
+        for name, argv in commands.items():
+            samples = [command_ms(argv, workdir) for _ in range(repeat)]
+            results.append({
+                'kind': 'command',
+                'name': name,
+                'ms': round(min(samples) - baseline, 1),
+                'wall_ms': round(min(samples), 1),
+                'budget_ms': COMMAND_BUDGETS[name]
+            })
+
+    print(f"🐍 Interpreter start: {baseline:.0f} ms (subtracted from command times)\n")
+    for entry in results:
+        ok = entry['ms'] <= entry['budget_ms']
+        over_budget += not ok
+        print(f"{'✅' if ok else '❌'} {entry['kind']:<8} {entry['name']:<34} {entry['ms']:8.1f} ms  (budget {entry['budget_ms']} ms)")
+
+    return {
+        'generated_at': datetime.now().isoformat(),
+        'commit': git_commit(),
+        'python': sys.version.split()[0],
+        'interpreter_start_ms': round(baseline, 1),
+        'repeat': repeat,
+        'results': results
+    }, over_budget
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure entry point import and startup times')
+    parser.add_argument('--repeat', type=int, default=5, help='samples per measurement (best is reported)')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/startup_<commit>_<time>.json)')
+    args = parser.parse_args()
+
+    document, over_budget = run(args.repeat)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"startup_{document['commit'] or 'local'}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2)
+
+    print(f"\n💾 Results saved to {output}")
+    sys.exit(1 if over_budget else 0)
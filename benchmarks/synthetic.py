@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Synthetic history generator for the benchmark suite
+Produces realistic youtube_stats.csv / telegram_stats.csv histories, latest
+snapshots and a directory of timestamped snapshot files
+
+Usage:  python benchmarks/synthetic.py --channels 100 --months 12 --out /tmp/bench-data
+"""
+
+import os
+import json
+import argparse
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+
+def hourly_runs(months, end=None, minute=0):
+    """Collection timestamps: one run per hour with jitter and a few skipped runs"""
+    end = end or datetime.now().replace(minute=minute, second=0, microsecond=0)
+    hours = int(months * 30.4 * 24)
+    rng = np.random.default_rng(hours)
+    base = pd.date_range(end=end, periods=hours, freq='h')
+    jitter = pd.to_timedelta(rng.integers(0, 15 * 60, hours), unit='s')
+    keep = rng.random(hours) > 0.03  # ~3% of scheduled runs never happen
+    keep[-1] = True
+    return (base + jitter)[keep]
+
+
+def random_walk(rng, runs, start, drift, noise, drop_rate=0.001):
+    """Mostly growing counter with noise and rare sudden drops"""
+    steps = rng.normal(drift, noise, runs)
+    drops = rng.random(runs) < drop_rate
+    steps[drops] = -np.abs(steps[drops]) * 50
+    return np.maximum(0, np.round(start + np.cumsum(steps))).astype(np.int64)
+
+
+def generate_youtube(channels, months, seed=0):
+    """youtube_stats.csv-shaped history"""
+    rng = np.random.default_rng(seed)
+    runs = hourly_runs(months, minute=0)
+    frames = []
+
+    for i in range(channels):
+        # Channels in one run are collected ~1 s apart
+        timestamps = runs + pd.Timedelta(seconds=i)
+        subscribers = random_walk(rng, len(runs), rng.integers(10, 50000), rng.uniform(0, 2), 1.5)
+        views = random_walk(rng, len(runs), rng.integers(1000, 5_000_000), rng.uniform(10, 500), 50, drop_rate=0)
+        videos = rng.integers(1, 50) + np.cumsum(rng.random(len(runs)) < 0.01)
+        frames.append(pd.DataFrame({
+            'timestamp': timestamps,
+            'channel_id': f"UCsynthetic{i:013d}",
+            'title': f"Synthetic Channel {i}",
+            'subscribers': subscribers,
+            'views': views,
+            'videos': videos
+        }))
+
+    return pd.concat(frames).sort_values('timestamp', kind='stable').reset_index(drop=True)
+
+
+def generate_telegram(channels, months, seed=1):
+    """telegram_stats.csv-shaped history"""
+    rng = np.random.default_rng(seed)
+    runs = hourly_runs(months, minute=30)
+    frames = []
+
+    for i in range(channels):
+        timestamps = runs + pd.Timedelta(seconds=i)
+        frames.append(pd.DataFrame({
+            'timestamp': timestamps,
+            'username': f"@synthetic_{i}",
+            'title': f"Synthetic Telegram {i}",
+            'subscribers': random_walk(rng, len(runs), rng.integers(10, 20000), rng.uniform(-0.2, 1), 1),
+            'bot_is_admin': True,
+            'bot_status': 'administrator'
+        }))
+
+    return pd.concat(frames).sort_values('timestamp', kind='stable').reset_index(drop=True)
+
+
+def youtube_snapshot(latest_rows, generated_at):
+    """latest.json-shaped payload from the last row of each channel"""
+    channels = []
+    videos = []
+    for row in latest_rows.itertuples(index=False):
+        channels.append({
+            'channel_id': row.channel_id,
+            'title': row.title,
+            'description': 'Synthetic channel',
+            'published_at': '2025-01-01T00:00:00Z',
+            'country': 'N/A',
+            'subscribers': int(row.subscribers),
+            'views': int(row.views),
+            'videos': int(row.videos),
+            'uploads_playlist': 'UU' + row.channel_id[2:],
+            'timestamp': row.timestamp.isoformat(),
+            'handle': row.channel_id.lower()
+        })
+        for j in range(5):
+            videos.append({
+                'video_id': f"{row.channel_id[-6:]}_{j}",
+                'title': f"Video {j}",
+                'published_at': '2025-06-01T12:00:00Z',
+                'duration': 'PT1M',
+                'views': int(row.views) // (50 + j),
+                'likes': j,
+                'comments': j // 2,
+                'channel_id': row.channel_id,
+                'channel_title': row.title
+            })
+    return {'generated_at': generated_at.isoformat(), 'channels': channels, 'recent_videos': videos}
+
+
+def telegram_snapshot(latest_rows, generated_at):
+    """telegram_latest.json-shaped payload from the last row of each channel"""
+    channels = [{
+        'timestamp': row.timestamp.isoformat(),
+        'username': row.username,
+        'name': row.title,
+        'channel_id': -1000000000000 - i,
+        'title': row.title,
+        'type': 'channel',
+        'description': 'Synthetic channel',
+        'invite_link': None,
+        'has_visible_history': True,
+        'subscribers': int(row.subscribers),
+        'bot_is_admin': True,
+        'bot_status': 'administrator'
+    } for i, row in enumerate(latest_rows.itertuples(index=False))]
+    return {'generated_at': generated_at.isoformat(), 'channels': channels}
+
+
+def write_dataset(out, channels, months, snapshots=24):
+    """Write a complete synthetic data/ directory under out; returns row counts"""
+    data_dir = os.path.join(out, 'data')
+    os.makedirs(data_dir, exist_ok=True)
+
+    youtube = generate_youtube(channels, months)
+    telegram = generate_telegram(channels, months)
+    youtube.to_csv(os.path.join(data_dir, 'youtube_stats.csv'), index=False)
+    telegram.to_csv(os.path.join(data_dir, 'telegram_stats.csv'), index=False)
+
+    youtube_latest = youtube.groupby('channel_id', sort=False).tail(1)
+    telegram_latest = telegram.groupby('username', sort=False).tail(1)
+    now = youtube['timestamp'].max().to_pydatetime()
+
+    with open(os.path.join(data_dir, 'latest.json'), 'w', encoding='utf-8') as f:
+        json.dump(youtube_snapshot(youtube_latest, now), f, indent=2, ensure_ascii=False)
+    with open(os.path.join(data_dir, 'telegram_latest.json'), 'w', encoding='utf-8') as f:
+        json.dump(telegram_snapshot(telegram_latest, now), f, indent=2, ensure_ascii=False)
+
+    # The most recent runs as timestamped snapshot files
+    for source, history, key, build in [
+        ('youtube', youtube, 'channel_id', youtube_snapshot),
+        ('telegram', telegram, 'username', telegram_snapshot)
+    ]:
+        runs = history['timestamp'].dt.floor('h').drop_duplicates().iloc[-snapshots:]
+        for run in runs:
+            rows = history[history['timestamp'].dt.floor('h') == run]
+            generated_at = rows['timestamp'].max().to_pydatetime()
+            path = os.path.join(data_dir, f"{source}_{generated_at.strftime('%Y%m%d_%H%M%S')}.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(build(rows, generated_at), f, indent=2, ensure_ascii=False)
+
+    return {'youtube_rows': len(youtube), 'telegram_rows': len(telegram)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate a synthetic analytics dataset')
+    parser.add_argument('--channels', type=int, default=10)
+    parser.add_argument('--months', type=float, default=1)
+    parser.add_argument('--snapshots', type=int, default=24, help='timestamped snapshot files per source')
+    parser.add_argument('--out', required=True)
+    args = parser.parse_args()
+
+    counts = write_dataset(args.out, args.channels, args.months, args.snapshots)
+    print(f"✅ Wrote {counts['youtube_rows']:,} YouTube and {counts['telegram_rows']:,} Telegram rows to {args.out}/data")
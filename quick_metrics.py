@@ -2,38 +2,194 @@
 """
 Quick 5-minute metrics check for AI Media Empire
 Run this for instant insights
+
+Usage:  python quick_metrics.py            # full summary (rich)
+        python quick_metrics.py --check    # one line, exit code 1 if there are alerts
+        python quick_metrics.py --offline  # read this checkout's data/ files
 """
 
+import os
+import re
+import sys
 import json
-import requests
+import time
+import argparse
 from datetime import datetime
-from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
-from rich import box
 
-console = Console()
+# rich (and the thread pool for fallbacks) are imported on first use, so the
+# common "is anything on fire?" check only pays for the standard library
+_console = None
+
+BASE_URL = os.environ.get('QUICK_METRICS_BASE_URL', "https://raw.githubusercontent.com/Sigurd313/ai-media-empire-analytics/main")
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Conditional-request cache (one JSON file per resource: validators + body)
+CACHE_DIR = os.environ.get('QUICK_METRICS_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'ai-media-empire'))
+
+# Total seconds allowed for network calls before falling back to cached data
+LATENCY_BUDGET = float(os.environ.get('QUICK_METRICS_BUDGET', 3.0))
+
+# Cache entries younger than this are used without any request (None: the server's Cache-Control max-age)
+MAX_AGE = None
+
+# Compact dashboard subset written by analytics_dashboard.py, then the full dashboard
+SUMMARY_PATH = 'data/summary.json'
+DASHBOARD_PATH = 'data/dashboard.json'
+FALLBACK_PATHS = {'youtube': 'data/latest.json', 'telegram': 'data/telegram_latest.json'}
+
+def get_console():
+    """Shared rich Console, created on first use"""
+    global _console
+    if _console is None:
+        from rich.console import Console
+        _console = Console()
+    return _console
+
+def cache_path(path):
+    return os.path.join(CACHE_DIR, path.replace('/', '_'))
 
-def get_latest_metrics():
-    """Fetch latest metrics from GitHub"""
-    base_url = "https://raw.githubusercontent.com/Sigurd313/ai-media-empire-analytics/main"
+def read_cache(path):
+    """Cached entry for a resource, or None"""
+    try:
+        with open(cache_path(path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_cache(path, entry):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = cache_path(path) + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(entry, f, ensure_ascii=False)
+    os.replace(tmp_path, cache_path(path))
+
+def is_fresh(entry, max_age=None):
+    """Whether a cache entry can be used without revalidating"""
+    if entry is None:
+        return False
+    max_age = max_age if max_age is not None else entry.get('max_age', 0)
+    return time.time() - entry['fetched_at'] < max_age
+
+def fetch(path, timeout, max_age=None):
+    """GET a resource through the cache: fresh entries cost nothing, unchanged ones a 304"""
+    entry = read_cache(path)
+    if is_fresh(entry, max_age):
+        return entry['data']
+    
+    # Imported here so a fresh cache hit never pays for it (urllib is far cheaper to import than requests)
+    from urllib.request import Request, urlopen
+    from urllib.error import HTTPError
+    
+    headers = {}
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
     
     try:
-        # Get dashboard data
-        dashboard_response = requests.get(f"{base_url}/data/dashboard.json")
-        if dashboard_response.status_code == 200:
-            return dashboard_response.json()
-    except:
-        pass
+        with urlopen(Request(f"{BASE_URL}/{path}", headers=headers), timeout=timeout) as response:
+            response_headers = response.headers
+            body = response.read()
+        not_modified = False
+    except HTTPError as e:
+        if e.code != 304 or entry is None:
+            raise
+        response_headers = e.headers
+        not_modified = True
     
-    # Fallback to basic data
-    youtube = requests.get(f"{base_url}/data/latest.json").json()
-    telegram = requests.get(f"{base_url}/data/telegram_latest.json").json()
+    if not_modified:
+        data = entry['data']
+    else:
+        data = json.loads(body)
+        entry = {
+            'etag': response_headers.get('ETag'),
+            'last_modified': response_headers.get('Last-Modified'),
+            'data': data
+        }
     
-    return {'youtube': youtube, 'telegram': telegram}
+    cache_control = re.search(r'max-age=(\d+)', response_headers.get('Cache-Control', ''))
+    entry['fetched_at'] = time.time()
+    entry['max_age'] = int(cache_control.group(1)) if cache_control else 0
+    write_cache(path, entry)
+    return data
+
+def fetch_or_stale(path, timeout, max_age=None):
+    """fetch(), falling back to the cached copy (however old) on network or parse errors"""
+    try:
+        return fetch(path, timeout, max_age)
+    except (OSError, ValueError) as e:
+        entry = read_cache(path)
+        if entry is None:
+            raise
+        get_console().print(f"[dim]Using cached {path} ({type(e).__name__})[/dim]")
+        return entry['data']
+
+def load_local(path):
+    with open(os.path.join(REPO_DIR, path), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def get_local_metrics():
+    """Read the repo's own data/ files (offline mode)"""
+    for path in (SUMMARY_PATH, DASHBOARD_PATH):
+        if os.path.exists(os.path.join(REPO_DIR, path)):
+            return load_local(path)
+    return {name: load_local(path) for name, path in FALLBACK_PATHS.items()
+            if os.path.exists(os.path.join(REPO_DIR, path))}
+
+def get_latest_metrics(budget=LATENCY_BUDGET, max_age=MAX_AGE):
+    """Fetch latest metrics from GitHub within a latency budget"""
+    deadline = time.monotonic() + budget
+    
+    for path in (SUMMARY_PATH, DASHBOARD_PATH):
+        try:
+            return fetch_or_stale(path, timeout=max(0.1, deadline - time.monotonic()), max_age=max_age)
+        except (OSError, ValueError) as e:
+            get_console().print(f"[dim]{path} unavailable ({type(e).__name__})[/dim]")
+    
+    # Fallback to basic data: both files at once, within what is left of the budget
+    from concurrent.futures import ThreadPoolExecutor, wait
+    get_console().print("[dim]Trying raw data[/dim]")
+    remaining = max(0.1, deadline - time.monotonic())
+    executor = ThreadPoolExecutor(max_workers=len(FALLBACK_PATHS))
+    futures = {
+        name: executor.submit(fetch_or_stale, path, remaining, max_age)
+        for name, path in FALLBACK_PATHS.items()
+    }
+    wait(futures.values(), timeout=remaining)
+    # Don't wait for stragglers past the budget
+    executor.shutdown(wait=False)
+    
+    data = {}
+    for name, future in futures.items():
+        if future.done() and future.exception() is None:
+            data[name] = future.result()
+    
+    if not data:
+        raise TimeoutError(f"no metrics within {budget:.1f}s and nothing cached")
+    return data
+
+def check_line(data):
+    """One-line status and exit code (1 when there are alerts) for scripts and cron"""
+    summary = data.get('summary')
+    if summary is None:
+        return "⚠️  No dashboard summary available (raw data only)", 2
+    
+    alerts = data.get('alerts', [])
+    line = (f"reach {summary.get('total_reach', 0):,} | "
+            f"growth {summary.get('growth_last_24h', 0):.2f}%/h | "
+            f"best {summary.get('best_channel', 'N/A')} | "
+            f"{len(alerts)} alerts")
+    if alerts:
+        details = '; '.join(f"{a['channel']} {a['change']} {a['metric']}" for a in alerts[:3])
+        return f"🔥 {line}: {details}", 1
+    return f"✅ {line}", 0
 
 def show_5_minute_summary(data):
     """Display 5-minute decision summary"""
+    from rich.panel import Panel
+    from rich import box
+    console = get_console()
     
     # Header
     console.print(Panel.fit(
@@ -88,6 +244,9 @@ def show_5_minute_summary(data):
 
 def show_channel_table(data):
     """Display channel performance table"""
+    from rich.table import Table
+    from rich import box
+    console = get_console()
     
     table = Table(title="Channel Performance", box=box.SIMPLE)
     table.add_column("Channel", style="cyan")
@@ -95,15 +254,19 @@ def show_channel_table(data):
     table.add_column("Growth/h", justify="right")
     table.add_column("Status", justify="center")
     
-    # YouTube channels
-    if 'youtube' in data and 'channels' in data['youtube']:
-        for channel in data['youtube']['channels']:
+    # YouTube and Telegram channels
+    for platform in ('youtube', 'telegram'):
+        for channel in data.get(platform, {}).get('channels', []):
+            if 'error' in channel:
+                continue
             growth = channel.get('growth_rate_hourly', 0)
             status = "🟢" if growth > 0.5 else "🟡" if growth > 0 else "🔴"
+            subscribers = channel.get('subscribers')
             
             table.add_row(
-                channel['name'],
-                f"{channel['subscribers']:,}",
+                # Raw latest.json (fallback data) has titles, the dashboard names
+                channel.get('name', channel.get('title', 'Unknown')),
+                f"{subscribers:,}" if isinstance(subscribers, int) else 'N/A',
                 f"{growth:.2f}%",
                 status
             )
@@ -112,11 +275,37 @@ def show_channel_table(data):
 
 def main():
     """Run quick metrics check"""
-    console.print("[dim]Fetching latest metrics...[/dim]")
+    parser = argparse.ArgumentParser(description='5-minute metrics check')
+    parser.add_argument('--offline', action='store_true', help="read this checkout's data/ files, no network")
+    parser.add_argument('--check', action='store_true', help='print one status line, exit 1 if there are alerts')
+    parser.add_argument('--budget', type=float, default=LATENCY_BUDGET, help='seconds allowed for network calls')
+    parser.add_argument('--max-age', type=float, default=MAX_AGE,
+                        help="seconds a cached copy is used without revalidating (default: server's Cache-Control)")
+    args = parser.parse_args()
     
     try:
-        data = get_latest_metrics()
-        
+        if args.offline:
+            data = get_local_metrics()
+        else:
+            if not args.check:
+                get_console().print("[dim]Fetching latest metrics...[/dim]")
+            data = get_latest_metrics(budget=args.budget, max_age=args.max_age)
+    except Exception as e:
+        if args.check:
+            print(f"❌ Error fetching metrics: {e}")
+            sys.exit(2)
+        get_console().print(f"[red]Error fetching metrics: {e}[/red]")
+        get_console().print("[yellow]Check: https://github.com/Sigurd313/ai-media-empire-analytics/actions[/yellow]")
+        return
+    
+    # Plain one-liner: no rich, no tables
+    if args.check:
+        line, code = check_line(data)
+        print(line)
+        sys.exit(code)
+    
+    console = get_console()
+    try:
         # Show 5-minute summary
         show_5_minute_summary(data)
         
@@ -128,7 +317,7 @@ def main():
         console.print(f"\n[dim]Full dashboard: https://sigurd313.github.io/ai-media-empire-analytics/[/dim]")
         
     except Exception as e:
-        console.print(f"[red]Error fetching metrics: {e}[/red]")
+        console.print(f"[red]Error showing metrics: {e}[/red]")
         console.print("[yellow]Check: https://github.com/Sigurd313/ai-media-empire-analytics/actions[/yellow]")
 
 if __name__ == "__main__":
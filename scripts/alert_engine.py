@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Stateful alert engine for AI Media Empire Analytics
+Rules run over the engine arrays for every channel at once (inside the dashboard
+run); this module keeps the alert state between runs (open/resolved, fingerprint
+dedup, cooldowns, escalation) and delivers the resulting notifications batched
+and asynchronously to every configured sink (Discord, Slack, file) with retries
+
+Only the standard library is imported at module level, so the alert step stays
+a fast start (the HTTP client is imported when there is something to send).
+"""
+
+import os
+import json
+import hashlib
+from datetime import datetime, timedelta
+
+STATE_PATH = 'data/alert_state.json'
+LOG_PATH = 'data/alerts.log'
+ISSUE_PATH = 'alert_issue.md'
+
+LEVELS = ['INFO', 'WARNING', 'CRITICAL']
+
+# Hours before a still-open alert is sent again as a reminder
+COOLDOWN_HOURS = {'CRITICAL': 6, 'WARNING': 24, 'INFO': 72}
+
+# Hours a WARNING may stay open before it is escalated to CRITICAL (ALERT_ESCALATE_AFTER_HOURS, 0 = never)
+ESCALATE_AFTER_HOURS = int(os.environ.get('ALERT_ESCALATE_AFTER_HOURS') or 24)
+
+# Resolved alerts are forgotten after this many days
+KEEP_RESOLVED_DAYS = 30
+
+# Rule thresholds. A subscriber drop alerts below CRITICAL_DROP_PCT, as before the rule engine;
+# ALERT_WARNING_DROP_PCT (e.g. -10) also opens WARNING alerts for the smaller drops down to it
+CRITICAL_DROP_PCT = -20
+WARNING_DROP_PCT = float(os.environ['ALERT_WARNING_DROP_PCT']) if os.environ.get('ALERT_WARNING_DROP_PCT') else None
+ROI_CRITICAL_PCT = -75
+MILESTONE_DAYS = 7
+# Hours without a new observation before a channel counts as stale (beyond the grid's forward fill)
+STALE_HOURS = 6
+
+# Messages per webhook call (Discord allows 10 embeds, Slack messages stay readable)
+DISCORD_BATCH = 10
+SLACK_BATCH = 25
+
+
+def fingerprint(rule, subject):
+    """Stable identity of a condition: the same rule on the same subject dedups across runs"""
+    return hashlib.sha1(f"{rule}:{subject}".encode('utf-8')).hexdigest()[:16]
+
+
+def condition(rule, subject, level, message, details):
+    return {
+        'fingerprint': fingerprint(rule, subject),
+        'rule': rule,
+        'subject': subject,
+        'level': level,
+        'message': message,
+        'details': details
+    }
+
+
+# --- Rules: evaluated by the dashboard over the engine output of all channels at once
+
+def evaluate_rules(metrics, names, grids, summary, roi, now=None):
+    """Conditions firing now, from the engine metrics and hourly grids of every channel
+
+    metrics is the engine DataFrame indexed by 'platform:key', names maps those keys
+    to display names and grids maps platform -> HourlyGrid.
+    """
+    import numpy as np
+
+    now = now or datetime.now()
+    conditions = []
+
+    # Subscriber drops: one boolean mask over every channel's anomaly columns
+    if not metrics.empty:
+        change = metrics['change_pct'].to_numpy(dtype=float)
+        drops = (metrics['anomaly_type'] == 'drop').to_numpy()
+        warning = change < WARNING_DROP_PCT if WARNING_DROP_PCT is not None else np.zeros(len(change), dtype=bool)
+        for level, mask in [('CRITICAL', drops & (change < CRITICAL_DROP_PCT)),
+                            ('WARNING', drops & ~(change < CRITICAL_DROP_PCT) & warning)]:
+            for i in np.flatnonzero(mask):
+                key = metrics.index[i]
+                conditions.append(condition(
+                    'subscriber_drop', key, level,
+                    f"🚨 {names.get(key, key)} lost {abs(change[i]):.1f}% subscribers!",
+                    f"Expected: {int(metrics['expected'].iloc[i])}, Actual: {int(metrics['current'].iloc[i])}"
+                ))
+
+    # Stale channels: last observed hour of each channel (engine column on its grid) vs the current hour
+    current_hour = np.datetime64(now.replace(minute=0, second=0, microsecond=0), 'h')
+    for platform, grid in grids.items():
+        if metrics.empty or grid.start is None:
+            continue
+        rows = np.flatnonzero(metrics.index.str.startswith(f"{platform}:"))
+        last = metrics['last'].to_numpy(dtype=int)[rows]
+        hours_since = (current_hour - (grid.start + last)) / np.timedelta64(1, 'h')
+        for i in np.flatnonzero(hours_since > STALE_HOURS):
+            key = metrics.index[rows[i]]
+            conditions.append(condition(
+                'stale_data', key, 'WARNING',
+                f"⏳ No new data from {names.get(key, key.split(':', 1)[1])} for {int(hours_since[i])} hours",
+                "Check the collector run and the channel's API access"
+            ))
+
+    # Portfolio-level conditions from the summary
+    if summary.get('growth_last_24h', 0) < 0:
+        conditions.append(condition(
+            'negative_growth', 'portfolio', 'WARNING',
+            f"📉 Negative growth: {summary['growth_last_24h']:.2f}% per hour",
+            "Immediate action required to reverse trend"
+        ))
+
+    for channel, data in roi.items():
+        if data['roi_percent'] < ROI_CRITICAL_PCT:
+            conditions.append(condition(
+                'roi_loss', channel, 'CRITICAL',
+                f"💸 {channel} is losing money: {data['roi_percent']:.1f}% ROI",
+                f"Cost: ${data['cost']}, Revenue: ${data['potential_revenue']:.0f}"
+            ))
+
+    days_to_1000 = summary.get('days_to_1000_subs')
+    if days_to_1000 is not None and 0 < days_to_1000 < MILESTONE_DAYS:
+        conditions.append(condition(
+            'milestone_1000', 'portfolio', 'INFO',
+            f"🎯 Reaching 1000 subscribers in {days_to_1000:.1f} days!",
+            "Prepare celebration content"
+        ))
+
+    return conditions
+
+
+# --- State: open/resolved alerts keyed by fingerprint
+
+class AlertState:
+    def __init__(self, alerts=None, pending=None):
+        self.alerts = alerts or {}
+        # Per sink: the notifications it failed to take, resent to that sink alone next delivery
+        self.pending = pending or {}
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        if not os.path.exists(path):
+            return cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data.get('alerts', {}), data.get('pending', {}))
+
+    def save(self, path=STATE_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'alerts': self.alerts, 'pending': self.pending}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def open_alerts(self, level=None):
+        return [alert for alert in self.alerts.values()
+                if alert['status'] == 'open' and (level is None or alert['level'] == level)]
+
+    def update(self, conditions, now=None):
+        """Fold this run's conditions into the state; returns the notifications to send
+
+        A notification is a new alert, an escalation, a reminder after the cooldown,
+        or a resolution (open alert whose condition no longer fires).
+        """
+        now = now or datetime.now()
+        stamp = now.isoformat()
+        notifications = []
+        firing = set()
+
+        for cond in conditions:
+            key = cond['fingerprint']
+            firing.add(key)
+            alert = self.alerts.get(key)
+
+            if alert is None or alert['status'] == 'resolved':
+                alert = {**cond, 'status': 'open', 'first_seen': stamp, 'last_seen': stamp,
+                         'last_sent': None, 'sent_count': 0, 'escalated': False}
+                self.alerts[key] = alert
+                notifications.append({**alert, 'event': 'new'})
+                continue
+
+            raised = LEVELS.index(cond['level']) > LEVELS.index(alert['level'])
+            alert.update({'message': cond['message'], 'details': cond['details'], 'last_seen': stamp})
+            if raised:
+                alert['level'] = cond['level']
+
+            open_hours = (now - datetime.fromisoformat(alert['first_seen'])).total_seconds() / 3600
+            if ESCALATE_AFTER_HOURS and alert['level'] == 'WARNING' and open_hours >= ESCALATE_AFTER_HOURS:
+                alert['level'] = 'CRITICAL'
+                alert['escalated'] = True
+                raised = True
+
+            if raised:
+                notifications.append({**alert, 'event': 'escalated'})
+            elif alert['last_sent'] is None or now - datetime.fromisoformat(alert['last_sent']) \
+                    >= timedelta(hours=COOLDOWN_HOURS[alert['level']]):
+                notifications.append({**alert, 'event': 'reminder' if alert['last_sent'] else 'new'})
+
+        for key, alert in list(self.alerts.items()):
+            if alert['status'] == 'open' and key not in firing:
+                alert.update({'status': 'resolved', 'resolved_at': stamp})
+                notifications.append({**alert, 'event': 'resolved'})
+            elif alert['status'] == 'resolved' and now - datetime.fromisoformat(alert['resolved_at']) \
+                    > timedelta(days=KEEP_RESOLVED_DAYS):
+                del self.alerts[key]
+
+        return notifications
+
+    def mark_sent(self, notifications, now=None):
+        """Start the cooldown of the alerts whose notifications were delivered"""
+        stamp = (now or datetime.now()).isoformat()
+        for notification in notifications:
+            alert = self.alerts.get(notification['fingerprint'])
+            if alert is not None:
+                alert['last_sent'] = stamp
+                alert['sent_count'] += 1
+
+    def outbox(self, sink, notifications):
+        """This run's notifications plus the ones `sink` failed to take before (the latest per alert)"""
+        batch = {n['fingerprint']: n for n in self.pending.get(sink, [])}
+        batch.update({n['fingerprint']: n for n in notifications})
+        return list(batch.values())
+
+    def mark_delivered(self, notifications, batches, failed, now=None):
+        """Record a delivery of this run's notifications, sink by sink
+
+        batches maps each configured sink to what it was sent (see outbox). A sink
+        that failed keeps its batch for the next delivery, so the sinks that took
+        it are not sent it again; the alerts' cooldown starts once any sink took them.
+        """
+        stamp = (now or datetime.now()).isoformat()
+        for sink, batch in batches.items():
+            if sink in failed:
+                self.pending[sink] = batch
+                continue
+            self.pending.pop(sink, None)
+            for notification in batch:
+                alert = self.alerts.get(notification['fingerprint'])
+                if alert is not None:
+                    alert.setdefault('delivered', {})[sink] = stamp
+        # Sinks no longer configured have nothing to catch up on
+        self.pending = {sink: batch for sink, batch in self.pending.items() if sink in batches}
+        if any(sink not in failed for sink in batches):
+            self.mark_sent(notifications, now)
+
+
+# --- Sinks: each turns a batch of notifications into as few messages as possible
+
+EVENT_PREFIX = {'new': '🆕', 'reminder': '🔁', 'escalated': '⬆️', 'resolved': '✅'}
+LEVEL_COLOR = {'CRITICAL': 0xFF0000, 'WARNING': 0xFFA500, 'INFO': 0x00FF00}
+
+
+def notification_title(notification):
+    status = 'RESOLVED' if notification['event'] == 'resolved' else notification['level']
+    return f"{EVENT_PREFIX[notification['event']]} [{status}] {notification['message']}"
+
+
+def chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class WebhookSink:
+    name = 'webhook'
+    batch = 10
+
+    def __init__(self, url):
+        self.url = url
+
+    def payload(self, batch, header):
+        raise NotImplementedError
+
+    async def send(self, notifications, client):
+        """Post coalesced messages; True when every one was accepted"""
+        header = f"**🚨 AI Media Empire Analytics** - {len(notifications)} alert update(s)"
+        delivered = True
+        for batch in chunks(notifications, self.batch):
+            response = await client.post_json(self.url, self.payload(batch, header), endpoint=self.name)
+            if response.status_code >= 300:
+                print(f"❌ {self.name}: webhook returned {response.status_code}")
+                delivered = False
+        return delivered
+
+
+class DiscordSink(WebhookSink):
+    name = 'discord'
+    batch = DISCORD_BATCH
+
+    def payload(self, batch, header):
+        return {
+            'content': header,
+            'embeds': [{
+                'title': notification_title(n)[:256],
+                'description': n['details'],
+                'color': 0x808080 if n['event'] == 'resolved' else LEVEL_COLOR.get(n['level'], 0x808080),
+                'timestamp': n['last_seen']
+            } for n in batch]
+        }
+
+
+class SlackSink(WebhookSink):
+    name = 'slack'
+    batch = SLACK_BATCH
+
+    def payload(self, batch, header):
+        lines = [f"• {notification_title(n)} - _{n['details']}_" for n in batch]
+        return {'text': header.replace('**', '*') + '\n' + '\n'.join(lines)}
+
+
+class FileSink:
+    """Event log (JSON lines) plus alert_issue.md listing the open CRITICAL alerts"""
+    name = 'file'
+
+    def __init__(self, state, log_path=LOG_PATH, issue_path=ISSUE_PATH):
+        self.state = state
+        self.log_path = log_path
+        self.issue_path = issue_path
+
+    async def send(self, notifications, client=None):
+        os.makedirs(os.path.dirname(self.log_path) or '.', exist_ok=True)
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            for n in notifications:
+                f.write(json.dumps({'event': n['event'], 'level': n['level'], 'rule': n['rule'],
+                                    'subject': n['subject'], 'message': n['message'],
+                                    'at': n.get('resolved_at') or n['last_seen']}, ensure_ascii=False) + '\n')
+        self.write_issue()
+        return True
+
+    def write_issue(self):
+        """Rewrite alert_issue.md only when the set of open CRITICAL alerts changed"""
+        critical = sorted(self.state.open_alerts('CRITICAL'), key=lambda alert: alert['first_seen'])
+        if not critical:
+            if os.path.exists(self.issue_path):
+                os.remove(self.issue_path)
+                print(f"✅ No open critical alerts, removed {self.issue_path}")
+            return
+
+        content = "## 🚨 Open Critical Alerts\n\n"
+        for alert in critical:
+            content += f"- **{alert['message']}**\n"
+            content += f"  - {alert['details']}\n"
+            content += f"  - Open since {alert['first_seen'][:16]}"
+            content += " (escalated)\n\n" if alert.get('escalated') else "\n\n"
+        content += "[View Full Dashboard](dashboard.md)\n"
+
+        if os.path.exists(self.issue_path):
+            with open(self.issue_path, 'r', encoding='utf-8') as f:
+                if f.read() == content:
+                    return
+        with open(self.issue_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        print(f"📝 Open critical alerts written to {self.issue_path}")
+
+
+def configured_sinks(state):
+    """Every sink with configuration: webhooks from the environment, the file sink always"""
+    sinks = [FileSink(state)]
+    if os.environ.get('DISCORD_WEBHOOK'):
+        sinks.append(DiscordSink(os.environ['DISCORD_WEBHOOK']))
+    if os.environ.get('SLACK_WEBHOOK'):
+        sinks.append(SlackSink(os.environ['SLACK_WEBHOOK']))
+    return sinks
+
+
+async def deliver(batches, sinks, client=None):
+    """Send each sink its batch of notifications (batches: sink name -> list) concurrently; returns the sinks that failed
+
+    Network sinks share one pooled client (retries with backoff on 429/5xx and
+    connection errors, per-call timeout); a failing sink doesn't affect the others.
+    """
+    sinks = [sink for sink in sinks if batches.get(sink.name)]
+    if not sinks:
+        return []
+
+    import asyncio
+
+    own_client = client is None and any(isinstance(sink, WebhookSink) for sink in sinks)
+    if own_client:
+        from http_client import AsyncHTTPClient
+        client = AsyncHTTPClient(max_concurrency=4, timeout=10, max_retries=3)
+
+    try:
+        results = await asyncio.gather(*(sink.send(batches[sink.name], client) for sink in sinks),
+                                       return_exceptions=True)
+    finally:
+        if own_client:
+            client.close()
+
+    failed = []
+    for sink, result in zip(sinks, results):
+        if result is True:
+            print(f"✅ {sink.name}: delivered {len(batches[sink.name])} alert update(s)")
+        else:
+            reason = f"{type(result).__name__}: {result}" if isinstance(result, Exception) else 'rejected'
+            print(f"❌ {sink.name}: delivery failed ({reason})")
+            failed.append(sink.name)
+    return failed
@@ -1,18 +1,21 @@
 #!/usr/bin/env python3
 """
 Alerts system for AI Media Empire Analytics
-Sends notifications when important events happen
+Sends notifications when important events happen (see alert_engine.py for the
+state, dedup, cooldown and delivery rules)
 """
 
 import json
 import os
 from datetime import datetime
-import requests
+
+from alert_engine import AlertState, condition, configured_sinks, deliver
+from instrumentation import traced, export
 
 class AlertsSystem:
-    def __init__(self):
-        self.dashboard = self.load_dashboard()
-        self.webhook_url = os.environ.get('DISCORD_WEBHOOK') or os.environ.get('SLACK_WEBHOOK')
+    def __init__(self, dashboard=None, state=None):
+        self.dashboard = dashboard if dashboard is not None else self.load_dashboard()
+        self.state = state if state is not None else AlertState.load()
         
     def load_dashboard(self):
         """Load latest dashboard data"""
@@ -22,121 +25,78 @@ class AlertsSystem:
         return None
     
     def check_critical_alerts(self):
-        """Check for critical conditions"""
+        """Conditions firing now (evaluated over all channels by the dashboard run)"""
         if not self.dashboard:
             return []
         
+        if 'conditions' in self.dashboard:
+            return self.dashboard['conditions']
+        
+        # Dashboards written before the rule engine: derive the conditions from the summary
         critical_alerts = []
         
-        # Check for urgent alerts
         for alert in self.dashboard.get('alerts', []):
             if alert['type'] == 'drop' and float(alert['change'].strip('%')) < -20:
-                critical_alerts.append({
-                    'level': 'CRITICAL',
-                    'message': f"🚨 {alert['channel']} lost {alert['change']} {alert['metric']}!",
-                    'details': f"Expected: {alert['expected']}, Actual: {alert['current']}"
-                })
+                critical_alerts.append(condition(
+                    'subscriber_drop', alert['channel'], 'CRITICAL',
+                    f"🚨 {alert['channel']} lost {alert['change']} {alert['metric']}!",
+                    f"Expected: {alert['expected']}, Actual: {alert['current']}"
+                ))
         
-        # Check growth stagnation
         if self.dashboard['summary']['growth_last_24h'] < 0:
-            critical_alerts.append({
-                'level': 'WARNING',
-                'message': f"📉 Negative growth: {self.dashboard['summary']['growth_last_24h']:.2f}% per hour",
-                'details': "Immediate action required to reverse trend"
-            })
+            critical_alerts.append(condition(
+                'negative_growth', 'portfolio', 'WARNING',
+                f"📉 Negative growth: {self.dashboard['summary']['growth_last_24h']:.2f}% per hour",
+                "Immediate action required to reverse trend"
+            ))
         
-        # Check ROI
         for channel, roi in self.dashboard.get('roi', {}).items():
             if roi['roi_percent'] < -75:
-                critical_alerts.append({
-                    'level': 'CRITICAL',
-                    'message': f"💸 {channel} is losing money: {roi['roi_percent']:.1f}% ROI",
-                    'details': f"Cost: ${roi['cost']}, Revenue: ${roi['potential_revenue']:.0f}"
-                })
+                critical_alerts.append(condition(
+                    'roi_loss', channel, 'CRITICAL',
+                    f"💸 {channel} is losing money: {roi['roi_percent']:.1f}% ROI",
+                    f"Cost: ${roi['cost']}, Revenue: ${roi['potential_revenue']:.0f}"
+                ))
         
-        # Check if close to milestone
         days_to_1000 = self.dashboard['summary'].get('days_to_1000_subs')
-        if days_to_1000 and days_to_1000 < 7:
-            critical_alerts.append({
-                'level': 'INFO',
-                'message': f"🎯 Reaching 1000 subscribers in {days_to_1000:.1f} days!",
-                'details': "Prepare celebration content"
-            })
+        if days_to_1000 and 0 < days_to_1000 < 7:
+            critical_alerts.append(condition(
+                'milestone_1000', 'portfolio', 'INFO',
+                f"🎯 Reaching 1000 subscribers in {days_to_1000:.1f} days!",
+                "Prepare celebration content"
+            ))
         
         return critical_alerts
     
-    def send_webhook(self, alerts):
-        """Send alerts to Discord/Slack webhook"""
-        if not self.webhook_url or not alerts:
-            return
-        
-        # Format message
-        message = {
-            "content": "**🚨 AI Media Empire Analytics Alert**\n",
-            "embeds": []
-        }
-        
-        for alert in alerts:
-            color = {
-                'CRITICAL': 0xFF0000,  # Red
-                'WARNING': 0xFFA500,   # Orange
-                'INFO': 0x00FF00       # Green
-            }.get(alert['level'], 0x808080)
-            
-            message['embeds'].append({
-                "title": alert['message'],
-                "description": alert['details'],
-                "color": color,
-                "timestamp": datetime.now().isoformat()
-            })
-        
-        # Send to webhook
-        try:
-            response = requests.post(self.webhook_url, json=message)
-            if response.status_code == 204:
-                print(f"✅ Sent {len(alerts)} alerts to webhook")
-            else:
-                print(f"❌ Failed to send alerts: {response.status_code}")
-        except Exception as e:
-            print(f"❌ Error sending alerts: {e}")
+    def update_state(self, now=None):
+        """Dedup this run's conditions against the open alerts; returns the notifications to send"""
+        notifications = self.state.update(self.check_critical_alerts(), now)
+        self.state.save()
+        return notifications
     
-    def create_github_issue(self, alerts):
-        """Create GitHub issue for critical alerts"""
-        # This would require GitHub token and API calls
-        # For now, just save to file
-        
-        if not alerts:
-            return
-        
-        issue_content = f"""## 🚨 Analytics Alert - {datetime.now().strftime('%Y-%m-%d %H:%M')}
-
-### Critical Issues Detected:
-
-"""
-        for alert in alerts:
-            issue_content += f"- **{alert['level']}**: {alert['message']}\n"
-            issue_content += f"  - {alert['details']}\n\n"
-        
-        issue_content += f"""
-### Dashboard Summary:
-- Total Reach: {self.dashboard['summary']['total_reach']:,}
-- Growth Rate: {self.dashboard['summary']['growth_last_24h']:.2f}% per hour
-- Best Channel: {self.dashboard['summary']['best_channel']}
+    async def send_notifications(self, notifications, client=None):
+        """Deliver this run's notifications, and what a sink failed to take before, to every configured sink
 
-[View Full Dashboard](dashboard.md)
-"""
-        
-        # Save to file (in real implementation, create GitHub issue)
-        with open('alert_issue.md', 'w', encoding='utf-8') as f:
-            f.write(issue_content)
-        
-        print("📝 Alert issue content saved to alert_issue.md")
+        Delivery is recorded per sink (see AlertState.mark_delivered): a failing sink
+        gets its batch again next run without re-sending it to the sinks that took it.
+        """
+        sinks = configured_sinks(self.state)
+        batches = {sink.name: self.state.outbox(sink.name, notifications) for sink in sinks}
+        if not any(batches.values()):
+            return []
+        failed = await deliver(batches, sinks, client)
+        self.state.mark_delivered(notifications, batches, failed)
+        self.state.save()
+        return failed
     
     def generate_daily_summary(self):
         """Generate daily summary email/message"""
         if not self.dashboard:
             return None
         
+        days_to_1k = self.dashboard['summary']['days_to_1000_subs']
+        days_to_1k = f"{days_to_1k:.1f}" if days_to_1k is not None else 'N/A'
+        
         summary = f"""
 # 📊 Daily Analytics Summary - {datetime.now().strftime('%Y-%m-%d')}
 
@@ -144,7 +104,7 @@ class AlertsSystem:
 - **Total Reach**: {self.dashboard['summary']['total_reach']:,} subscribers
 - **24h Growth**: {self.dashboard['summary']['growth_last_24h']:.2f}% per hour
 - **Best Performer**: {self.dashboard['summary']['best_channel']}
-- **Days to 1K**: {self.dashboard['summary']['days_to_1000_subs']:.1f if self.dashboard['summary']['days_to_1000_subs'] else 'N/A'}
+- **Days to 1K**: {days_to_1k}
 
 ## 📈 Channel Performance
 """
@@ -170,24 +130,31 @@ class AlertsSystem:
         
         return summary
 
-def main():
-    """Run alerts check"""
-    alerts = AlertsSystem()
-    
-    # Check for critical alerts
-    critical_alerts = alerts.check_critical_alerts()
+@traced()
+def process_alerts(alerts):
+    """Update the alert state and report this run's notifications; returns them for delivery"""
+    notifications = alerts.update_state()
+    open_alerts = alerts.state.open_alerts()
     
-    if critical_alerts:
-        print(f"\n🚨 Found {len(critical_alerts)} alerts!")
-        for alert in critical_alerts:
-            print(f"- {alert['level']}: {alert['message']}")
-        
-        # Send notifications
-        alerts.send_webhook(critical_alerts)
-        alerts.create_github_issue([a for a in critical_alerts if a['level'] == 'CRITICAL'])
+    if notifications:
+        print(f"\n🚨 {len(notifications)} alert updates ({len(open_alerts)} open)")
+        for notification in notifications:
+            print(f"- {notification['event']} {notification['level']}: {notification['message']}")
+    elif open_alerts:
+        print(f"🔕 {len(open_alerts)} open alerts, all within their cooldown")
     else:
         print("✅ No critical alerts")
     
+    return notifications
+
+def main(dashboard=None):
+    """Run alerts check (on the pipeline's in-memory dashboard when given)"""
+    alerts = AlertsSystem(dashboard=dashboard)
+    notifications = process_alerts(alerts)
+    if notifications or alerts.state.pending:
+        import asyncio
+        asyncio.run(alerts.send_notifications(notifications))
+    
     # Generate daily summary (run at specific time)
     current_hour = datetime.now().hour
     if current_hour == 9:  # 9 AM
@@ -199,3 +166,4 @@ def main():
 
 if __name__ == "__main__":
     main()
+    export('alerts')
@@ -1,94 +1,73 @@
 #!/usr/bin/env python3
 """
 Real-time Analytics Dashboard for AI Media Empire
-Calculates metrics, predictions, and alerts
+Calculates metrics, predictions, and alerts; past dashboards are reconstructed
+from views of the hourly grids and the snapshots in effect at the time
+
+Usage:  python scripts/analytics_dashboard.py [--full-rebuild]
+        python scripts/analytics_dashboard.py --as-of "2025-08-10 14:00"
+        python scripts/analytics_dashboard.py --replay 2025-07-01 2025-09-30 [--step 1h]
 """
 
 import json
 import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
-from scipy import stats
+import sys
+import argparse
 import warnings
 warnings.filterwarnings('ignore')
 
+from dashboard_state import DashboardState
+from snapshot_archive import snapshot_at, snapshots_at
+from seasonal_baseline import apply_seasonal
+from alert_engine import evaluate_rules
+from write_layer import write_json, write_text, report as report_writes
+from instrumentation import span, traced, export
+from analytics_engine import (compute_grid_metrics, series_key,
+                              series_growth, series_predictions, series_alerts)
+
+# Reconstructed dashboards (--as-of, --replay)
+REPLAY_DIR = 'data/replay'
+
 class AnalyticsDashboard:
-    def __init__(self):
-        self.youtube_data = self.load_json('data/latest.json')
-        self.telegram_data = self.load_json('data/telegram_latest.json')
-        self.youtube_history = self.load_csv('data/youtube_stats.csv')
-        self.telegram_history = self.load_csv('data/telegram_stats.csv')
+    def __init__(self, incremental=False, state=None, new_rows=None, youtube_data=None, telegram_data=None):
+        # The pipeline runner passes the snapshots it already parsed
+        self.youtube_data = youtube_data if youtube_data is not None else self.load_json('data/latest.json')
+        self.telegram_data = telegram_data if telegram_data is not None else self.load_json('data/telegram_latest.json')
+        
+        # The state is the hourly grid of each platform. Incremental mode folds
+        # only rows newer than the persisted grids; a long-running process passes
+        # its in-memory state and the rows it collected since the last run
+        # ({'youtube': df, 'telegram': df}) instead. A full rebuild starts empty.
+        self.state = (state or DashboardState.load()) if incremental else None
+        self.incremental = self.state is not None
+        
+        with span('fold state', incremental=self.incremental):
+            if self.incremental and new_rows is not None:
+                self.state.fold_youtube(new_rows.get('youtube', pd.DataFrame()))
+                self.state.fold_telegram(new_rows.get('telegram', pd.DataFrame()))
+            else:
+                self.state = self.state or DashboardState()
+                self.state.fold_history()
+        
+        # Engine output for all YouTube and Telegram channels, computed once per run
+        self._metrics = None
+        self._rows = None
+        self._total = {}
+        # Seasonal anomalies of the other grid metrics (views, videos) by (engine key, metric)
+        self._seasonal = {}
+        
+        # Point in time of a replayed dashboard (None: now)
+        self.now = None
         
     def load_json(self, path):
         """Load JSON data"""
         if os.path.exists(path):
-            with open(path, 'r', encoding='utf-8') as f:
+            with span(f"load {os.path.basename(path)}"), open(path, 'r', encoding='utf-8') as f:
                 return json.load(f)
         return None
     
-    def load_csv(self, path):
-        """Load CSV data"""
-        if os.path.exists(path):
-            df = pd.read_csv(path)
-            if 'timestamp' in df.columns:
-                df['timestamp'] = pd.to_datetime(df['timestamp'])
-            return df
-        return pd.DataFrame()
-    
-    def calculate_growth_rate(self, df, metric='subscribers'):
-        """Calculate daily/hourly growth rate"""
-        if df.empty or metric not in df.columns:
-            return 0
-        
-        # Get last 24 hours
-        last_24h = df[df['timestamp'] > datetime.now() - timedelta(days=1)]
-        if len(last_24h) < 2:
-            return 0
-        
-        start_val = last_24h.iloc[0][metric]
-        end_val = last_24h.iloc[-1][metric]
-        
-        if start_val == 0:
-            return 0
-        
-        hours_diff = (last_24h.iloc[-1]['timestamp'] - last_24h.iloc[0]['timestamp']).total_seconds() / 3600
-        if hours_diff == 0:
-            return 0
-        
-        # Calculate hourly growth rate
-        growth_rate = ((end_val - start_val) / start_val) / hours_diff * 100
-        return growth_rate
-    
-    def predict_growth(self, df, metric='subscribers', days_ahead=7):
-        """Predict future growth using linear regression"""
-        if df.empty or len(df) < 3:
-            return None
-        
-        # Prepare data
-        df = df.sort_values('timestamp')
-        df['hours_since_start'] = (df['timestamp'] - df['timestamp'].min()).dt.total_seconds() / 3600
-        
-        # Simple linear regression
-        x = df['hours_since_start'].values
-        y = df[metric].values
-        
-        if len(x) < 2:
-            return None
-        
-        slope, intercept = np.polyfit(x, y, 1)
-        
-        # Predict future
-        future_hours = np.arange(x[-1], x[-1] + (days_ahead * 24), 1)
-        predictions = slope * future_hours + intercept
-        
-        return {
-            'current': int(y[-1]),
-            'predicted_7d': int(predictions[-1]),
-            'daily_growth': int(slope * 24),
-            'reach_1000_days': (1000 - y[-1]) / (slope * 24) if slope > 0 else None
-        }
-    
     def calculate_engagement_rate(self, channel_data):
         """Calculate engagement rate for channels"""
         # For YouTube
@@ -98,44 +77,62 @@ class AnalyticsDashboard:
                 return (avg_views / channel_data['subscribers']) * 100
         return 0
     
-    def detect_anomalies(self, df, metric='subscribers'):
-        """Detect sudden drops or spikes"""
-        if df.empty or len(df) < 10:
-            return []
-        
-        alerts = []
-        
-        # Calculate rolling average and std
-        df = df.sort_values('timestamp')
-        df['rolling_mean'] = df[metric].rolling(window=5, min_periods=1).mean()
-        df['rolling_std'] = df[metric].rolling(window=5, min_periods=1).std()
-        
-        # Check last value
-        last_row = df.iloc[-1]
-        prev_mean = df.iloc[-6:-1]['rolling_mean'].mean() if len(df) > 5 else last_row['rolling_mean']
-        
-        if prev_mean > 0:
-            change_pct = ((last_row[metric] - prev_mean) / prev_mean) * 100
-            
-            if change_pct < -10:
-                alerts.append({
-                    'type': 'drop',
-                    'metric': metric,
-                    'change': f"{change_pct:.1f}%",
-                    'current': last_row[metric],
-                    'expected': int(prev_mean)
-                })
-            elif change_pct > 50:
-                alerts.append({
-                    'type': 'spike',
-                    'metric': metric,
-                    'change': f"+{change_pct:.1f}%",
-                    'current': last_row[metric],
-                    'expected': int(prev_mean)
-                })
-        
-        return alerts
+    def platform_metrics(self):
+        """Engine output for every channel of both platforms, from the hourly grids
+
+        Channels whose seasonal baseline is warm take their subscriber anomaly
+        from it (hour-of-week median and MAD) instead of the rolling-mean rule.
+        """
+        if self._metrics is None:
+            frames = []
+            for platform in ['youtube', 'telegram']:
+                grid = self.state.grid(platform)
+                if grid.n_hours == 0:
+                    continue
+                keys = [series_key(platform, key) for key in grid.keys]
+                inputs = self.state.engine(platform).series(grid, 'subscribers', self.now)
+                metrics = compute_grid_metrics(keys, **inputs, now=self.now)
+                seasonal = self.state.baseline(platform).update(grid, platform)
+                metrics = apply_seasonal(metrics, seasonal)
+                others = (seasonal['metric'].to_numpy() != 'subscribers') & seasonal['anomaly_type'].notna().to_numpy()
+                if others.any():
+                    for key, row in zip(seasonal.index[others], seasonal[others].to_dict('records')):
+                        self._seasonal[(key, row['metric'])] = row
+                if not metrics.empty:
+                    frames.append(metrics)
+            self._metrics = pd.concat(frames) if frames else pd.DataFrame()
+        return self._metrics
     
+    def total_metrics(self, metric):
+        """Engine output for the YouTube portfolio total of a metric (None without history)"""
+        if metric not in self._total:
+            grid = self.state.grid('youtube')
+            if not grid.keys or grid.n_hours == 0:
+                # Nothing collected yet (or a replay before the first collection)
+                self._total[metric] = None
+                return None
+            inputs = self.state.engine('youtube').portfolio(grid, metric, self.now)
+            metrics = compute_grid_metrics(['total'], **inputs, now=self.now)
+            self._total[metric] = metrics.iloc[0] if not metrics.empty else None
+        return self._total[metric]
+    
+    def channel_metrics(self, key, platform='youtube'):
+        """Growth rate, predictions and anomalies for one channel (YouTube channel_id or Telegram username)"""
+        # Plain dict rows: one conversion instead of a .loc lookup per channel
+        if self._rows is None:
+            self._rows = self.platform_metrics().to_dict('index')
+        row = self._rows.get(series_key(platform, key))
+        if row is None:
+            return 0, None, []
+        
+        alerts = series_alerts(row)
+        for metric in ['views', 'videos']:
+            seasonal = self._seasonal.get((series_key(platform, key), metric))
+            if seasonal is not None:
+                alerts += series_alerts(seasonal, metric)
+        return series_growth(row), series_predictions(row), alerts
+    
+    @traced()
     def calculate_roi(self, channel_data, costs=None):
         """Calculate ROI for each channel"""
         # Default costs if not provided
@@ -179,10 +176,49 @@ class AnalyticsDashboard:
         
         return roi_data
     
-    def generate_dashboard(self):
-        """Generate complete dashboard data"""
+    def at(self, as_of, snapshots=None, baselines=None, engines=None):
+        """The dashboard as it would have been generated at a past time
+
+        Reads views of this dashboard's grids (no re-filtering of the history) and the
+        collector snapshots in effect then; pass snapshots=(youtube_data, telegram_data)
+        when they are already known, and the seasonal baselines and engine state of an
+        earlier point to carry them forward instead of warming up new ones.
+        """
+        as_of = pd.Timestamp(as_of).to_pydatetime()
+        if snapshots is None:
+            snapshots = [snapshot_at(source, as_of) for source in ['youtube', 'telegram']]
+            snapshots = [snapshot[1] if snapshot else None for snapshot in snapshots]
+        
+        view = AnalyticsDashboard.__new__(AnalyticsDashboard)
+        view.youtube_data, view.telegram_data = snapshots
+        view.state = self.state.as_of(as_of, baselines, engines)
+        view.incremental = True
+        view._metrics = None
+        view._rows = None
+        view._total = {}
+        view._seasonal = {}
+        view.now = as_of
+        return view
+    
+    def replay(self, start, end, step='1h'):
+        """Yield the dashboard at every step from start to end, in one pass over grids and snapshots"""
+        times = [at.to_pydatetime() for at in pd.date_range(start, end, freq=step)]
+        snapshots = zip(snapshots_at('youtube', times), snapshots_at('telegram', times))
+        baselines = engines = None
+        for as_of, pair in zip(times, snapshots):
+            view = self.at(as_of, snapshots=pair, baselines=baselines, engines=engines)
+            yield view.generate_dashboard()
+            # Times only move forward: each point's baselines and engine state update incrementally from the last
+            baselines, engines = view.state.baselines, view.state.engines
+    
+    @traced()
+    def generate_dashboard(self, as_of=None):
+        """Generate complete dashboard data (as of a past time when given, see at())"""
+        if as_of is not None:
+            return self.at(as_of).generate_dashboard()
+        
         dashboard = {
-            'generated_at': datetime.now().isoformat(),
+            'generated_at': (self.now or datetime.now()).isoformat(),
             'summary': {},
             'youtube': {},
             'telegram': {},
@@ -204,15 +240,8 @@ class AnalyticsDashboard:
             }
             
             for channel in self.youtube_data.get('channels', []):
-                # Get channel history
-                channel_history = self.youtube_history[
-                    self.youtube_history['channel_id'] == channel['channel_id']
-                ] if not self.youtube_history.empty else pd.DataFrame()
-                
-                growth_rate = self.calculate_growth_rate(channel_history)
-                predictions = self.predict_growth(channel_history)
+                growth_rate, predictions, alerts = self.channel_metrics(channel['channel_id'])
                 engagement = self.calculate_engagement_rate(channel)
-                alerts = self.detect_anomalies(channel_history)
                 
                 dashboard['youtube']['channels'].append({
                     'name': channel['title'],
@@ -228,30 +257,32 @@ class AnalyticsDashboard:
         
         # Telegram metrics
         if self.telegram_data:
+            telegram_channels = [ch for ch in self.telegram_data.get('channels', []) if 'error' not in ch]
             dashboard['telegram'] = {
+                'total_subscribers': sum(ch.get('subscribers') or 0 for ch in telegram_channels),
                 'channels': []
             }
             
-            for channel in self.telegram_data.get('channels', []):
-                if 'error' not in channel:
-                    # Limited data from Bot API
-                    dashboard['telegram']['channels'].append({
-                        'name': channel['name'],
-                        'username': channel['username'],
-                        'subscribers': channel.get('subscribers', 'N/A'),
-                        'bot_is_admin': channel.get('bot_is_admin', False)
-                    })
-        
-        # Overall predictions
-        if not self.youtube_history.empty:
-            total_history = self.youtube_history.groupby('timestamp').agg({
-                'subscribers': 'sum',
-                'views': 'sum'
-            }).reset_index()
-            
+            for channel in telegram_channels:
+                growth_rate, predictions, alerts = self.channel_metrics(channel['username'], platform='telegram')
+                
+                dashboard['telegram']['channels'].append({
+                    'name': channel['name'],
+                    'username': channel['username'],
+                    'subscribers': channel.get('subscribers', 'N/A'),
+                    'bot_is_admin': channel.get('bot_is_admin', False),
+                    'growth_rate_hourly': growth_rate,
+                    'predictions': predictions,
+                    'alerts': alerts
+                })
+                
+                dashboard['alerts'].extend([{**a, 'channel': channel['name']} for a in alerts])
+        
+        # Overall predictions from the hourly portfolio totals
+        if self.total_metrics('subscribers') is not None:
             dashboard['predictions'] = {
-                'total_subscribers': self.predict_growth(total_history, 'subscribers'),
-                'total_views': self.predict_growth(total_history, 'views')
+                f'total_{metric}': series_predictions(self.total_metrics(metric))
+                for metric in ['subscribers', 'views']
             }
         
         # ROI calculations
@@ -262,26 +293,49 @@ class AnalyticsDashboard:
         
         # Key metrics for 5-minute decisions
         youtube_total_subs = dashboard['youtube'].get('total_subscribers', 0) if 'youtube' in dashboard else 0
+        telegram_total_subs = dashboard['telegram'].get('total_subscribers', 0) if 'telegram' in dashboard else 0
         
-        # Find best channel
+        # Find best channel across both platforms
         best_channel = 'N/A'
-        if dashboard.get('youtube', {}).get('channels'):
-            best = max(dashboard['youtube']['channels'], 
+        all_channels = dashboard.get('youtube', {}).get('channels', []) + dashboard.get('telegram', {}).get('channels', [])
+        if all_channels:
+            best = max(all_channels, 
                       key=lambda x: x.get('growth_rate_hourly', 0),
                       default=None)
             if best:
                 best_channel = best.get('name', 'N/A')
         
         dashboard['summary'] = {
-            'total_reach': youtube_total_subs,
-            'growth_last_24h': self.calculate_growth_rate(self.youtube_history) if not self.youtube_history.empty else 0,
+            'total_reach': youtube_total_subs + telegram_total_subs,
+            'growth_last_24h': self.overall_growth_rate(),
             'best_channel': best_channel,
             'alerts_count': len(dashboard['alerts']),
             'days_to_1000_subs': dashboard['predictions'].get('total_subscribers', {}).get('reach_1000_days') if dashboard.get('predictions', {}).get('total_subscribers') else None
         }
         
+        # Alert conditions over every channel's engine output and grid, for the alerts step
+        names = {series_key('youtube', ch['channel_id']): ch['title'] for ch in (self.youtube_data or {}).get('channels', [])}
+        names.update({series_key('telegram', ch['username']): ch['name']
+                      for ch in (self.telegram_data or {}).get('channels', []) if 'username' in ch})
+        with span('evaluate_rules'):
+            dashboard['conditions'] = evaluate_rules(self.platform_metrics(), names, self.state.grids,
+                                                     dashboard['summary'], dashboard['roi'], now=self.now)
+        if self.now is not None:
+            dashboard['as_of'] = self.now.isoformat()
+        
         return dashboard
     
+    def overall_growth_rate(self):
+        """Hourly growth rate of the total YouTube subscribers over the last 24 hours"""
+        total = self.total_metrics('subscribers')
+        return series_growth(total) if total is not None else 0
+    
+    @traced()
+    def save_state(self):
+        """Persist the hourly grids so the next run only folds in new rows"""
+        self.state.save()
+    
+    @traced()
     def generate_recommendations(self, dashboard):
         """Generate actionable recommendations"""
         recommendations = []
@@ -325,11 +379,37 @@ class AnalyticsDashboard:
         
         return recommendations
     
+    @traced()
+    def build_summary(self, dashboard):
+        """Compact subset of the dashboard for quick checks (read without pandas)"""
+        def channel_rows(platform):
+            return [{
+                'name': channel.get('name'),
+                'subscribers': channel.get('subscribers'),
+                'growth_rate_hourly': channel.get('growth_rate_hourly', 0)
+            } for channel in dashboard.get(platform, {}).get('channels', [])]
+        
+        return {
+            'generated_at': dashboard['generated_at'],
+            'summary': dashboard['summary'],
+            'alerts': dashboard['alerts'],
+            'recommendations': dashboard['recommendations'][:3],
+            'roi': {
+                channel: {'roi_percent': roi['roi_percent'], 'status': roi['status']}
+                for channel, roi in dashboard.get('roi', {}).items()
+            },
+            'youtube': {'channels': channel_rows('youtube')},
+            'telegram': {'channels': channel_rows('telegram')}
+        }
+    
+    @traced()
     def save_dashboard(self, dashboard):
         """Save dashboard to JSON and Markdown with proper None handling"""
-        # Save JSON
-        with open('data/dashboard.json', 'w', encoding='utf-8') as f:
-            json.dump(dashboard, f, indent=2, ensure_ascii=False)
+        # Save JSON (artifacts whose content did not change are left untouched)
+        write_json('data/dashboard.json', dashboard)
+        
+        # Compact summary for quick_metrics and other fast checks
+        write_json('data/summary.json', self.build_summary(dashboard), indent=None, separators=(',', ':'))
         
         # Safe get with defaults for all values
         summary = dashboard.get('summary', {})
@@ -386,6 +466,18 @@ class AnalyticsDashboard:
             
             report += f"| {name} | {subscribers:,} | {growth_rate:.2f}% | {engagement:.1f}% | {pred_str} |\n"
         
+        # Telegram channels (no engagement data from the Bot API)
+        for channel in dashboard.get('telegram', {}).get('channels', []):
+            name = channel.get('name', 'Unknown')
+            subscribers = channel.get('subscribers', 'N/A')
+            subs_str = f"{subscribers:,}" if isinstance(subscribers, (int, float)) else str(subscribers)
+            growth_rate = channel.get('growth_rate_hourly', 0) or 0
+            predictions = channel.get('predictions', {})
+            pred_7d = predictions.get('predicted_7d') if predictions else None
+            pred_str = str(pred_7d) if pred_7d is not None else 'N/A'
+            
+            report += f"| {name} (Telegram) | {subs_str} | {growth_rate:.2f}% | N/A | {pred_str} |\n"
+        
         report += "\n## 💰 ROI Analysis\n\n"
         report += "| Channel | Cost | Potential Revenue | ROI | Status |\n"
         report += "|---------|------|------------------|-----|--------|\n"
@@ -416,23 +508,18 @@ class AnalyticsDashboard:
             report += f"{emoji} **{priority}** - {channel}: {action}\n"
             report += f"   - *Reason: {reason}*\n\n"
         
-        # Save markdown
-        with open('dashboard.md', 'w', encoding='utf-8') as f:
-            f.write(report)
+        # Save markdown (the Generated line alone does not count as a change)
+        write_text('dashboard.md', report)
         
-        print("✅ Dashboard saved to dashboard.md and data/dashboard.json")
+        print("✅ Dashboard saved to dashboard.md, data/dashboard.json and data/summary.json")
+        report_writes()
         
         return report
 
-def main():
-    """Generate dashboard"""
-    dashboard = AnalyticsDashboard()
-    data = dashboard.generate_dashboard()
-    report = dashboard.save_dashboard(data)
-    
-    # Print summary
+def print_summary(data):
+    """Print the headline numbers of a dashboard"""
     print("\n" + "="*60)
-    print("📊 DASHBOARD GENERATED SUCCESSFULLY")
+    print("📊 DASHBOARD GENERATED SUCCESSFULLY" if 'as_of' not in data else f"📊 DASHBOARD AS OF {data['as_of']}")
     print("="*60)
     print(f"Total Reach: {data['summary']['total_reach']:,}")
     print(f"Growth Rate: {data['summary']['growth_last_24h']:.2f}% per hour")
@@ -447,5 +534,55 @@ def main():
         for alert in data['alerts'][:3]:  # Show top 3
             print(f"   - {alert['channel']}: {alert['metric']} {alert['change']}")
 
+def replay_dashboards(dashboard, start, end, step, out_dir=REPLAY_DIR):
+    """Write one compact dashboard per step (summary, alerts, conditions, recommendations) as JSON lines"""
+    os.makedirs(out_dir, exist_ok=True)
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    path = os.path.join(out_dir, f"replay_{start:%Y%m%d_%H%M}_{end:%Y%m%d_%H%M}.jsonl")
+    started = datetime.now()
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for data in dashboard.replay(start, end, step):
+            record = {'as_of': data['as_of'], **dashboard.build_summary(data), 'conditions': data['conditions']}
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+            count += 1
+    elapsed = (datetime.now() - started).total_seconds()
+    print(f"⏪ {count:,} dashboards from {start} to {end} in {elapsed:.1f}s -> {path}")
+    return path
+
+def main():
+    """Generate dashboard"""
+    parser = argparse.ArgumentParser(description='Generate the analytics dashboard')
+    parser.add_argument('--full-rebuild', action='store_true', help='recompute from the whole history')
+    parser.add_argument('--as-of', metavar='TIME', help='reconstruct the dashboard at a past time')
+    parser.add_argument('--replay', nargs=2, metavar=('START', 'END'), help='reconstruct a dashboard every --step')
+    parser.add_argument('--step', default='1h', help='replay interval (pandas frequency, default 1h)')
+    args = parser.parse_args()
+    
+    # Incremental by default; --full-rebuild recomputes from the whole history
+    dashboard = AnalyticsDashboard(incremental=not args.full_rebuild)
+    
+    # Replays read the current state; nothing under the live artifacts changes
+    if args.replay:
+        replay_dashboards(dashboard, *args.replay, args.step)
+        export('dashboard_replay')
+        return
+    if args.as_of:
+        data = dashboard.generate_dashboard(as_of=args.as_of)
+        os.makedirs(REPLAY_DIR, exist_ok=True)
+        path = os.path.join(REPLAY_DIR, f"dashboard_{pd.Timestamp(args.as_of):%Y%m%d_%H%M%S}.json")
+        write_json(path, data)
+        print_summary(data)
+        print(f"\n⏪ Saved to {path}")
+        export('dashboard_replay')
+        return
+    
+    data = dashboard.generate_dashboard()
+    report = dashboard.save_dashboard(data)
+    dashboard.save_state()
+    
+    print_summary(data)
+    export('dashboard')
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Vectorized analytics engine for AI Media Empire
+Computes growth, linear trend and anomaly statistics for every row of an hourly
+grid (see hourly_grid.py) in one pass of array ops over its incremental engine
+state (see engine_state.py)
+"""
+
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+from instrumentation import traced
+
+# Trend and anomaly rules of the dashboard
+MIN_TREND_POINTS = 3
+MIN_ANOMALY_POINTS = 10
+ROLLING_WINDOW = 5
+DROP_THRESHOLD = -10
+SPIKE_THRESHOLD = 50
+
+
+def series_key(platform, key):
+    """Engine key of one platform's series (YouTube channel_id, Telegram username)"""
+    return f"{platform}:{key}"
+
+
+def last_true(mask):
+    """Column of the last True cell per row (-1 for rows without one)"""
+    if mask.shape[1] == 0:
+        return np.full(mask.shape[0], -1)
+    last = mask.shape[1] - 1 - np.argmax(mask[:, ::-1], axis=1)
+    return np.where(mask.any(axis=1), last, -1)
+
+
+@traced()
+def compute_grid_metrics(keys, sums, first, last, current, window, window_hours, tail, now=None, days_ahead=7):
+    """Growth rate, trend and anomaly check for every row of an hourly grid
+
+    The inputs come from the grid's engine state (see engine_state.py): sums holds
+    the least-squares sums (n, Σx, Σy, Σx², Σxy) of each row's observed hours with x
+    in hours since its first observation, first/last are the columns of its first
+    and last observation (-1 for none) and current the value at the last one.
+    window holds the raw columns from 24 hours before `now` on (hour axis
+    window_hours), tail the forward-filled last MIN_ANOMALY_POINTS hours up to each
+    row's last observation. Returns a DataFrame indexed by key with
+    growth_rate_hourly, has_growth, points, slope, intercept, current, predicted,
+    reach_1000_days, anomaly_type, change_pct, expected and last (column of the
+    last observation) columns. The windows are in hours on the grid rather than in
+    rows, so collection jitter, duplicated runs and skipped runs don't change the results.
+    """
+    now = now or datetime.now()
+    n_series = len(keys)
+    if n_series == 0:
+        return pd.DataFrame()
+
+    rows = np.arange(n_series)
+    points = sums[:, 0].astype(int)
+
+    # Columns are collected first and framed once (inserting columns one by one dominates small grids)
+    result = {}
+    result['points'] = points
+
+    # --- Growth over the last 24 hours (first vs last observed hour in the window)
+    window_from = np.datetime64(pd.Timestamp(now - timedelta(days=1)).floor('h'), 'h')
+    in_window = ~np.isnan(window) & (window_hours >= window_from)[None, :]
+    w_first = np.argmax(in_window, axis=1) if window.shape[1] else np.zeros(n_series, dtype=int)
+    w_last = last_true(in_window)
+    span = (w_last - w_first).astype(float)
+    if window.shape[1]:
+        start_val = window[rows, w_first]
+        end_val = window[rows, np.maximum(w_last, 0)]
+    else:
+        start_val = end_val = np.full(n_series, np.nan)
+    has_growth = (in_window.sum(axis=1) >= 2) & (start_val != 0) & (span > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = ((end_val - start_val) / start_val) / span * 100
+    result['growth_rate_hourly'] = np.where(has_growth, rate, 0.0)
+    result['has_growth'] = has_growth
+
+    # --- Least squares over the observed hours, x = hours since each series' first observation
+    n, sx, sy, sxx, sxy = sums.T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_mean = sx / n
+        y_mean = sy / n
+        denominator = sxx - sx * x_mean
+        slope = (sxy - sx * y_mean) / denominator
+        intercept = y_mean - slope * x_mean
+
+    x_last = (last - first).astype(float)
+    predicted = slope * (x_last + days_ahead * 24 - 1) + intercept
+
+    has_trend = (points >= MIN_TREND_POINTS) & (denominator > 0)
+    result['slope'] = np.where(has_trend, slope, np.nan)
+    result['intercept'] = np.where(has_trend, intercept, np.nan)
+    result['current'] = current
+    result['predicted'] = np.where(has_trend, predicted, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        reach = (1000 - current) / (slope * 24)
+    result['reach_1000_days'] = np.where(has_trend & (slope > 0), reach, np.nan)
+
+    # --- Last observed hour vs the mean of the 5 preceding 5-hour rolling means
+    anomaly_type = np.full(n_series, None, dtype=object)
+    change_pct = np.full(n_series, np.nan)
+    expected = np.full(n_series, np.nan)
+
+    eligible = np.flatnonzero(points >= MIN_ANOMALY_POINTS)
+    if len(eligible):
+        # Last 10 hours up to each eligible series' last observation (NaN = gap)
+        tail = tail[eligible]
+        known = ~np.isnan(tail)
+        tail_zero = np.where(known, tail, 0.0)
+
+        # rolling(5, min_periods=1) over the hours that have a value
+        totals = np.stack([tail_zero[:, j - ROLLING_WINDOW + 1:j + 1].sum(axis=1)
+                           for j in range(ROLLING_WINDOW - 1, MIN_ANOMALY_POINTS - 1)], axis=1)
+        counts = np.stack([known[:, j - ROLLING_WINDOW + 1:j + 1].sum(axis=1)
+                           for j in range(ROLLING_WINDOW - 1, MIN_ANOMALY_POINTS - 1)], axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rolling = totals / counts
+            prev_mean = np.nansum(rolling, axis=1) / (counts > 0).sum(axis=1)
+            last_val = tail[:, -1]
+            pct = (last_val - prev_mean) / prev_mean * 100
+        positive = prev_mean > 0
+
+        drops = positive & (pct < DROP_THRESHOLD)
+        spikes = positive & (pct > SPIKE_THRESHOLD)
+        anomaly_type[eligible[drops]] = 'drop'
+        anomaly_type[eligible[spikes]] = 'spike'
+        change_pct[eligible] = pct
+        expected[eligible] = prev_mean
+
+    result['anomaly_type'] = anomaly_type
+    result['change_pct'] = change_pct
+    result['expected'] = expected
+    result['last'] = last
+
+    # Rows that were never observed have nothing to report
+    result = pd.DataFrame(result, index=pd.Index(keys, name='series'))
+    return result[points > 0]
+
+
+@traced()
+def grid_total(values, observed):
+    """Portfolio total per hour of a grid, and the hours where it is complete
+
+    An hour counts when every series active at that time (between its first and
+    last observation) has a value, so a channel in a gap doesn't look like a drop.
+    """
+    cols = np.arange(values.shape[1])
+    first = np.where(observed.any(axis=1), np.argmax(observed, axis=1), values.shape[1])
+    active = (cols[None, :] >= first[:, None]) & (cols[None, :] <= last_true(observed)[:, None])
+    complete = ~(active & np.isnan(values)).any(axis=0) & observed.any(axis=0)
+    total = np.where(active, np.nan_to_num(values), 0.0).sum(axis=0)
+    return np.where(complete, total, np.nan)[None, :], complete[None, :]
+
+
+def series_growth(row):
+    """Hourly growth rate (%) over the last 24 hours from one engine row (0 without a window)"""
+    return float(row['growth_rate_hourly']) if row['has_growth'] else 0
+
+
+def series_predictions(row):
+    """Trend and 7-day prediction from one engine row (None without a trend)"""
+    if pd.isna(row['predicted']):
+        return None
+    return {
+        'current': int(row['current']),
+        'predicted_7d': int(row['predicted']),
+        'daily_growth': int(row['slope'] * 24),
+        'reach_1000_days': float(row['reach_1000_days']) if not pd.isna(row['reach_1000_days']) else None
+    }
+
+
+def series_alerts(row, metric='subscribers'):
+    """Drop/spike alert list from one engine row"""
+    if pd.isna(row['anomaly_type']):
+        return []
+    change = row['change_pct']
+    return [{
+        'type': row['anomaly_type'],
+        'metric': metric,
+        'change': f"{change:.1f}%" if row['anomaly_type'] == 'drop' else f"+{change:.1f}%",
+        'current': int(row['current']),
+        'expected': int(row['expected'])
+    }]
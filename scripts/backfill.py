@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Rebuild full-fidelity history from the raw collector snapshots
+Parses every YouTube/Telegram snapshot (loose files and archive segments) in a
+process pool and writes one unified, deduplicated, time-sorted table with every
+field the collectors captured, one month at a time
+
+Output: data/history/unified/<YYYY-MM>.parquet
+Usage:  python scripts/backfill.py [--workers N] [--restart]
+"""
+
+import os
+import sys
+import json
+import gzip
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+from history_store import HistoryStore
+from snapshot_archive import SnapshotArchive, loose_snapshots, load_snapshot, resolve, SOURCES
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+UNIFIED_SOURCE = 'unified'
+CHECKPOINT_PATH = 'data/history/unified/_checkpoint.json'
+
+# Snapshots parsed per worker task
+TASK_SIZE = 100
+
+# Every field the collectors ever captured, with a stable dtype per column
+COLUMNS = {
+    'timestamp': 'datetime64[us]',
+    'snapshot': 'string',
+    'platform': 'string',      # youtube | telegram
+    'kind': 'string',          # channel | video
+    'key': 'string',           # YouTube channel_id / video_id, Telegram username
+    'channel_id': 'string',
+    'handle': 'string',
+    'username': 'string',
+    'name': 'string',
+    'title': 'string',
+    'description': 'string',
+    'published_at': 'string',
+    'country': 'string',
+    'type': 'string',
+    'invite_link': 'string',
+    'uploads_playlist': 'string',
+    'video_id': 'string',
+    'channel_title': 'string',
+    'duration': 'string',
+    'subscribers': 'Int64',
+    'views': 'Int64',
+    'videos': 'Int64',
+    'likes': 'Int64',
+    'comments': 'Int64',
+    'has_visible_history': 'boolean',
+    'bot_is_admin': 'boolean',
+    'bot_status': 'string',
+    'error': 'string',
+    'chat_exists': 'boolean',
+    'chat_title': 'string',
+    'chat_type': 'string',
+    'chat_members': 'Int64'
+}
+
+DEDUP_KEYS = ['platform', 'kind', 'key', 'timestamp']
+
+
+def list_snapshots(data_dir='data'):
+    """Locators for every snapshot, grouped by month: {month: [(source, key, locator)]}"""
+    months = {}
+    for source in SOURCES:
+        archive = SnapshotArchive(source, root=os.path.join(data_dir, 'archive'))
+        for entry in archive.index:
+            locator = (os.path.join(archive.path, entry['segment']), entry['offset'], entry['length'])
+            months.setdefault(f"{entry['key'][:4]}-{entry['key'][4:6]}", []).append((source, entry['key'], locator))
+
+        for key, path in loose_snapshots(source, data_dir):
+            if key not in archive:
+                months.setdefault(f"{key[:4]}-{key[4:6]}", []).append((source, key, path))
+
+    return dict(sorted(months.items()))
+
+
+def read_snapshot(locator):
+    """Read one snapshot from a loose file path or an archive (segment, offset, length)"""
+    if isinstance(locator, str):
+        with open(locator, 'rb') as f:
+            return loads(f.read())
+
+    segment, offset, length = locator
+    with open(segment, 'rb') as f:
+        f.seek(offset)
+        return loads(gzip.decompress(f.read(length)))
+
+
+def flatten_snapshot(source, key, snapshot):
+    """Turn one snapshot into unified rows"""
+    rows = []
+
+    if source == 'youtube':
+        for channel in snapshot.get('channels', []):
+            rows.append({
+                **channel,
+                'snapshot': key,
+                'platform': 'youtube',
+                'kind': 'channel',
+                'key': channel['channel_id']
+            })
+        for video in snapshot.get('recent_videos', []):
+            rows.append({
+                **video,
+                'timestamp': snapshot['generated_at'],
+                'snapshot': key,
+                'platform': 'youtube',
+                'kind': 'video',
+                'key': video['video_id']
+            })
+
+    elif source == 'telegram':
+        for channel in snapshot.get('channels', []):
+            row = {key_: value for key_, value in channel.items() if key_ != 'chat_data'}
+            row.update(channel.get('chat_data') or {})
+            row.update({
+                'channel_id': str(channel['channel_id']) if channel.get('channel_id') is not None else None,
+                'snapshot': key,
+                'platform': 'telegram',
+                'kind': 'channel',
+                'key': channel['username']
+            })
+            rows.append(row)
+
+    return rows
+
+
+def parse_task(items):
+    """Worker: parse and flatten a batch of (source, key, locator)"""
+    rows = []
+    # Full snapshots that unchanged runs refer to, loaded once per task
+    referenced = {}
+    for source, key, locator in items:
+        def lookup(ref):
+            if (source, ref) not in referenced:
+                referenced[(source, ref)] = load_snapshot(source, ref, resolved=False)
+            return referenced[(source, ref)]
+
+        try:
+            snapshot = resolve(read_snapshot(locator), lookup)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"  ⚠️  Skipping unreadable snapshot {source}_{key}: {e}")
+            continue
+        rows.extend(flatten_snapshot(source, key, snapshot))
+    return rows
+
+
+def to_frame(rows):
+    """Unified DataFrame with every column typed, deduplicated and time-sorted"""
+    df = pd.DataFrame(rows).reindex(columns=list(COLUMNS))
+    df['timestamp'] = pd.to_datetime(df['timestamp'], format='ISO8601')
+    df = df.astype({column: dtype for column, dtype in COLUMNS.items() if column != 'timestamp'})
+    df = df.drop_duplicates(subset=DEDUP_KEYS, keep='last')
+    return df.sort_values(['timestamp', 'platform', 'kind', 'key'], kind='stable').reset_index(drop=True)
+
+
+def load_checkpoint():
+    if os.path.exists(CHECKPOINT_PATH):
+        with open(CHECKPOINT_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_checkpoint(checkpoint):
+    os.makedirs(os.path.dirname(CHECKPOINT_PATH), exist_ok=True)
+    tmp_path = CHECKPOINT_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, CHECKPOINT_PATH)
+
+
+def backfill(workers=None, restart=False):
+    """Rebuild the unified history, skipping months already done with the same inputs"""
+    store = HistoryStore(UNIFIED_SOURCE)
+    checkpoint = {} if restart else load_checkpoint()
+    months = list_snapshots()
+
+    total_rows = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for month, items in months.items():
+            fingerprint = {'snapshots': len(items), 'last_key': max(key for _, key, _ in items)}
+            if checkpoint.get(month) == fingerprint:
+                print(f"⏭️  {month}: up to date ({len(items):,} snapshots)")
+                continue
+
+            # One month in memory at a time keeps the footprint bounded
+            items.sort(key=lambda item: item[1])
+            tasks = [items[i:i + TASK_SIZE] for i in range(0, len(items), TASK_SIZE)]
+            rows = [row for task_rows in pool.map(parse_task, tasks) for row in task_rows]
+
+            df = to_frame(rows)
+            store.write_partition(month, df)
+            total_rows += len(df)
+
+            checkpoint[month] = fingerprint
+            save_checkpoint(checkpoint)
+            print(f"✅ {month}: {len(items):,} snapshots -> {len(df):,} rows")
+
+    return total_rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Rebuild unified history from raw snapshots')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--restart', action='store_true', help='ignore the checkpoint and rebuild every month')
+    args = parser.parse_args()
+
+    rows = backfill(workers=args.workers, restart=args.restart)
+    print(f"\n📦 Wrote {rows:,} rows to data/history/{UNIFIED_SOURCE}/")
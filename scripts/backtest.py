@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Rolling-origin backtest of the growth forecasts
+Replays every channel's hourly grid (see hourly_grid.py): at each origin the
+candidate models are fitted on the hours observed up to then and scored against
+the values observed 1, 3 and 7 days later. Fits for all origins of a block of
+series come out of one set of prefix sums (no refit per origin), and the blocks
+run in a process pool
+
+Models: linear   least squares over the whole history (what the dashboard uses)
+        window   least squares over the last WINDOW_HOURS
+        damped   Holt's linear trend with a damped trend
+        log      y = a + b·ln(1 + hours since the first observation)
+Layout: data/backtest/backtest_<YYYYMMDD_HHMMSS>.json
+Usage:  python scripts/backtest.py [--step 6] [--horizons 24 72 168] [--window 168] [--workers N]
+        python scripts/backtest.py --platform telegram --per-series
+"""
+
+import os
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from dashboard_state import DashboardState
+from analytics_engine import MIN_TREND_POINTS, grid_total, series_key
+from write_layer import write_json
+from instrumentation import span, traced, export
+
+BACKTEST_DIR = 'data/backtest'
+
+MODELS = ['linear', 'window', 'damped', 'log']
+
+# Hours ahead that are scored; 168 is the dashboard's predicted_7d
+HORIZONS = [24, 72, 168]
+# Hours between two forecast origins
+ORIGIN_STEP = 6
+# Hours of history a series needs before its first origin
+MIN_HISTORY = 72
+# Fit window of the windowed linear model
+WINDOW_HOURS = 7 * 24
+
+# Damped trend smoothing (per hour): level, trend, damping. PHI = 0.99 caps the
+# extrapolated trend at ~99 hours' worth however far ahead the forecast goes
+ALPHA = 0.3
+BETA = 0.05
+PHI = 0.99
+
+# Series per process-pool task
+BLOCK_SERIES = 8
+
+# Error sums kept per (model, horizon, series); metrics are derived from them at the end
+STATS = ['n', 'abs', 'sq', 'err', 'ape', 'n_ape']
+
+
+def prefix(a):
+    """Cumulative sums along the hour axis with a leading zero column: sum of [i, j) = p[:, j] - p[:, i]"""
+    out = np.zeros((a.shape[0], a.shape[1] + 1))
+    np.cumsum(a, axis=1, out=out[:, 1:])
+    return out
+
+
+def least_squares(x, y, observed, origins, window=None):
+    """Slope and intercept of y on x over the observed hours up to each origin (series × origins)
+
+    Five prefix sums give the normal equations of every origin at once; with
+    `window`, only the last `window` hours before each origin count.
+    """
+    x = np.where(observed, x, 0.0)
+    y = np.where(observed, y, 0.0)
+    sums = [prefix(a) for a in (observed.astype(float), x, y, x * x, x * y)]
+    end = origins + 1
+    start = np.zeros_like(end) if window is None else np.maximum(end - window, 0)
+    n, sx, sy, sxx, sxy = (p[:, end] - p[:, start] for p in sums)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        denominator = n * sxx - sx * sx
+        slope = (n * sxy - sx * sy) / denominator
+        intercept = (sy - slope * sx) / n
+    fitted = (n >= MIN_TREND_POINTS) & (denominator > 0)
+    return np.where(fitted, slope, np.nan), np.where(fitted, intercept, np.nan)
+
+
+def damped_trend(values, observed, origins, horizons, alpha=ALPHA, beta=BETA, phi=PHI):
+    """Forecasts (series × origins × horizons) of Holt's method with a damped trend
+
+    One pass over the hours for all series together; an hour without an
+    observation advances the forecast without updating it.
+    """
+    n_series = values.shape[0]
+    level = np.full(n_series, np.nan)
+    trend = np.zeros(n_series)
+    levels = np.full((n_series, len(origins)), np.nan)
+    trends = np.zeros((n_series, len(origins)))
+    at_origin = np.full(origins[-1] + 1, -1)
+    at_origin[origins] = np.arange(len(origins))
+
+    for col in range(origins[-1] + 1):
+        y = values[:, col]
+        obs = observed[:, col]
+        started = ~np.isnan(level)
+        first = obs & ~started
+        level[first] = y[first]
+
+        update = obs & started
+        projected = level + phi * trend
+        new_level = np.where(update, alpha * y + (1 - alpha) * projected, projected)
+        trend = np.where(update, beta * (new_level - level) + (1 - beta) * phi * trend, phi * trend)
+        level = np.where(first, level, new_level)
+        if at_origin[col] >= 0:
+            levels[:, at_origin[col]] = level
+            trends[:, at_origin[col]] = trend
+
+    # Sum of phi^i for i = 1..h
+    damping = phi * (1 - phi ** np.asarray(horizons, dtype=float)) / (1 - phi)
+    return levels[:, :, None] + trends[:, :, None] * damping[None, None, :]
+
+
+def forecasts(values, observed, origins, horizons, window=WINDOW_HOURS):
+    """{model: series × origins × horizons forecasts} from the hours up to each origin"""
+    cols = np.arange(values.shape[1])
+    first = np.argmax(observed, axis=1)
+    # Offsets from each series' first observation keep the prefix sums small
+    y0 = values[np.arange(len(values)), first]
+    x = (cols[None, :] - first[:, None]).astype(float)
+    y = values - y0[:, None]
+    ahead = (origins[:, None] + np.asarray(horizons)[None, :] - first[:, None, None]).astype(float)
+
+    result = {}
+    slope, intercept = least_squares(x, y, observed, origins)
+    result['linear'] = y0[:, None, None] + intercept[:, :, None] + slope[:, :, None] * ahead
+
+    slope, intercept = least_squares(x, y, observed, origins, window=window)
+    result['window'] = y0[:, None, None] + intercept[:, :, None] + slope[:, :, None] * ahead
+
+    result['damped'] = damped_trend(values, observed, origins, horizons)
+
+    with np.errstate(invalid='ignore'):
+        log_x = np.log1p(np.maximum(x, 0))
+        slope, intercept = least_squares(log_x, y, observed, origins)
+        result['log'] = y0[:, None, None] + intercept[:, :, None] + slope[:, :, None] * np.log1p(ahead)
+    return result
+
+
+def evaluate_block(values, origins, horizons, window=WINDOW_HOURS, min_history=MIN_HISTORY):
+    """Error sums (models × horizons × series × STATS) of one block of series
+
+    An origin counts for a series when it is an observed hour at least
+    `min_history` hours after the series' first observation; the forecast is
+    scored against the value observed exactly `horizon` hours later.
+    """
+    observed = ~np.isnan(values)
+    sums = np.zeros((len(MODELS), len(horizons), len(values), len(STATS)))
+    n_hours = values.shape[1]
+    if len(origins) == 0 or n_hours == 0:
+        return sums
+
+    first = np.argmax(observed, axis=1)
+    origin_ok = observed[:, origins] & (origins[None, :] - first[:, None] >= min_history)
+
+    targets = origins[:, None] + np.asarray(horizons)[None, :]
+    in_range = targets < n_hours
+    actual = np.where(in_range, values[:, np.minimum(targets, n_hours - 1)], np.nan)
+    scored = origin_ok[:, :, None] & in_range[None, :, :] & ~np.isnan(actual)
+
+    predicted = forecasts(values, observed, origins, horizons, window)
+    for m, model in enumerate(MODELS):
+        forecast = predicted[model]
+        valid = scored & np.isfinite(forecast)
+        error = np.where(valid, forecast - actual, 0.0)
+        positive = valid & (actual > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ape = np.where(positive, np.abs(error) / actual * 100, 0.0)
+        # Sum over origins: horizons × series
+        stats = [valid.sum(axis=1), np.abs(error).sum(axis=1), (error * error).sum(axis=1), error.sum(axis=1),
+                 ape.sum(axis=1), positive.sum(axis=1)]
+        sums[m] = np.stack(stats, axis=-1).transpose(1, 0, 2)
+    return sums
+
+
+def backtest_series(platforms=('youtube', 'telegram')):
+    """Keys and raw subscriber matrices (NaN = not observed) of every series to backtest
+
+    Includes the YouTube portfolio total, whose forecast drives days_to_1000_subs.
+    """
+    state = DashboardState.load() or DashboardState()
+    state.fold_history()
+
+    keys, blocks, hours = [], [], []
+    for platform in platforms:
+        grid = state.grid(platform)
+        if not grid.keys or grid.n_hours == 0:
+            continue
+        keys += [series_key(platform, key) for key in grid.keys]
+        blocks.append(grid.matrix('subscribers'))
+        hours.append(grid.hours)
+        if platform == 'youtube':
+            values, complete = grid_total(*grid.filled('subscribers'))
+            keys.append(series_key(platform, 'total'))
+            blocks.append(np.where(complete, values, np.nan))
+            hours.append(grid.hours)
+    if not blocks:
+        return [], np.empty((0, 0)), np.array([], dtype='datetime64[h]')
+
+    # One hour axis for every platform
+    axis = np.arange(min(h[0] for h in hours), max(h[-1] for h in hours) + 1)
+    values = np.full((len(keys), len(axis)), np.nan)
+    row = 0
+    for block, block_hours in zip(blocks, hours):
+        offset = int((block_hours[0] - axis[0]).astype(int))
+        values[row:row + len(block), offset:offset + block.shape[1]] = block
+        row += len(block)
+    return keys, values, axis
+
+
+def metrics(stats):
+    """MAE, RMSE, MAPE and bias from error sums (last axis = STATS)"""
+    n, abs_sum, sq_sum, err_sum, ape_sum, n_ape = np.moveaxis(stats, -1, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'n': n.astype(int),
+            'mae': abs_sum / n,
+            'rmse': np.sqrt(sq_sum / n),
+            'mape': ape_sum / n_ape,
+            'bias': err_sum / n
+        }
+
+
+def rounded(value):
+    return None if not np.isfinite(value) else round(float(value), 3)
+
+
+@traced()
+def run_backtest(keys, values, horizons=HORIZONS, step=ORIGIN_STEP, window=WINDOW_HOURS,
+                 min_history=MIN_HISTORY, workers=None):
+    """Error sums (models × horizons × series × STATS) of every series, blocks spread over a process pool"""
+    origins = np.arange(min_history, values.shape[1], step)
+    blocks = [values[i:i + BLOCK_SERIES] for i in range(0, len(keys), BLOCK_SERIES)]
+    args = (origins, list(horizons), window, min_history)
+
+    if workers == 1 or len(blocks) <= 1:
+        results = [evaluate_block(block, *args) for block in blocks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(evaluate_block, blocks, *([arg] * len(blocks) for arg in args)))
+
+    if not results:
+        return np.zeros((len(MODELS), len(horizons), 0, len(STATS))), origins
+    return np.concatenate(results, axis=2), origins
+
+
+def report(keys, sums, horizons, per_series=False):
+    """Overall metrics per model and horizon, plus the best model of each series"""
+    overall = metrics(sums.sum(axis=2))
+    result = {'overall': {}, 'best': {}}
+    for m, model in enumerate(MODELS):
+        result['overall'][model] = {
+            str(h): {name: rounded(values[m, j]) if name != 'n' else int(values[m, j])
+                     for name, values in overall.items()}
+            for j, h in enumerate(horizons)
+        }
+
+    per_key = metrics(sums)
+    for j, h in enumerate(horizons):
+        mae = per_key['mae'][:, j, :]
+        has_score = np.isfinite(mae).any(axis=0)
+        best = np.argmin(np.where(np.isfinite(mae), mae, np.inf), axis=0)
+        wins = np.bincount(best[has_score], minlength=len(MODELS))
+        result['best'][str(h)] = {model: int(wins[m]) for m, model in enumerate(MODELS)}
+
+    if per_series:
+        result['series'] = {}
+        for i, key in enumerate(keys):
+            result['series'][key] = {
+                model: {str(h): {'n': int(per_key['n'][m, j, i]), 'mae': rounded(per_key['mae'][m, j, i]),
+                                 'mape': rounded(per_key['mape'][m, j, i])}
+                        for j, h in enumerate(horizons)}
+                for m, model in enumerate(MODELS)
+            }
+    return result
+
+
+def print_report(result, horizons):
+    print(f"\n{'model':<8} " + ' '.join(f"{f'MAE {h}h':>12} {f'MAPE {h}h':>10}" for h in horizons))
+    for model in MODELS:
+        cells = []
+        for h in horizons:
+            scores = result['overall'][model][str(h)]
+            mae = f"{scores['mae']:,.1f}" if scores['mae'] is not None else '-'
+            mape = f"{scores['mape']:.2f}%" if scores['mape'] is not None else '-'
+            cells.append(f"{mae:>12} {mape:>10}")
+        print(f"{model:<8} " + ' '.join(cells))
+
+    print("\n🏆 Best model per series (lowest MAE):")
+    for h in horizons:
+        wins = result['best'][str(h)]
+        print(f"   {h:>4}h: " + ', '.join(f"{model} {count}" for model, count in wins.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backtest the growth forecasts with rolling origins')
+    parser.add_argument('--platform', choices=['youtube', 'telegram'], help='only one platform (default: both)')
+    parser.add_argument('--horizons', type=int, nargs='+', default=HORIZONS, help='hours ahead to score')
+    parser.add_argument('--step', type=int, default=ORIGIN_STEP, help='hours between forecast origins')
+    parser.add_argument('--window', type=int, default=WINDOW_HOURS, help='fit window of the windowed model')
+    parser.add_argument('--min-history', type=int, default=MIN_HISTORY, help='hours of history before the first origin')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--per-series', action='store_true', help='also save the scores of every series')
+    args = parser.parse_args()
+
+    started = datetime.now()
+    with span('load grids'):
+        keys, values, hours = backtest_series([args.platform] if args.platform else ['youtube', 'telegram'])
+    if not keys:
+        print("⏭️  No history to backtest yet")
+        return
+
+    sums, origins = run_backtest(keys, values, args.horizons, args.step, args.window, args.min_history, args.workers)
+    elapsed = (datetime.now() - started).total_seconds()
+    result = {
+        'generated_at': started.isoformat(),
+        'hours': [str(hours[0]), str(hours[-1])],
+        'config': {'horizons': args.horizons, 'step': args.step, 'window': args.window,
+                   'min_history': args.min_history, 'alpha': ALPHA, 'beta': BETA, 'phi': PHI},
+        **report(keys, sums, args.horizons, per_series=args.per_series)
+    }
+    path = os.path.join(BACKTEST_DIR, f"backtest_{started:%Y%m%d_%H%M%S}.json")
+    write_json(path, result)
+
+    scored = int(sums[..., STATS.index('n')].sum())
+    print(f"🔁 {len(keys)} series × {len(origins):,} origins × {len(MODELS)} models × {len(args.horizons)} horizons: "
+          f"{scored:,} forecasts scored in {elapsed:.1f}s")
+    print_report(result, args.horizons)
+    print(f"\n💾 Saved to {path}")
+    export('backtest')
+
+
+if __name__ == "__main__":
+    main()
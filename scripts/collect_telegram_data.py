@@ -5,13 +5,28 @@ Collects basic data for all channels using only Bot API
 """
 
 import os
+import sys
 import json
+import asyncio
 import requests
 from datetime import datetime
 import pandas as pd
 
+from history_store import HistoryStore
+from rollups import update_rollups
+from series_store import SeriesStore
+from snapshot_archive import write_snapshot
+from write_layer import write_json, report as report_writes
+from http_client import AsyncHTTPClient
+from instrumentation import span, traced, export
+
 # Configuration
 BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN')
+API_BASE = os.environ.get('TELEGRAM_API_BASE', 'https://api.telegram.org')
+
+# Concurrent collection settings
+MAX_CONCURRENCY = int(os.environ.get('TELEGRAM_MAX_CONCURRENCY', 8))
+REQUEST_TIMEOUT = float(os.environ.get('TELEGRAM_REQUEST_TIMEOUT', 10))
 
 # Channels to track (SAVED IN MEMORY!)
 CHANNELS = {
@@ -35,7 +50,7 @@ CHANNELS = {
 
 def get_chat_info(chat_id):
     """Get basic chat information using Bot API"""
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/getChat"
+    url = f"{API_BASE}/bot{BOT_TOKEN}/getChat"
     params = {'chat_id': chat_id}
     
     try:
@@ -53,7 +68,7 @@ def get_chat_info(chat_id):
 
 def get_chat_member_count(chat_id):
     """Try to get member count (works for some channels)"""
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/getChatMemberCount"
+    url = f"{API_BASE}/bot{BOT_TOKEN}/getChatMemberCount"
     params = {'chat_id': chat_id}
     
     try:
@@ -69,7 +84,7 @@ def get_chat_member_count(chat_id):
 
 def check_bot_is_admin(chat_id):
     """Check if bot is admin in the channel"""
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/getChatMember"
+    url = f"{API_BASE}/bot{BOT_TOKEN}/getChatMember"
     params = {
         'chat_id': chat_id,
         'user_id': BOT_TOKEN.split(':')[0]  # Bot's own ID
@@ -106,72 +121,175 @@ def analyze_chat_activity(chat_id):
         }
     return {'chat_exists': False}
 
-def main():
-    """Main collection function"""
-    print(f"Starting Telegram data collection (Bot API) at {datetime.now()}")
+def build_result(username, info, channel_info, member_count, bot_status, chat_data):
+    """Assemble one channel record from the Bot API responses"""
+    if not channel_info:
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'username': username,
+            'name': info['name'],
+            'error': 'Bot cannot access channel',
+            'bot_is_admin': False
+        }
     
-    if not BOT_TOKEN:
-        print("❌ Error: TELEGRAM_BOT_TOKEN not set!")
-        print("Add it to GitHub secrets or environment variables")
+    # Basic channel data
+    result = {
+        'timestamp': datetime.now().isoformat(),
+        'username': username,
+        'name': info['name'],
+        'channel_id': channel_info.get('id'),
+        'title': channel_info.get('title'),
+        'type': channel_info.get('type'),
+        'description': channel_info.get('description', ''),
+        'invite_link': channel_info.get('invite_link'),
+        'has_visible_history': channel_info.get('has_visible_history', False)
+    }
+    
+    result['subscribers'] = member_count
+    
+    if bot_status:
+        result['bot_is_admin'] = bot_status['is_admin']
+        result['bot_status'] = bot_status['status']
+    else:
+        result['bot_is_admin'] = False
+        result['bot_status'] = 'unknown'
+    
+    if chat_data is not None:
+        result['chat_data'] = chat_data
+    
+    return result
+
+def print_result(result):
+    """Print the status lines for one channel"""
+    if 'error' in result:
+        print(f"  ❌ Could not access channel")
         return
     
+    print(f"  ✅ Found: {result['title']}")
+    if result['subscribers']:
+        print(f"     Subscribers: {result['subscribers']:,}")
+    print(f"     Bot is admin: {result.get('bot_is_admin', False)}")
+
+async def call_api_async(client, method, params):
+    """Call a Bot API method over the pooled client, returning result or None"""
+    url = f"{API_BASE}/bot{BOT_TOKEN}/{method}"
+    
+    try:
+        data = await client.get_json(url, params=params)
+    except Exception as e:
+        print(f"Request error for {params.get('chat_id')}: {e}")
+        return None
+    
+    if data and data.get('ok'):
+        return data['result']
+    if method == 'getChat':
+        print(f"Error for {params.get('chat_id')}: {data.get('description') if data else 'invalid response'}")
+    return None
+
+async def check_bot_is_admin_async(client, chat_id):
+    """Async version of check_bot_is_admin"""
+    member = await call_api_async(client, 'getChatMember', {
+        'chat_id': chat_id,
+        'user_id': BOT_TOKEN.split(':')[0]
+    })
+    if member is None:
+        return None
+    return {
+        'is_admin': member['status'] in ['administrator', 'creator'],
+        'status': member['status'],
+        'can_read': member.get('can_read_messages', False)
+    }
+
+async def analyze_chat_activity_async(client, chat_id):
+    """Async version of analyze_chat_activity (both calls run concurrently)"""
+    chat_info, chat_members = await asyncio.gather(
+        call_api_async(client, 'getChat', {'chat_id': chat_id}),
+        call_api_async(client, 'getChatMemberCount', {'chat_id': chat_id})
+    )
+    
+    if chat_info:
+        return {
+            'chat_exists': True,
+            'chat_title': chat_info.get('title'),
+            'chat_type': chat_info.get('type'),
+            'chat_members': chat_members
+        }
+    return {'chat_exists': False}
+
+@traced()
+async def collect_channel_async(client, username, info):
+    """Fan out every Bot API call for one channel"""
+    calls = [
+        call_api_async(client, 'getChat', {'chat_id': username}),
+        call_api_async(client, 'getChatMemberCount', {'chat_id': username}),
+        check_bot_is_admin_async(client, username)
+    ]
+    if info['chat']:
+        calls.append(analyze_chat_activity_async(client, info['chat']))
+    
+    channel_info, member_count, bot_status, *chat_data = await asyncio.gather(*calls)
+    
+    return build_result(username, info, channel_info, member_count, bot_status,
+                        chat_data[0] if chat_data else None)
+
+async def collect_all_async(channels, client=None):
+    """Collect all channels concurrently over one pooled keep-alive client
+    
+    Pass a client to reuse its warm connections across runs (the caller closes it).
+    """
+    if client is None:
+        async with AsyncHTTPClient(max_concurrency=MAX_CONCURRENCY, timeout=REQUEST_TIMEOUT) as client:
+            return await collect_all_async(channels, client)
+    
+    requests_before, retries_before = client.requests_made, client.retries
+    results = await asyncio.gather(*(
+        collect_channel_async(client, username, info) for username, info in channels.items()
+    ))
+    print(f"\n🌐 {client.requests_made - requests_before} API requests ({client.retries - retries_before} retries)")
+    return list(results)
+
+def collect_sequential(channels):
+    """Collect channels one call at a time (legacy path)"""
     results = []
     
-    # Process each channel
-    for username, info in CHANNELS.items():
+    for username, info in channels.items():
         print(f"\nProcessing {info['name']} ({username})...")
         
-        # Get channel info
         channel_info = get_chat_info(username)
-        
         if channel_info:
-            # Basic channel data
-            result = {
-                'timestamp': datetime.now().isoformat(),
-                'username': username,
-                'name': info['name'],
-                'channel_id': channel_info.get('id'),
-                'title': channel_info.get('title'),
-                'type': channel_info.get('type'),
-                'description': channel_info.get('description', ''),
-                'invite_link': channel_info.get('invite_link'),
-                'has_visible_history': channel_info.get('has_visible_history', False)
-            }
-            
-            # Try to get member count
-            member_count = get_chat_member_count(username)
-            result['subscribers'] = member_count
-            
-            # Check bot status
-            bot_status = check_bot_is_admin(username)
-            if bot_status:
-                result['bot_is_admin'] = bot_status['is_admin']
-                result['bot_status'] = bot_status['status']
-            else:
-                result['bot_is_admin'] = False
-                result['bot_status'] = 'unknown'
-            
-            # Check associated chat
-            if info['chat']:
-                chat_data = analyze_chat_activity(info['chat'])
-                result['chat_data'] = chat_data
-            
-            results.append(result)
-            
-            print(f"  ✅ Found: {result['title']}")
-            if member_count:
-                print(f"     Subscribers: {member_count:,}")
-            print(f"     Bot is admin: {result.get('bot_is_admin', False)}")
-            
+            result = build_result(
+                username, info, channel_info,
+                get_chat_member_count(username),
+                check_bot_is_admin(username),
+                analyze_chat_activity(info['chat']) if info['chat'] else None
+            )
         else:
-            print(f"  ❌ Could not access channel")
-            results.append({
-                'timestamp': datetime.now().isoformat(),
-                'username': username,
-                'name': info['name'],
-                'error': 'Bot cannot access channel',
-                'bot_is_admin': False
-            })
+            result = build_result(username, info, None, None, None, None)
+        
+        print_result(result)
+        results.append(result)
+    
+    return results
+
+def main():
+    """Main collection function"""
+    print(f"Starting Telegram data collection (Bot API) at {datetime.now()}")
+    
+    if not BOT_TOKEN:
+        print("❌ Error: TELEGRAM_BOT_TOKEN not set!")
+        print("Add it to GitHub secrets or environment variables")
+        return
+    
+    # Concurrent by default; --sequential falls back to one call at a time
+    with span('collect telegram'):
+        if '--sequential' in sys.argv[1:]:
+            results = collect_sequential(CHANNELS)
+        else:
+            results = asyncio.run(collect_all_async(CHANNELS))
+    if '--sequential' not in sys.argv[1:]:
+        for result in results:
+            print(f"\nProcessing {result['name']} ({result['username']})...")
+            print_result(result)
     
     # Check Million Dollar AI (private channel)
     print(f"\nChecking Million Dollar AI (private channel)...")
@@ -180,39 +298,63 @@ def main():
     
     # Save results
     save_results(results)
+    export('telegram')
     
     return results
 
+@traced()
+def append_history(df_csv):
+    """Append history rows to every store the analytics read"""
+    # Series files left behind catch up first, so the new rows don't leave a hole
+    # (without files there is nothing to keep current: the dashboard builds them)
+    series = SeriesStore('telegram')
+    if series.exists():
+        series.sync()
+    
+    # Columnar history store (seeds itself from the CSV on first use), its rollups
+    # and the memory-mapped series files the dashboard reads
+    HistoryStore('telegram').append(df_csv)
+    update_rollups('telegram', df_csv)
+    if series.exists():
+        series.append(df_csv)
+    
+    # Append to CSV, keeping its column layout for rows that lack some fields
+    csv_path = 'data/telegram_stats.csv'
+    if os.path.exists(csv_path):
+        header = pd.read_csv(csv_path, nrows=0).columns
+        df_csv.reindex(columns=header).to_csv(csv_path, mode='a', header=False, index=False)
+    else:
+        df_csv.to_csv(csv_path, index=False)
+
+@traced()
 def save_results(results):
-    """Save results to JSON and CSV"""
+    """Save results to JSON, the columnar history store and CSV; returns the history rows"""
     print("\nSaving data...")
     
     # Create data directory
     os.makedirs('data', exist_ok=True)
     
-    # Save latest snapshot
-    with open('data/telegram_latest.json', 'w', encoding='utf-8') as f:
-        json.dump({
-            'generated_at': datetime.now().isoformat(),
-            'channels': results,
-            'bot_api_version': True,
-            'limitations': [
-                'Cannot get post views/reactions',
-                'Member count may not work for all channels',
-                'Cannot read message history',
-                'Need to be admin for private channels'
-            ]
-        }, f, indent=2, ensure_ascii=False)
-    
-    # Save timestamped backup
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    with open(f'data/telegram_{timestamp}.json', 'w', encoding='utf-8') as f:
-        json.dump({
-            'generated_at': datetime.now().isoformat(),
-            'channels': results
-        }, f, indent=2, ensure_ascii=False)
+    # Save latest snapshot (left untouched when only the timestamps changed)
+    write_json('data/telegram_latest.json', {
+        'generated_at': datetime.now().isoformat(),
+        'channels': results,
+        'bot_api_version': True,
+        'limitations': [
+            'Cannot get post views/reactions',
+            'Member count may not work for all channels',
+            'Cannot read message history',
+            'Need to be admin for private channels'
+        ]
+    })
+    
+    # Save timestamped backup (loose file or archive segment, see SNAPSHOT_MODE)
+    write_snapshot('telegram', {
+        'generated_at': datetime.now().isoformat(),
+        'channels': results
+    })
     
     # Append to CSV for historical tracking
+    df_csv = pd.DataFrame()
     if results:
         # Filter only successful results
         valid_results = [r for r in results if 'error' not in r]
@@ -229,17 +371,14 @@ def save_results(results):
             # Filter existing columns
             csv_columns = [col for col in csv_columns if col in df.columns]
             df_csv = df[csv_columns]
-            
-            # Append to CSV
-            csv_path = 'data/telegram_stats.csv'
-            if os.path.exists(csv_path):
-                df_csv.to_csv(csv_path, mode='a', header=False, index=False)
-            else:
-                df_csv.to_csv(csv_path, index=False)
+            append_history(df_csv)
     
     print(f"✅ Data collection complete!")
     print(f"   Channels processed: {len(results)}")
     print(f"   Successful: {len([r for r in results if 'error' not in r])}")
+    report_writes()
+    
+    return df_csv
 
 def generate_summary():
     """Generate a summary of what we can and cannot do"""
@@ -250,16 +389,18 @@ def generate_summary():
     print("   - Bot admin status")
     print("   - Basic member count (sometimes)")
     print("   - Associated chat info")
+    print("   - New/edited posts, member joins/leaves and discussion activity")
+    print("     as they happen (scripts/telegram_updates.py, bot must be admin)")
     
     print("\n❌ What we CANNOT get:")
     print("   - Post views and reactions")
-    print("   - Message history")
+    print("   - Message history from before the bot was added")
     print("   - Detailed engagement metrics")
     print("   - User activity patterns")
     
     print("\n💡 RECOMMENDATIONS:")
     print("1. Add bot as admin to all channels")
-    print("2. Use webhook to track new posts in real-time")
+    print("2. Run scripts/telegram_updates.py to track new posts in real-time")
     print("3. Consider TGStat API for full analytics ($50/month)")
     print("4. Or manually track key metrics weekly")
 
@@ -1,29 +1,72 @@
 #!/usr/bin/env python3
 """
 YouTube Data Collector for AI Media Empire
-Collects data for all channels and saves to JSON/CSV
+Collects data for all channels and saves to JSON/CSV, and keeps every channel's
+full uploads catalog in sync (new uploads until a known video, statistics in
+50-id batches with ETag-conditional requests, a bounded number of calls per run)
 """
 
 import os
+import sys
 import json
+import asyncio
+import itertools
 import requests
 from datetime import datetime
 import pandas as pd
 
+from history_store import HistoryStore
+from rollups import update_rollups
+from series_store import SeriesStore
+from snapshot_archive import write_snapshot, snapshot_key
+from write_layer import write_json, report as report_writes
+from http_client import AsyncHTTPClient
+from video_store import VideoStore
+from instrumentation import span, traced, count, export
+
 # Configuration
 API_KEY = os.environ.get('YOUTUBE_API_KEY')
 if not API_KEY:
     raise ValueError("YOUTUBE_API_KEY environment variable not set!")
 
+API_BASE = os.environ.get('YOUTUBE_API_BASE', 'https://www.googleapis.com/youtube/v3')
+
 # Channels to track
 CHANNELS = {
     'shum_motora': 'Шум Мотора (Palych)',
     # Add more channels as needed
 }
 
+# Optional JSON file {handle: name} replacing CHANNELS (large portfolios, local stub runs)
+CHANNELS_FILE = os.environ.get('YOUTUBE_CHANNELS_FILE')
+if CHANNELS_FILE:
+    with open(CHANNELS_FILE, 'r', encoding='utf-8') as f:
+        CHANNELS = json.load(f)
+
+# Resolved handle -> channel ID, so search only ever runs once per handle
+CHANNEL_ID_CACHE = 'data/channel_ids.json'
+
+# Batched collection settings
+BATCH_SIZE = 50  # max ids per channels.list / videos.list request
+MAX_CONCURRENCY = int(os.environ.get('YOUTUBE_MAX_CONCURRENCY', 8))
+REQUEST_TIMEOUT = float(os.environ.get('YOUTUBE_REQUEST_TIMEOUT', 15))
+
+# Uploads catalog sync: playlistItems pages per channel and videos.list batches per run
+CATALOG_PAGES_PER_RUN = int(os.environ.get('YOUTUBE_CATALOG_PAGES', 20))
+REFRESH_BATCHES = int(os.environ.get('YOUTUBE_REFRESH_BATCHES', 20))
+RECENT_VIDEOS = 5  # newest uploads per channel kept in the snapshot
+
+# Data API quota cost per request
+QUOTA_COST = {
+    'search': 100,
+    'channels': 1,
+    'playlistItems': 1,
+    'videos': 1
+}
+
 def search_channel(query):
     """Search for channel by name/handle"""
-    url = "https://www.googleapis.com/youtube/v3/search"
+    url = f"{API_BASE}/search"
     params = {
         "part": "snippet",
         "q": query,
@@ -39,20 +82,24 @@ def search_channel(query):
         print(f"API Error: {data['error']['message']}")
         return None
     
-    if data.get('items'):
+    return pick_search_result(query, data.get('items'))
+
+def pick_search_result(query, items):
+    """Pick the best matching channel ID from search results"""
+    if items:
         # Try to find best match
-        for item in data['items']:
+        for item in items:
             title = item['snippet']['title'].lower()
             if query.lower() in title or 'палыч' in title or 'мотор' in title:
                 return item['snippet']['channelId']
         # Return first result if no exact match
-        return data['items'][0]['snippet']['channelId']
+        return items[0]['snippet']['channelId']
     
     return None
 
 def get_channel_stats(channel_id):
     """Get channel statistics"""
-    url = "https://www.googleapis.com/youtube/v3/channels"
+    url = f"{API_BASE}/channels"
     params = {
         "part": "statistics,snippet,contentDetails",
         "id": channel_id,
@@ -63,24 +110,27 @@ def get_channel_stats(channel_id):
     data = response.json()
     
     if data.get('items'):
-        channel = data['items'][0]
-        return {
-            'channel_id': channel_id,
-            'title': channel['snippet']['title'],
-            'description': channel['snippet'].get('description', '')[:200],
-            'published_at': channel['snippet']['publishedAt'],
-            'country': channel['snippet'].get('country', 'N/A'),
-            'subscribers': int(channel['statistics'].get('subscriberCount', 0)),
-            'views': int(channel['statistics'].get('viewCount', 0)),
-            'videos': int(channel['statistics'].get('videoCount', 0)),
-            'uploads_playlist': channel['contentDetails']['relatedPlaylists']['uploads']
-        }
+        return parse_channel(data['items'][0])
     
     return None
 
+def parse_channel(channel):
+    """Convert a channels.list item to a stats record"""
+    return {
+        'channel_id': channel['id'],
+        'title': channel['snippet']['title'],
+        'description': channel['snippet'].get('description', '')[:200],
+        'published_at': channel['snippet']['publishedAt'],
+        'country': channel['snippet'].get('country', 'N/A'),
+        'subscribers': int(channel['statistics'].get('subscriberCount', 0)),
+        'views': int(channel['statistics'].get('viewCount', 0)),
+        'videos': int(channel['statistics'].get('videoCount', 0)),
+        'uploads_playlist': channel['contentDetails']['relatedPlaylists']['uploads']
+    }
+
 def get_recent_videos(playlist_id, max_results=5):
     """Get recent videos from uploads playlist"""
-    url = "https://www.googleapis.com/youtube/v3/playlistItems"
+    url = f"{API_BASE}/playlistItems"
     params = {
         "part": "contentDetails,snippet",
         "playlistId": playlist_id,
@@ -98,7 +148,7 @@ def get_recent_videos(playlist_id, max_results=5):
     video_ids = [item['contentDetails']['videoId'] for item in data['items']]
     
     # Get video details
-    videos_url = "https://www.googleapis.com/youtube/v3/videos"
+    videos_url = f"{API_BASE}/videos"
     videos_params = {
         "part": "statistics,snippet,contentDetails",
         "id": ",".join(video_ids),
@@ -108,39 +158,307 @@ def get_recent_videos(playlist_id, max_results=5):
     videos_response = requests.get(videos_url, params=videos_params)
     videos_data = videos_response.json()
     
-    videos = []
-    for video in videos_data.get('items', []):
-        videos.append({
-            'video_id': video['id'],
-            'title': video['snippet']['title'],
-            'published_at': video['snippet']['publishedAt'],
-            'duration': video['contentDetails']['duration'],
-            'views': int(video['statistics'].get('viewCount', 0)),
-            'likes': int(video['statistics'].get('likeCount', 0)),
-            'comments': int(video['statistics'].get('commentCount', 0))
+    return [parse_video(video) for video in videos_data.get('items', [])]
+
+def parse_video(video):
+    """Convert a videos.list item to a video record"""
+    return {
+        'video_id': video['id'],
+        'title': video['snippet']['title'],
+        'published_at': video['snippet']['publishedAt'],
+        'duration': video['contentDetails']['duration'],
+        'views': int(video['statistics'].get('viewCount', 0)),
+        'likes': int(video['statistics'].get('likeCount', 0)),
+        'comments': int(video['statistics'].get('commentCount', 0))
+    }
+
+class QuotaMeter:
+    """Data API quota actually spent during a run"""
+    def __init__(self):
+        self.units = 0
+        self.calls = {}
+        self.not_modified = 0
+    
+    def charge(self, endpoint):
+        cost = QUOTA_COST.get(endpoint, 1)
+        self.units += cost
+        self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        count('api_quota_units_total', cost, api='youtube', endpoint=endpoint)
+
+def chunks(items, size=BATCH_SIZE):
+    """Split a list into batches of at most size items"""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def load_channel_ids():
+    """Load the persistent handle -> channel ID cache"""
+    cache = {}
+    if os.path.exists(CHANNEL_ID_CACHE):
+        with open(CHANNEL_ID_CACHE, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    
+    # Seed from the last snapshot so known channels never hit search again
+    if os.path.exists('data/latest.json'):
+        with open('data/latest.json', 'r', encoding='utf-8') as f:
+            for channel in json.load(f).get('channels', []):
+                if channel.get('handle'):
+                    cache.setdefault(channel['handle'], channel['channel_id'])
+    
+    return cache
+
+def save_channel_ids(cache):
+    """Persist the handle -> channel ID cache"""
+    os.makedirs(os.path.dirname(CHANNEL_ID_CACHE), exist_ok=True)
+    with open(CHANNEL_ID_CACHE, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2, ensure_ascii=False, sort_keys=True)
+
+async def api_get_async(client, quota, endpoint, params):
+    """GET a Data API endpoint over the pooled client, charging its quota cost"""
+    quota.charge(endpoint)
+    try:
+        data = await client.get_json(f"{API_BASE}/{endpoint}", params={**params, 'key': API_KEY})
+    except Exception as e:
+        print(f"Request error ({endpoint}): {e}")
+        return {}
+    
+    if not data:
+        return {}
+    if 'error' in data:
+        print(f"API Error ({endpoint}): {data['error'].get('message')}")
+        return {}
+    return data
+
+async def api_get_conditional_async(client, quota, endpoint, params, etag=None):
+    """GET with If-None-Match; returns (data, etag) with data None when not modified, {} on errors"""
+    quota.charge(endpoint)
+    headers = {'If-None-Match': etag} if etag else None
+    try:
+        response, data = await client.request('GET', f"{API_BASE}/{endpoint}",
+                                              params={**params, 'key': API_KEY}, headers=headers)
+    except Exception as e:
+        print(f"Request error ({endpoint}): {e}")
+        return {}, None
+    
+    if response.status_code == 304:
+        quota.not_modified += 1
+        return None, etag
+    if not data or 'error' in data:
+        print(f"API Error ({endpoint}): {data['error'].get('message') if data else 'invalid response'}")
+        return {}, None
+    return data, data.get('etag') or response.headers.get('ETag')
+
+async def resolve_channel_id_async(client, quota, handle):
+    """Resolve a handle, trying the 1-unit forHandle lookup before the 100-unit search"""
+    data = await api_get_async(client, quota, 'channels', {'part': 'id', 'forHandle': handle})
+    if data.get('items'):
+        return data['items'][0]['id']
+    
+    data = await api_get_async(client, quota, 'search', {
+        'part': 'snippet',
+        'q': handle,
+        'type': 'channel',
+        'maxResults': 3
+    })
+    return pick_search_result(handle, data.get('items'))
+
+@traced()
+async def get_channel_stats_batch_async(client, quota, channel_ids):
+    """channels.list for up to 50 IDs per request, all batches concurrently"""
+    pages = await asyncio.gather(*(
+        api_get_async(client, quota, 'channels', {
+            'part': 'statistics,snippet,contentDetails',
+            'id': ','.join(batch),
+            'maxResults': BATCH_SIZE
         })
+        for batch in chunks(channel_ids)
+    ))
+    return {item['id']: parse_channel(item) for page in pages for item in page.get('items', [])}
+
+@traced()
+async def sync_uploads_async(client, quota, store, channel_id, playlist_id):
+    """Bring one channel's uploads catalog up to date; returns (ids added, new uploads)
     
-    return videos
+    Walks the uploads playlist from the newest item until a known video (a single
+    304 when the first page is unchanged), then continues an unfinished first sync
+    from its saved page token. Page tokens are offsets, so uploads published in the
+    meantime only cause repeats, which are ignored.
+    """
+    state = store.catalog_state(channel_id) or {}
+    known = store.catalog_ids(channel_id)
+    complete = bool(state.get('complete')) and bool(known)
+    resume = state.get('page_token') if known else None
+    head_etag = state.get('head_etag') if known else None
+    params = {'part': 'contentDetails', 'playlistId': playlist_id, 'maxResults': BATCH_SIZE}
+    pages = 0
+    new_ids = []
+    
+    token = None
+    while pages < CATALOG_PAGES_PER_RUN:
+        data, etag = await api_get_conditional_async(
+            client, quota, 'playlistItems', {**params, **({'pageToken': token} if token else {})},
+            etag=head_etag if token is None else None
+        )
+        pages += 1
+        if not data:
+            break
+        if token is None:
+            head_etag = etag
+        
+        ids = [item['contentDetails']['videoId'] for item in data.get('items', [])]
+        fresh = list(itertools.takewhile(lambda video_id: video_id not in known, ids))
+        new_ids.extend(fresh)
+        token = data.get('nextPageToken')
+        if len(fresh) < len(ids):
+            break
+        if not token:
+            complete, resume = True, None
+            break
+    else:
+        # Out of pages before reaching known uploads: carry on from here next run
+        complete, resume = False, token
+    store.add_catalog_items(channel_id, new_ids)
+    
+    while not complete and resume and pages < CATALOG_PAGES_PER_RUN:
+        data, _ = await api_get_conditional_async(client, quota, 'playlistItems', {**params, 'pageToken': resume})
+        pages += 1
+        if not data:
+            break
+        store.add_catalog_items(channel_id, [item['contentDetails']['videoId'] for item in data.get('items', [])])
+        resume = data.get('nextPageToken')
+        complete = resume is None
+    
+    store.set_catalog_state(channel_id, playlist_id, complete=int(complete), page_token=resume, head_etag=head_etag)
+    # Ids of a first sync are backlog; only ids found above known ones are new uploads
+    added = len(store.catalog_ids(channel_id)) - len(known)
+    return added, new_ids if known else []
 
-def main():
-    """Main collection function"""
-    print(f"Starting YouTube data collection at {datetime.now()}")
+@traced()
+async def refresh_catalog_async(client, quota, store, uploads=(), budget=REFRESH_BATCHES):
+    """videos.list for the planned 50-id batches; returns (refreshed videos, batches not modified)"""
+    plan = store.refresh_plan(budget, RECENT_VIDEOS, uploads)
+    responses = await asyncio.gather(*(
+        api_get_conditional_async(client, quota, 'videos', {
+            'part': 'statistics,snippet,contentDetails',
+            'id': ','.join(ids),
+            'maxResults': BATCH_SIZE
+        }, etag=etag)
+        for _, ids, etag, _, _ in plan
+    ))
+    
+    now = datetime.now()
+    refreshed = []
+    not_modified = 0
+    for (batch, ids, *_), (data, etag) in zip(plan, responses):
+        if data == {}:
+            continue
+        if data is None:
+            not_modified += 1
+        else:
+            refreshed.extend({
+                **parse_video(item),
+                'channel_id': item['snippet'].get('channelId'),
+                'channel_title': item['snippet'].get('channelTitle')
+            } for item in data.get('items', []))
+        store.mark_batch(batch, etag, now, len(ids))
+    
+    # Change points go straight to the video store; unchanged batches cost no writes
+    store.record(refreshed, now)
+    return refreshed, not_modified
+
+@traced()
+async def sync_catalog_async(client, quota, playlists):
+    """Sync every channel's catalog and refresh statistics; returns the newest uploads per channel"""
+    store = VideoStore()
+    if store.empty():
+        # Snapshot history goes in before this run's statistics, keeping the store in time order
+        store.backfill()
+    try:
+        synced = await asyncio.gather(*(
+            sync_uploads_async(client, quota, store, channel_id, playlist_id)
+            for channel_id, playlist_id in playlists.items()
+        ))
+        store.conn.commit()
+        uploads = [video_id for _, new_uploads in synced for video_id in new_uploads]
+        refreshed, not_modified = await refresh_catalog_async(client, quota, store, uploads)
+        
+        known = store.conn.execute("SELECT COUNT(*) FROM catalog_items").fetchone()[0]
+        print(f"🎞️  Catalog: {known:,} videos ({sum(added for added, _ in synced):,} added, {len(uploads)} new uploads), "
+              f"{len(refreshed):,} refreshed, {not_modified} batches not modified")
+        return {channel_id: store.latest_videos(channel_id, RECENT_VIDEOS) for channel_id in playlists}
+    finally:
+        store.close()
+
+async def collect_batched_async(channels, client=None):
+    """Collect all channels with cached IDs, batched list calls and one pooled client
+    
+    Pass a client to reuse its warm connections across runs (the caller closes it).
+    """
+    if client is None:
+        async with AsyncHTTPClient(max_concurrency=MAX_CONCURRENCY, timeout=REQUEST_TIMEOUT) as client:
+            return await collect_batched_async(channels, client)
+    
+    cache = load_channel_ids()
+    quota = QuotaMeter()
+    
+    missing = [handle for handle in channels if handle not in cache]
+    resolved = await asyncio.gather(*(resolve_channel_id_async(client, quota, handle) for handle in missing))
+    cache.update({handle: channel_id for handle, channel_id in zip(missing, resolved) if channel_id})
+    
+    channel_ids = list(dict.fromkeys(cache[handle] for handle in channels if handle in cache))
+    stats_by_id = await get_channel_stats_batch_async(client, quota, channel_ids)
+    
+    playlists = {channel_id: stats['uploads_playlist'] for channel_id, stats in stats_by_id.items()}
+    videos_by_channel = await sync_catalog_async(client, quota, playlists)
     
-    # Results storage
     results = []
     all_videos = []
     
-    # Process each channel
-    for handle, name in CHANNELS.items():
+    for handle, name in channels.items():
+        print(f"\nProcessing {name} (@{handle})...")
+        
+        channel_id = cache.get(handle)
+        if not channel_id:
+            print(f"  ❌ Channel not found: {handle}")
+            continue
+        
+        if channel_id not in stats_by_id:
+            print(f"  ❌ Could not get stats for: {channel_id}")
+            # Stale cache entry, resolve again next run
+            del cache[handle]
+            continue
+        
+        stats = dict(stats_by_id[channel_id])
+        print(f"  ✅ Found: {stats['title']}")
+        print(f"     Subscribers: {stats['subscribers']:,}")
+        print(f"     Total views: {stats['views']:,}")
+        
+        stats['timestamp'] = datetime.now().isoformat()
+        stats['handle'] = handle
+        results.append(stats)
+        
+        for video in videos_by_channel.get(channel_id, []):
+            all_videos.append({**video, 'channel_id': channel_id, 'channel_title': stats['title']})
+    
+    save_channel_ids(cache)
+    return results, all_videos, quota
+
+def collect_sequential(channels):
+    """Collect channels one request at a time (legacy path)"""
+    results = []
+    all_videos = []
+    quota = QuotaMeter()
+    
+    for handle, name in channels.items():
         print(f"\nProcessing {name} (@{handle})...")
         
         # Find channel ID
+        quota.charge('search')
         channel_id = search_channel(handle)
         if not channel_id:
             print(f"  ❌ Channel not found: {handle}")
             continue
         
         # Get channel stats
+        quota.charge('channels')
         stats = get_channel_stats(channel_id)
         if not stats:
             print(f"  ❌ Could not get stats for: {channel_id}")
@@ -156,33 +474,43 @@ def main():
         results.append(stats)
         
         # Get recent videos
+        quota.charge('playlistItems')
+        quota.charge('videos')
         videos = get_recent_videos(stats['uploads_playlist'])
         for video in videos:
             video['channel_id'] = channel_id
             video['channel_title'] = stats['title']
             all_videos.append(video)
     
-    # Save results to JSON
+    return results, all_videos, quota
+
+@traced('save youtube')
+def save(results, all_videos):
+    """Save results to JSON, the columnar history store and CSV; returns the history rows"""
     print("\nSaving data...")
 
     os.makedirs('data', exist_ok=True)
     
-    # Save latest snapshot
-    with open('data/latest.json', 'w', encoding='utf-8') as f:
-        json.dump({
-            'generated_at': datetime.now().isoformat(),
-            'channels': results,
-            'recent_videos': all_videos
-        }, f, indent=2, ensure_ascii=False)
-    
-    # Save timestamped backup
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    with open(f'data/youtube_{timestamp}.json', 'w', encoding='utf-8') as f:
-        json.dump({
-            'generated_at': datetime.now().isoformat(),
-            'channels': results,
-            'recent_videos': all_videos
-        }, f, indent=2, ensure_ascii=False)
+    # Save latest snapshot (left untouched when only the timestamps changed)
+    write_json('data/latest.json', {
+        'generated_at': datetime.now().isoformat(),
+        'channels': results,
+        'recent_videos': all_videos
+    })
+    
+    # Save timestamped backup (loose file or archive segment, see SNAPSHOT_MODE)
+    timestamp = datetime.now()
+    write_snapshot('youtube', {
+        'generated_at': timestamp.isoformat(),
+        'channels': results,
+        'recent_videos': all_videos
+    }, timestamp=timestamp)
+    
+    # Per-video counters, stored only when they change (an empty store is
+    # rebuilt from the snapshot stream first, see VideoStore.ingest)
+    video_store = VideoStore()
+    video_store.ingest(snapshot_key(timestamp), all_videos, timestamp)
+    video_store.close()
     
     # Append to CSV for historical tracking
     if results:
@@ -191,18 +519,51 @@ def main():
         csv_columns = ['timestamp', 'channel_id', 'title', 'subscribers', 'views', 'videos']
         df_csv = df[csv_columns]
         
+        # Series files left behind catch up first, so the new rows don't leave a hole
+        # (without files there is nothing to keep current: the dashboard builds them)
+        series = SeriesStore('youtube')
+        if series.exists():
+            series.sync()
+        
+        # Append to the columnar history store (seeds itself from the CSV on first use), its rollups
+        # and the memory-mapped series files the dashboard reads
+        HistoryStore('youtube').append(df_csv)
+        update_rollups('youtube', df_csv)
+        if series.exists():
+            series.append(df_csv)
+        
         # Append to CSV
         if os.path.exists('data/youtube_stats.csv'):
             df_csv.to_csv('data/youtube_stats.csv', mode='a', header=False, index=False)
         else:
             df_csv.to_csv('data/youtube_stats.csv', index=False)
+        
+        return df_csv
+    
+    return pd.DataFrame()
+
+def main():
+    """Main collection function"""
+    print(f"Starting YouTube data collection at {datetime.now()}")
+    
+    # Batched by default; --sequential falls back to one request at a time
+    with span('collect youtube'):
+        if '--sequential' in sys.argv[1:]:
+            results, all_videos, quota = collect_sequential(CHANNELS)
+        else:
+            results, all_videos, quota = asyncio.run(collect_batched_async(CHANNELS))
+    
+    save(results, all_videos)
     
     print(f"✅ Data collection complete!")
     print(f"   Channels processed: {len(results)}")
     print(f"   Videos collected: {len(all_videos)}")
+    report_writes()
     
     # API quota check
-    print(f"\n📊 API Usage estimate: ~{len(CHANNELS) * 3} units used")
+    calls = ', '.join(f"{endpoint}: {count}" for endpoint, count in sorted(quota.calls.items()))
+    print(f"\n📊 API quota used: {quota.units} units ({calls}), {quota.not_modified} not modified")
+    export('youtube')
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Long-running collector/analytics daemon for AI Media Empire
+Hosts the YouTube and Telegram collectors, the dashboard and the alerts system in
+one process: an in-process scheduler runs each job on its own interval (with
+jitter), HTTP sessions stay warm between runs, dashboard state and newly
+collected rows stay in memory, and artifacts are republished only when the
+collected numbers actually changed. Metrics and a trace of the jobs since the
+previous publish are exported with every publish
+
+Usage:  python scripts/daemon.py [--youtube-interval 300] [--telegram-interval 300]
+                                 [--dashboard-interval 60] [--jitter 0.1] [--telegram-updates]
+                                 [--on-publish "git add ... && git commit ..."] [--once]
+"""
+
+import os
+import sys
+import heapq
+import random
+import signal
+import asyncio
+import hashlib
+import argparse
+from datetime import datetime
+import pandas as pd
+
+from http_client import AsyncHTTPClient
+from instrumentation import span, export, reset
+from analytics_dashboard import AnalyticsDashboard
+from analytics_alerts import AlertsSystem, process_alerts
+
+
+class Job:
+    """A recurring job: async callable run every interval seconds (+/- jitter)"""
+
+    def __init__(self, name, interval, func, jitter=0.1):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.jitter = jitter
+        self.runs = 0
+        self.failures = 0
+
+    def next_delay(self):
+        """Interval with random jitter (a fraction of the interval) so jobs don't align"""
+        return max(1.0, self.interval * (1 + random.uniform(-self.jitter, self.jitter)))
+
+
+class Scheduler:
+    """Min-heap of (due time, job) driven by one asyncio loop"""
+
+    def __init__(self):
+        self.queue = []
+        self.counter = 0
+        self.stopping = asyncio.Event()
+
+    def add(self, job, delay=0.0):
+        loop = asyncio.get_running_loop()
+        # The counter breaks ties so jobs themselves are never compared
+        heapq.heappush(self.queue, (loop.time() + delay, self.counter, job))
+        self.counter += 1
+
+    def stop(self):
+        self.stopping.set()
+
+    async def run(self, once=False):
+        """Run jobs as they come due; with once=True every job runs exactly once"""
+        loop = asyncio.get_running_loop()
+        pending = {job.name for _, _, job in self.queue}
+
+        while self.queue and not self.stopping.is_set():
+            due, _, job = heapq.heappop(self.queue)
+            wait = due - loop.time()
+            if wait > 0:
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), timeout=wait)
+                    break
+                except asyncio.TimeoutError:
+                    pass
+
+            started = loop.time()
+            try:
+                with span(f"job {job.name}"):
+                    await job.func()
+                job.runs += 1
+            except Exception as e:
+                job.failures += 1
+                print(f"❌ {job.name} failed: {type(e).__name__}: {e}")
+            print(f"⏱️  {job.name} finished in {loop.time() - started:.2f}s")
+
+            if once:
+                pending.discard(job.name)
+                if not pending:
+                    break
+                continue
+            self.add(job, job.next_delay())
+
+
+def fingerprint(df, key, columns):
+    """Hash of the collected numbers, ignoring timestamps"""
+    if df is None or df.empty:
+        return None
+    columns = [col for col in columns if col in df.columns]
+    values = df[[key] + columns].sort_values(key).to_csv(index=False)
+    return hashlib.sha256(values.encode('utf-8')).hexdigest()
+
+
+class AnalyticsDaemon:
+    def __init__(self, on_publish=None):
+        self.on_publish = on_publish
+
+        # Rows collected since the last dashboard run, per platform
+        self.pending = {'youtube': [], 'telegram': []}
+        # Fingerprints of the last collected numbers, and whether they moved since the last publish
+        self.fingerprints = {}
+        self.inputs_changed = False
+
+        # In-memory dashboard state (None until the first full build)
+        self.state = None
+        self.last_summary_date = None
+
+        # One warm client per API for the life of the process
+        self.youtube_client = None
+        self.telegram_client = None
+        self.alert_client = None
+        self.updates_client = None
+
+        # One writer at a time for the history store, rollups, series files and CSVs:
+        # collector saves run in worker threads next to the listener's flushes
+        self.write_lock = asyncio.Lock()
+
+        # Alert state stays in memory; deliveries run in the background
+        self.alert_state = None
+        self.deliveries = set()
+
+    def record(self, platform, rows, key, columns):
+        """Queue new history rows for the next dashboard run"""
+        if rows is None or rows.empty:
+            return
+        rows = rows.copy()
+        rows['timestamp'] = pd.to_datetime(rows['timestamp'])
+        self.pending[platform].append(rows)
+
+        digest = fingerprint(rows, key, columns)
+        if digest != self.fingerprints.get(platform):
+            self.fingerprints[platform] = digest
+            self.inputs_changed = True
+
+    async def collect_youtube(self):
+        # Imported lazily: the module refuses to load without YOUTUBE_API_KEY
+        import collect_youtube_data as youtube
+
+        if self.youtube_client is None:
+            self.youtube_client = AsyncHTTPClient(max_concurrency=youtube.MAX_CONCURRENCY, timeout=youtube.REQUEST_TIMEOUT)
+
+        results, all_videos, quota = await youtube.collect_batched_async(youtube.CHANNELS, client=self.youtube_client)
+        print(f"📊 YouTube quota used: {quota.units} units in {quota.calls} calls")
+        # File and store writes run off the event loop so the other jobs and the listener keep going
+        async with self.write_lock:
+            rows = await asyncio.to_thread(youtube.save, results, all_videos)
+        self.record('youtube', rows, 'channel_id', ['subscribers', 'views', 'videos'])
+
+    async def collect_telegram(self):
+        import collect_telegram_data as telegram
+
+        if self.telegram_client is None:
+            self.telegram_client = AsyncHTTPClient(max_concurrency=telegram.MAX_CONCURRENCY, timeout=telegram.REQUEST_TIMEOUT)
+
+        results = await telegram.collect_all_async(telegram.CHANNELS, client=self.telegram_client)
+        async with self.write_lock:
+            rows = await asyncio.to_thread(telegram.save_results, results)
+        self.record('telegram', rows, 'username', ['subscribers', 'bot_is_admin', 'bot_status'])
+
+    async def listen_telegram(self, stop):
+        """Stream Telegram updates until stop is set; fresh member counts are queued like collected rows"""
+        import collect_telegram_data as telegram
+        from telegram_updates import UpdatesListener, POLL_TIMEOUT
+
+        self.updates_client = AsyncHTTPClient(max_concurrency=4, timeout=POLL_TIMEOUT + telegram.REQUEST_TIMEOUT)
+        listener = UpdatesListener(
+            self.updates_client,
+            on_rows=lambda rows: self.record('telegram', rows, 'username', ['subscribers']),
+            write_lock=self.write_lock
+        )
+        await listener.run(stop)
+
+    def take_pending(self):
+        """New rows per platform as DataFrames, clearing the queue"""
+        new_rows = {
+            platform: pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+            for platform, frames in self.pending.items()
+        }
+        self.pending = {platform: [] for platform in self.pending}
+        return new_rows
+
+    async def update_dashboard(self):
+        if self.state is None:
+            # First run: one full build from the history store, then stay incremental in memory
+            print("📦 Building dashboard state from the full history")
+            self.take_pending()
+            # The build reads the stores, so no save may be halfway through a partition
+            async with self.write_lock:
+                dashboard = AnalyticsDashboard(incremental=False)
+                data = dashboard.generate_dashboard()
+        else:
+            if not any(self.pending.values()):
+                print("⏭️  Dashboard: no new rows")
+                return
+            new_rows = self.take_pending()
+            if not self.inputs_changed:
+                # Same numbers as last time: keep the state current, skip the publish
+                self.state.fold_youtube(new_rows['youtube'])
+                self.state.fold_telegram(new_rows['telegram'])
+                print("⏭️  Dashboard: inputs unchanged, not republishing")
+                return
+            async with self.write_lock:
+                dashboard = AnalyticsDashboard(incremental=True, state=self.state, new_rows=new_rows)
+                data = dashboard.generate_dashboard()
+
+        dashboard.save_dashboard(data)
+        dashboard.save_state()
+        self.state = dashboard.state
+        self.inputs_changed = False
+
+        self.run_alerts(data)
+        await self.publish()
+        export('daemon')
+        reset()
+
+    def run_alerts(self, data):
+        alerts = AlertsSystem(dashboard=data, state=self.alert_state)
+        self.alert_state = alerts.state
+        notifications = process_alerts(alerts)
+
+        if notifications or alerts.state.pending:
+            # Delivered in the background so a slow webhook never holds up the scheduler
+            if self.alert_client is None:
+                self.alert_client = AsyncHTTPClient(max_concurrency=4, timeout=10)
+            task = asyncio.create_task(alerts.send_notifications(notifications, client=self.alert_client))
+            self.deliveries.add(task)
+            task.add_done_callback(self.deliveries.discard)
+
+        # Daily summary once per day at 9 AM, however often the dashboard runs
+        now = datetime.now()
+        if now.hour == 9 and self.last_summary_date != now.date():
+            summary = alerts.generate_daily_summary()
+            if summary:
+                with open('daily_summary.md', 'w', encoding='utf-8') as f:
+                    f.write(summary)
+                print("📧 Daily summary generated")
+            self.last_summary_date = now.date()
+
+    async def publish(self):
+        """Run the publish hook (e.g. git commit && git push) after artifacts changed"""
+        if not self.on_publish:
+            return
+        # A subprocess of the loop: a slow push must not stall the collectors and the listener
+        process = await asyncio.create_subprocess_shell(self.on_publish)
+        returncode = await process.wait()
+        if returncode != 0:
+            print(f"⚠️  Publish command exited with {returncode}")
+
+    async def drain(self):
+        """Wait for alert deliveries still in flight"""
+        if self.deliveries:
+            await asyncio.gather(*self.deliveries, return_exceptions=True)
+
+    def close(self):
+        for client in (self.youtube_client, self.telegram_client, self.alert_client, self.updates_client):
+            if client is not None:
+                client.close()
+
+
+async def run_daemon(args):
+    daemon = AnalyticsDaemon(on_publish=args.on_publish)
+    scheduler = Scheduler()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, scheduler.stop)
+
+    # Collectors only run when their credentials are configured
+    if os.environ.get('YOUTUBE_API_KEY'):
+        scheduler.add(Job('youtube', args.youtube_interval, daemon.collect_youtube, args.jitter))
+    else:
+        print("⏭️  YOUTUBE_API_KEY not set, YouTube collection disabled")
+    if os.environ.get('TELEGRAM_BOT_TOKEN'):
+        scheduler.add(Job('telegram', args.telegram_interval, daemon.collect_telegram, args.jitter))
+    else:
+        print("⏭️  TELEGRAM_BOT_TOKEN not set, Telegram collection disabled")
+
+    # The dashboard starts after the first collections have had a chance to finish
+    scheduler.add(Job('dashboard', args.dashboard_interval, daemon.update_dashboard, args.jitter),
+                  delay=0 if args.once else args.dashboard_interval)
+
+    # Updates are streamed next to the scheduled jobs and stop with the scheduler
+    listener = None
+    if args.telegram_updates and os.environ.get('TELEGRAM_BOT_TOKEN') and not args.once:
+        listener = asyncio.create_task(daemon.listen_telegram(scheduler.stopping))
+
+    print(f"🚀 Analytics daemon started at {datetime.now()}")
+    try:
+        await scheduler.run(once=args.once)
+        if listener is not None:
+            scheduler.stop()
+            await listener
+        await daemon.drain()
+    finally:
+        daemon.close()
+    print("👋 Analytics daemon stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run collectors, dashboard and alerts in one long-running process')
+    parser.add_argument('--youtube-interval', type=float, default=300, help='seconds between YouTube collections')
+    parser.add_argument('--telegram-interval', type=float, default=300, help='seconds between Telegram collections')
+    parser.add_argument('--dashboard-interval', type=float, default=60, help='seconds between dashboard checks')
+    parser.add_argument('--jitter', type=float, default=0.1, help='random +/- fraction of each interval')
+    parser.add_argument('--telegram-updates', action='store_true',
+                        help='stream Telegram posts and member changes via getUpdates long polling')
+    parser.add_argument('--on-publish', help='shell command run after artifacts were republished')
+    parser.add_argument('--once', action='store_true', help='run every job once and exit')
+    args = parser.parse_args()
+
+    asyncio.run(run_daemon(args))
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Persisted state for incremental dashboard generation
+The state is the hourly grid of each platform (see hourly_grid.py): each run
+folds in only the rows newer than the last processed timestamp and the
+analytics read the aligned matrices. Next to each grid sit its seasonal
+anomaly baselines (see seasonal_baseline.py) and the running sums the engine
+reads instead of the whole matrices (see engine_state.py)
+"""
+
+from history_store import load_history
+from series_store import SeriesStore
+from hourly_grid import HourlyGrid, GRID_DIR, grid_path, load_grid
+from seasonal_baseline import SeasonalBaseline, baseline_path, load_baseline
+from engine_state import EngineState, engine_path, load_engine
+
+
+class DashboardState:
+    """Hourly grids of the YouTube and Telegram histories, their seasonal baselines and engine state"""
+
+    def __init__(self, youtube=None, telegram=None, baselines=None, engines=None):
+        self.grids = {
+            'youtube': youtube or HourlyGrid.for_source('youtube'),
+            'telegram': telegram or HourlyGrid.for_source('telegram')
+        }
+        # Missing baselines warm up from the grid on their first update
+        baselines = baselines or {}
+        self.baselines = {platform: baselines.get(platform) or SeasonalBaseline.for_source(platform)
+                          for platform in self.grids}
+        # Missing engine state folds the whole grid on its first update (a full rebuild always does)
+        engines = engines or {}
+        self.engines = {platform: engines.get(platform) or EngineState.for_source(platform)
+                        for platform in self.grids}
+
+    def grid(self, platform):
+        return self.grids[platform]
+
+    def baseline(self, platform):
+        return self.baselines[platform]
+
+    def engine(self, platform):
+        """Engine state of a platform, brought up to date with its grid"""
+        self.engines[platform].update(self.grids[platform])
+        return self.engines[platform]
+
+    def fold_youtube(self, df):
+        """Fold YouTube history rows newer than the last processed timestamp"""
+        return self.grids['youtube'].fold(df)
+
+    def fold_telegram(self, df):
+        """Fold Telegram history rows newer than the last processed timestamp
+
+        Channels whose member count could not be read leave their hour empty.
+        """
+        return self.grids['telegram'].fold(df)
+
+    def fold_history(self):
+        """Fold everything newer than the grids from disk
+
+        Reads the memory-mapped series files the collectors append to (NumPy
+        views, no parsing), or the history store while they are empty. The sync
+        only parses history when the files are missing or behind it.
+        """
+        folded = {}
+        for platform, grid in self.grids.items():
+            store = SeriesStore(platform)
+            store.sync()
+            if store.exists():
+                folded[platform] = grid.fold_arrays(*store.arrays(since=grid.until))
+            else:
+                folded[platform] = grid.fold(load_history(platform, start=grid.until))
+        return folded
+
+    def as_of(self, at, baselines=None, engines=None):
+        """The state as it stood at a past time (views of the grids, see HourlyGrid.as_of)
+
+        Without `baselines` the view's baselines warm up on the weeks before `at`
+        and without `engines` its engine state folds the hours up to `at`; a replay
+        passes the ones it carries forward from its previous point.
+        """
+        return DashboardState(**{platform: grid.as_of(at) for platform, grid in self.grids.items()},
+                              baselines=baselines, engines=engines)
+
+    def save(self, root=GRID_DIR):
+        for platform, grid in self.grids.items():
+            grid.save(grid_path(platform, root))
+            self.baselines[platform].save(baseline_path(platform, root))
+            self.engines[platform].save(engine_path(platform, root))
+
+    @classmethod
+    def load(cls, root=GRID_DIR):
+        """Load persisted grids, or None when there are none yet"""
+        youtube = load_grid('youtube', root)
+        if youtube is None:
+            return None
+        # A missing Telegram grid is rebuilt from the full Telegram history on the next fold
+        platforms = ['youtube', 'telegram']
+        return cls(youtube=youtube, telegram=load_grid('telegram', root),
+                   baselines={platform: load_baseline(platform, root) for platform in platforms},
+                   engines={platform: load_engine(platform, root) for platform in platforms})
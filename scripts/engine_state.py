@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Incremental engine state for the hourly grids
+For every series and metric of a grid, keeps the least-squares sums of its
+observed hours, its first and last observed hour, and the portfolio total of
+every hour. Only rows newer than a grid's last timestamp fold in, so every
+column before its last hour is final: each update folds just the columns added
+since the previous one. The engine reads these sums plus short trailing windows
+of the grid (the last 24 hours, the anomaly tail), so a run costs the same
+whatever the length of the history
+
+Layout: data/grid/<source>_engine.npz
+Usage:  python scripts/engine_state.py build    # rebuild the state from the grids
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+from hourly_grid import GRID_DIR, GRID_SERIES, FFILL_LIMIT, forward_fill, load_grid
+from analytics_engine import MIN_ANOMALY_POINTS, last_true
+from instrumentation import traced
+
+# Columns folded per step on a first update, so warming up on years of history stays small in memory
+CHUNK_HOURS = 24 * 30
+
+
+def column_sums(x, y, observed):
+    """Least-squares sums (n, Σx, Σy, Σx², Σxy) of each row over its observed cells"""
+    x = np.where(observed, x, 0).astype(float)
+    y = np.where(observed, y, 0.0)
+    return np.stack([observed.sum(axis=1), x.sum(axis=1), y.sum(axis=1),
+                     (x * x).sum(axis=1), (x * y).sum(axis=1)], axis=1)
+
+
+def total_columns(raw, first, last, lo, hi, limit=FFILL_LIMIT):
+    """Portfolio total of the columns [lo, hi), NaN where it is incomplete
+
+    An hour counts when every series active at that time (between its first and
+    last observation) has a value, so a channel in a gap doesn't look like a drop.
+    """
+    start = max(lo - limit, 0)
+    values = forward_fill(raw[:, start:hi], limit)[:, lo - start:]
+    cols = np.arange(lo, hi)[None, :]
+    active = (first[:, None] >= 0) & (cols >= first[:, None]) & (cols <= last[:, None])
+    complete = ~(active & np.isnan(values)).any(axis=0) & (~np.isnan(raw[:, lo:hi])).any(axis=0)
+    total = np.where(active, np.nan_to_num(values), 0.0).sum(axis=0)
+    return np.where(complete, total, np.nan)
+
+
+def tail_values(raw, last, limit=FFILL_LIMIT):
+    """Forward-filled values of the MIN_ANOMALY_POINTS hours up to each row's `last` column (NaN = gap)"""
+    width = MIN_ANOMALY_POINTS + limit
+    cols = last[:, None] - width + 1 + np.arange(width)
+    window = np.where((cols >= 0) & (last[:, None] >= 0),
+                      raw[np.arange(raw.shape[0])[:, None], np.clip(cols, 0, None)], np.nan)
+    return forward_fill(window, limit)[:, limit:]
+
+
+def window_start(hours, now):
+    """First grid column of the 24-hour growth window ending at `now`"""
+    now = now or datetime.now()
+    start = np.datetime64(pd.Timestamp(now - timedelta(days=1)).floor('h'), 'h')
+    return int(np.searchsorted(hours, start))
+
+
+def engine_path(source, root=GRID_DIR):
+    return os.path.join(root, f"{source}_engine.npz")
+
+
+class EngineState:
+    """Running least-squares sums and portfolio totals of every series and metric of one grid"""
+
+    def __init__(self, metrics, keys=None, arrays=None, start=None, settled=0):
+        self.metrics = list(metrics)
+        self.keys = list(keys) if keys is not None else []
+        arrays = arrays or {}
+        n = len(self.keys)
+
+        def get(name, metric, default):
+            return arrays.get(f'{name}_{metric}', default)
+
+        # Per series: sums with x = hours since its first observation, first and last observed column
+        self.sums = {m: get('sums', m, np.zeros((n, 5))) for m in self.metrics}
+        self.first = {m: get('first', m, np.full(n, -1)) for m in self.metrics}
+        self.last = {m: get('last', m, np.full(n, -1)) for m in self.metrics}
+        # Portfolio total per folded column (NaN = incomplete), the last columns of the series it
+        # was computed with, its first and last complete column and its sums from the first one
+        self.total = {m: get('total', m, np.empty(0)) for m in self.metrics}
+        self.counted = {m: get('counted', m, np.full(n, -1)) for m in self.metrics}
+        self.total_first = {m: int(get('total_first', m, -1)) for m in self.metrics}
+        self.total_last = {m: int(get('total_last', m, -1)) for m in self.metrics}
+        self.total_sums = {m: get('total_sums', m, np.zeros(5)) for m in self.metrics}
+        # First hour of the grid and number of leading columns folded in
+        self.start = np.datetime64(start, 'h') if start is not None else None
+        self.settled = settled
+
+    @classmethod
+    def for_source(cls, source):
+        return cls(GRID_SERIES[source][1])
+
+    def align(self, grid):
+        """Add rows for the series a grid gained since the last update (grids only append keys)"""
+        if (list(grid.keys[:len(self.keys)]) != self.keys or grid.n_hours - 1 < self.settled
+                or (self.settled and grid.start != self.start)):
+            # The grid was rebuilt (another row order, start or a shorter axis): start over
+            self.__init__(self.metrics)
+        self.start = grid.start
+        extra = len(grid.keys) - len(self.keys)
+        if extra <= 0:
+            return
+        for metric in self.metrics:
+            self.sums[metric] = np.concatenate([self.sums[metric], np.zeros((extra, 5))])
+            for arrays in (self.first, self.last, self.counted):
+                arrays[metric] = np.concatenate([arrays[metric], np.full(extra, -1)])
+        self.keys = list(grid.keys)
+
+    @traced()
+    def update(self, grid):
+        """Fold the grid's columns added since the last update
+
+        The grid's last hour can still change (the last observation in an hour
+        wins), so it is only folded once the next hour exists; the engine inputs
+        add it on the fly.
+        """
+        self.align(grid)
+        if grid.n_hours == 0:
+            return 0
+        settled = grid.n_hours - 1
+        for metric in self.metrics:
+            raw = grid.matrix(metric)
+            for lo in range(self.settled, settled, CHUNK_HOURS):
+                self.fold_series(metric, raw, lo, min(lo + CHUNK_HOURS, settled))
+            # Also without new columns: a series back in the last hour reopens its gap
+            self.fold_total(metric, raw, settled)
+        folded, self.settled = settled - self.settled, settled
+        return folded
+
+    def fold_series(self, metric, raw, lo, hi):
+        """Add the columns [lo, hi) to every series' sums"""
+        observed = ~np.isnan(raw[:, lo:hi])
+        first = self.first[metric]
+        starting = (first < 0) & observed.any(axis=1)
+        first[starting] = lo + np.argmax(observed[starting], axis=1)
+        x = np.arange(lo, hi)[None, :] - first[:, None]
+        self.sums[metric] += column_sums(x, raw[:, lo:hi], observed)
+        seen = last_true(observed)
+        self.last[metric] = np.where(seen >= 0, lo + seen, self.last[metric])
+
+    def fold_total(self, metric, raw, settled):
+        """Extend the portfolio total to `settled` columns
+
+        A series that comes back after a long gap is active again over the gap,
+        so the columns since its previous last observation are recomputed too.
+        """
+        first, last = self.live(metric, raw)
+        counted = self.counted[metric]
+        returned = (counted >= 0) & (last > counted)
+        lo = min([self.settled] + (counted[returned] + 1).tolist())
+        self.counted[metric] = last
+        if lo >= settled:
+            return
+
+        previous = self.total[metric]
+        total = np.concatenate([previous[:lo]] + [total_columns(raw, first, last, a, min(a + CHUNK_HOURS, settled))
+                                                 for a in range(lo, settled, CHUNK_HOURS)])
+        complete = ~np.isnan(total)
+
+        origin = self.total_first[metric]
+        if origin < 0 or lo <= origin:
+            # Nothing complete before lo: the first complete column and the sums start over from there
+            found = complete[lo:].any()
+            origin = lo + int(np.argmax(complete[lo:])) if found else -1
+            self.total_first[metric] = origin
+            self.total_sums[metric] = np.zeros(5)
+            if found:
+                self.total_sums[metric] = self.row_sums(total, origin, settled, origin)
+        else:
+            self.total_sums[metric] += (self.row_sums(total, lo, settled, origin)
+                                        - self.row_sums(previous, lo, self.settled, origin))
+
+        if complete[lo:].any():
+            self.total_last[metric] = lo + int(last_true(complete[None, lo:])[0])
+        elif self.total_last[metric] >= lo:
+            self.total_last[metric] = int(last_true(complete[None, :lo])[0])
+        self.total[metric] = total
+
+    @staticmethod
+    def row_sums(total, lo, hi, origin):
+        """Least-squares sums of the complete columns [lo, hi) of a total row, x from `origin`"""
+        values = total[None, lo:hi]
+        return column_sums(np.arange(lo, hi)[None, :] - origin, values, ~np.isnan(values))[0]
+
+    def live(self, metric, raw):
+        """First and last observed column of every series, including the grid's last hour"""
+        n = raw.shape[1]
+        seen = ~np.isnan(raw[:, n - 1]) if n else np.zeros(raw.shape[0], dtype=bool)
+        first = np.where((self.first[metric] < 0) & seen, n - 1, self.first[metric])
+        return first, np.where(seen, n - 1, self.last[metric])
+
+    def series(self, grid, metric, now):
+        """Engine inputs of every series of a metric (see compute_grid_metrics)"""
+        raw = grid.matrix(metric)
+        n = grid.n_hours
+        first, last = self.live(metric, raw)
+        y = raw[:, n - 1:]
+        sums = self.sums[metric] + column_sums(n - 1 - first[:, None], y, ~np.isnan(y))
+        current = raw[np.arange(len(self.keys)), np.maximum(last, 0)]
+        start = window_start(grid.hours, now)
+        return {
+            'sums': sums, 'first': first, 'last': last,
+            'current': np.where(last >= 0, current, np.nan),
+            'window': raw[:, start:], 'window_hours': grid.hours[start:],
+            'tail': tail_values(raw, last)
+        }
+
+    def portfolio(self, grid, metric, now):
+        """Engine inputs of the portfolio total of a metric (one row, see compute_grid_metrics)"""
+        raw = grid.matrix(metric)
+        n = grid.n_hours
+        first, last = self.live(metric, raw)
+        # The grid's last hour, then the whole row up to it
+        total = np.concatenate([self.total[metric], total_columns(raw, first, last, n - 1, n)])
+        complete = not np.isnan(total[-1])
+
+        origin, sums = self.total_first[metric], self.total_sums[metric]
+        if origin < 0 and complete:
+            origin = n - 1
+        if complete:
+            sums = sums + self.row_sums(total, n - 1, n, origin)
+        end = n - 1 if complete else self.total_last[metric]
+
+        start = window_start(grid.hours, now)
+        tail = np.arange(end - MIN_ANOMALY_POINTS + 1, end + 1)
+        return {
+            'sums': sums[None, :], 'first': np.array([origin]), 'last': np.array([end]),
+            'current': np.array([total[end] if end >= 0 else np.nan]),
+            'window': total[None, start:], 'window_hours': grid.hours[start:],
+            'tail': np.where((tail >= 0) & (end >= 0), total[np.clip(tail, 0, None)], np.nan)[None, :]
+        }
+
+    @traced()
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        arrays = {}
+        for m in self.metrics:
+            arrays.update({f'sums_{m}': self.sums[m], f'first_{m}': self.first[m], f'last_{m}': self.last[m],
+                           f'total_{m}': self.total[m], f'counted_{m}': self.counted[m],
+                           f'total_first_{m}': np.array(self.total_first[m]),
+                           f'total_last_{m}': np.array(self.total_last[m]),
+                           f'total_sums_{m}': self.total_sums[m]})
+        np.savez_compressed(tmp_path, keys=np.array(self.keys, dtype=str), metrics=np.array(self.metrics, dtype=str),
+                            start=np.array([self.start if self.start is not None else np.datetime64('NaT')],
+                                           dtype='datetime64[h]'),
+                            settled=np.array(self.settled), **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    @traced()
+    def load(cls, path, metrics):
+        """Read a saved state, or None if there is none (or it was kept for other metrics)"""
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            if data['metrics'].tolist() != list(metrics):
+                return None
+            start = data['start'][0]
+            arrays = {name: data[name] for name in data.files if name not in ('keys', 'metrics', 'start', 'settled')}
+            return cls(metrics, keys=data['keys'].tolist(), arrays=arrays,
+                       start=None if np.isnat(start) else start, settled=int(data['settled']))
+
+
+def load_engine(source, root=GRID_DIR):
+    return EngineState.load(engine_path(source, root), GRID_SERIES[source][1])
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'build'
+
+    if command != 'build':
+        print(f"Unknown command: {command}")
+        print("Usage: python scripts/engine_state.py build")
+        sys.exit(1)
+
+    for source in GRID_SERIES:
+        grid = load_grid(source)
+        if grid is None:
+            print(f"⏭️  {source}: no grid yet (run 'python scripts/hourly_grid.py build')")
+            continue
+        state = EngineState.for_source(source)
+        state.update(grid)
+        state.save(engine_path(source))
+        print(f"✅ {source}: {len(state.keys)} series × {len(state.metrics)} metrics, "
+              f"{state.settled:,} hours folded -> {engine_path(source)}")
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Local fake Telegram Bot API for exercising the collectors without a real bot
+Serves getChat / getChatMemberCount / getChatMember and long-polled getUpdates
+with configurable latency and injected 429 rate limits; --activity emits random
+channel posts, edits, member joins/leaves and discussion messages
+
+Usage:  python scripts/fake_bot_api.py --port 8081 --latency 0.3 --rate-limit-every 5
+        python scripts/fake_bot_api.py --port 8081 --activity 2
+        TELEGRAM_API_BASE=http://127.0.0.1:8081 TELEGRAM_BOT_TOKEN=123:fake \\
+            python scripts/collect_telegram_data.py
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+class FakeBotAPI:
+    """In-memory chat registry and request behaviour of the fake server"""
+
+    def __init__(self, chats=None, latency=0.0, rate_limit_every=0, retry_after=1):
+        self.chats = chats or {}
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.calls = []
+        self.lock = threading.Lock()
+
+        # Pending updates; getUpdates waits on the condition until one arrives
+        self.updates = []
+        self.next_update_id = 1
+        self.message_ids = {}
+        self.updates_ready = threading.Condition()
+
+    @classmethod
+    def from_snapshot(cls, path='data/telegram_latest.json', **kwargs):
+        """Seed chats from a collector snapshot"""
+        chats = {}
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+
+        for channel in snapshot.get('channels', []):
+            if 'error' in channel:
+                continue
+            chats[channel['username']] = {
+                'id': channel['channel_id'],
+                'title': channel['title'],
+                'type': channel.get('type', 'channel'),
+                'description': channel.get('description', ''),
+                'invite_link': channel.get('invite_link'),
+                'has_visible_history': channel.get('has_visible_history', False),
+                'member_count': channel.get('subscribers') or 0,
+                'bot_status': channel.get('bot_status', 'administrator')
+            }
+            chat_data = channel.get('chat_data') or {}
+            if chat_data.get('chat_exists'):
+                chats[f"{channel['username']}_chat"] = {
+                    'id': channel['channel_id'] - 1,
+                    'title': chat_data['chat_title'],
+                    'type': chat_data['chat_type'],
+                    'member_count': chat_data.get('chat_members') or 0,
+                    'bot_status': 'member'
+                }
+
+        return cls(chats=chats, **kwargs)
+
+    def chat_object(self, username):
+        chat = self.chats[username]
+        return {'id': chat['id'], 'title': chat['title'], 'username': username.lstrip('@'),
+                'type': chat.get('type', 'channel')}
+
+    def push_update(self, kind, payload):
+        """Queue one update (kind is channel_post, chat_member, message, ...)"""
+        with self.updates_ready:
+            update = {'update_id': self.next_update_id, kind: payload}
+            self.next_update_id += 1
+            self.updates.append(update)
+            self.updates_ready.notify_all()
+        return update
+
+    def message(self, username, text=None, media=None):
+        """A new message object in a chat"""
+        self.message_ids[username] = self.message_ids.get(username, 0) + 1
+        message = {'message_id': self.message_ids[username], 'date': int(time.time()),
+                   'chat': self.chat_object(username)}
+        if text is not None:
+            message['text'] = text
+        if media:
+            message[media] = [{'file_id': f"fake-{self.message_ids[username]}"}] if media == 'photo' else {'file_id': 'fake'}
+        return message
+
+    def post(self, username, text='New post', media=None):
+        return self.push_update('channel_post', self.message(username, text, media))
+
+    def edit_post(self, username, message_id, text='Edited post'):
+        message = {'message_id': message_id, 'date': int(time.time()) - 60, 'edit_date': int(time.time()),
+                   'chat': self.chat_object(username), 'text': text}
+        return self.push_update('edited_channel_post', message)
+
+    def member_change(self, username, joined=True):
+        """A subscriber joins or leaves; the member count follows"""
+        chat = self.chats[username]
+        chat['member_count'] = max(0, chat.get('member_count', 0) + (1 if joined else -1))
+        user = {'id': random.randint(10 ** 8, 10 ** 9), 'is_bot': False, 'first_name': 'Fake'}
+        statuses = ('left', 'member') if joined else ('member', 'left')
+        return self.push_update('chat_member', {
+            'chat': self.chat_object(username),
+            'from': user,
+            'date': int(time.time()),
+            'old_chat_member': {'user': user, 'status': statuses[0]},
+            'new_chat_member': {'user': user, 'status': statuses[1]}
+        })
+
+    def chat_message(self, username, text='Comment'):
+        return self.push_update('message', self.message(username, text))
+
+    def get_updates(self, params):
+        """getUpdates: confirm everything below offset, then wait up to timeout for new updates"""
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 100)
+        deadline = time.time() + float(params.get('timeout') or 0)
+
+        with self.updates_ready:
+            # Like Telegram, an offset confirms (and forgets) every earlier update
+            self.updates = [update for update in self.updates if update['update_id'] >= offset]
+            while not self.updates and time.time() < deadline:
+                self.updates_ready.wait(deadline - time.time())
+            return self.updates[:limit]
+
+    def simulate(self, interval, seed=None):
+        """Emit a random update every interval seconds from a background thread"""
+        rng = random.Random(seed)
+        channels = [username for username, chat in self.chats.items() if chat.get('type', 'channel') == 'channel']
+        groups = [username for username, chat in self.chats.items() if chat.get('type') in ('group', 'supergroup')]
+
+        def emit():
+            while True:
+                time.sleep(interval)
+                username = rng.choice(channels)
+                roll = rng.random()
+                if roll < 0.3:
+                    self.post(username, text='x' * rng.randint(20, 900), media=rng.choice([None, 'photo', 'video']))
+                elif roll < 0.4 and self.message_ids.get(username):
+                    self.edit_post(username, self.message_ids[username])
+                elif roll < 0.85:
+                    self.member_change(username, joined=rng.random() < 0.7)
+                elif groups:
+                    self.chat_message(rng.choice(groups))
+
+        if channels:
+            threading.Thread(target=emit, daemon=True).start()
+
+    def handle(self, method, params, headers=None):
+        """Return (HTTP status, response body) for one Bot API call"""
+        with self.lock:
+            self.calls.append((time.time(), method, params))
+            call_number = len(self.calls)
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if self.rate_limit_every and call_number % self.rate_limit_every == 0:
+            return 429, {
+                'ok': False,
+                'error_code': 429,
+                'description': f'Too Many Requests: retry after {self.retry_after}',
+                'parameters': {'retry_after': self.retry_after}
+            }
+
+        chat = self.chats.get(params.get('chat_id'))
+        if method in ('getChat', 'getChatMemberCount', 'getChatMember') and chat is None:
+            return 400, {'ok': False, 'error_code': 400, 'description': 'Bad Request: chat not found'}
+
+        if method == 'getChat':
+            result = {key: value for key, value in chat.items() if key not in ('member_count', 'bot_status')}
+            return 200, {'ok': True, 'result': result}
+        if method == 'getChatMemberCount':
+            return 200, {'ok': True, 'result': chat['member_count']}
+        if method == 'getChatMember':
+            return 200, {'ok': True, 'result': {'status': chat['bot_status'], 'can_read_messages': True}}
+        if method == 'getUpdates':
+            return 200, {'ok': True, 'result': self.get_updates(params)}
+
+        return 404, {'ok': False, 'error_code': 404, 'description': 'Not Found'}
+
+
+def make_handler(api):
+    class Handler(BaseHTTPRequestHandler):
+        def _respond(self, params):
+            # Path is /bot<token>/<method>
+            method = urlparse(self.path).path.rsplit('/', 1)[-1]
+            status, body, *extra = api.handle(method, params, self.headers)
+            self.send_response(status)
+            for name, value in (extra[0] if extra else {}).items():
+                self.send_header(name, value)
+            if status == 304:
+                self.end_headers()
+                return
+            payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            self._respond({key: values[-1] for key, values in query.items()})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            body = self.rfile.read(length) if length else b'{}'
+            self._respond(json.loads(body or b'{}'))
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(api, host='127.0.0.1', port=0):
+    """Start the fake server in a background thread and return it"""
+    server = ThreadingHTTPServer((host, port), make_handler(api))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Fake Telegram Bot API server')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every call')
+    parser.add_argument('--rate-limit-every', type=int, default=0, help='answer every Nth call with 429')
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--snapshot', default='data/telegram_latest.json')
+    parser.add_argument('--activity', type=float, default=0.0, help='emit a random update every N seconds')
+    args = parser.parse_args()
+
+    api = FakeBotAPI.from_snapshot(
+        args.snapshot,
+        latency=args.latency,
+        rate_limit_every=args.rate_limit_every,
+        retry_after=args.retry_after
+    )
+    if args.activity:
+        api.simulate(args.activity)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(api))
+    print(f"🤖 Fake Bot API on http://127.0.0.1:{args.port} ({len(api.chats)} chats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nServed {len(api.calls)} calls")
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Local stub of the YouTube Data API v3 for exercising the collector
+Serves search / channels / playlistItems / videos for a synthetic portfolio,
+enforces the 50-id batch limit, pages playlists with page tokens, answers
+If-None-Match with 304 and counts quota units; --activity uploads videos and
+adds views at random
+
+Usage:  python scripts/fake_youtube_api.py --channels 200 --port 8082 --write-channels /tmp/channels.json
+        python scripts/fake_youtube_api.py --channels 5 --videos 3000 --activity 1
+        YOUTUBE_API_BASE=http://127.0.0.1:8082 YOUTUBE_API_KEY=fake \\
+            YOUTUBE_CHANNELS_FILE=/tmp/channels.json python scripts/collect_youtube_data.py
+"""
+
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer
+
+from fake_bot_api import make_handler
+
+QUOTA_COST = {'search': 100, 'channels': 1, 'playlistItems': 1, 'videos': 1}
+
+
+class FakeYouTubeAPI:
+    """Synthetic channels and videos behind the Data API endpoints"""
+
+    def __init__(self, channel_count=10, videos_per_channel=20, latency=0.0):
+        self.latency = latency
+        self.quota_used = 0
+        self.not_modified = 0
+        self.calls = []
+        self.lock = threading.Lock()
+
+        self.channels = {}
+        self.handles = {}
+        self.playlists = {}
+        self.videos = {}
+
+        for i in range(channel_count):
+            channel_id = f"UCstub{i:018d}"
+            handle = f"stub_channel_{i:03d}"
+            playlist_id = 'UU' + channel_id[2:]
+            video_ids = [f"v{i:04d}_{j:05d}" for j in range(videos_per_channel)]
+
+            self.channels[channel_id] = {
+                'id': channel_id,
+                'snippet': {
+                    'title': f"Stub Channel {i:03d}",
+                    'description': f"Synthetic channel #{i}",
+                    'publishedAt': '2025-01-01T00:00:00Z'
+                },
+                'statistics': {
+                    'subscriberCount': str(100 + i * 7),
+                    'viewCount': str(10000 + i * 1000),
+                    'videoCount': str(videos_per_channel)
+                },
+                'contentDetails': {'relatedPlaylists': {'uploads': playlist_id}}
+            }
+            self.handles[handle] = channel_id
+            # Newest upload first, like the real uploads playlist
+            self.playlists[playlist_id] = list(reversed(video_ids))
+
+            for j, video_id in enumerate(video_ids):
+                self.videos[video_id] = self.make_video(video_id, channel_id, j)
+
+    def make_video(self, video_id, channel_id, j):
+        # Upload j of a channel: one day apart, so published order matches playlist order
+        published = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(1735732800 + j * 86400))
+        return {
+            'id': video_id,
+            'snippet': {
+                'title': f"Video {j} of {self.channels[channel_id]['snippet']['title']}",
+                'publishedAt': published,
+                'channelId': channel_id,
+                'channelTitle': self.channels[channel_id]['snippet']['title']
+            },
+            'contentDetails': {'duration': 'PT1M'},
+            'statistics': {
+                'viewCount': str(50 * (j + 1)),
+                'likeCount': str(j),
+                'commentCount': str(j // 2)
+            }
+        }
+
+    def upload(self, channel_id):
+        """Publish a new video at the head of the channel's uploads playlist"""
+        with self.lock:
+            channel = self.channels[channel_id]
+            playlist = self.playlists[channel['contentDetails']['relatedPlaylists']['uploads']]
+            j = len(playlist)
+            video_id = f"v{int(channel_id[6:]):04d}_{j:05d}"
+            self.videos[video_id] = self.make_video(video_id, channel_id, j)
+            playlist.insert(0, video_id)
+            channel['statistics']['videoCount'] = str(len(playlist))
+        return video_id
+
+    def add_views(self, video_id, views=1):
+        with self.lock:
+            statistics = self.videos[video_id]['statistics']
+            statistics['viewCount'] = str(int(statistics['viewCount']) + views)
+
+    def simulate(self, interval, seed=None):
+        """Upload (rarely) or add views to a random recent video every interval seconds"""
+        rng = random.Random(seed)
+        channel_ids = list(self.channels)
+
+        def emit():
+            while True:
+                time.sleep(interval)
+                channel_id = rng.choice(channel_ids)
+                if rng.random() < 0.05:
+                    self.upload(channel_id)
+                else:
+                    playlist = self.playlists[self.channels[channel_id]['contentDetails']['relatedPlaylists']['uploads']]
+                    self.add_views(rng.choice(playlist[:20]), rng.randint(1, 500))
+
+        threading.Thread(target=emit, daemon=True).start()
+
+    def channel_map(self):
+        """{handle: name} for YOUTUBE_CHANNELS_FILE"""
+        return {handle: self.channels[channel_id]['snippet']['title'] for handle, channel_id in self.handles.items()}
+
+    def _error(self, code, message):
+        return code, {'error': {'code': code, 'message': message}}
+
+    def _ids(self, params):
+        ids = [value for value in params.get('id', '').split(',') if value]
+        if len(ids) > 50:
+            return None
+        return ids
+
+    def conditional(self, body, headers):
+        """(status, body, headers) with an ETag; 304 when it matches If-None-Match"""
+        etag = '"' + hashlib.sha1(json.dumps(body, sort_keys=True).encode('utf-8')).hexdigest() + '"'
+        if headers is not None and headers.get('If-None-Match') == etag:
+            with self.lock:
+                self.not_modified += 1
+            return 304, None, {'ETag': etag}
+        return 200, {**body, 'etag': etag}, {'ETag': etag}
+
+    def handle(self, method, params, headers=None):
+        """Return (HTTP status, response body[, headers]) for one API call"""
+        with self.lock:
+            self.calls.append((time.time(), method, params))
+            self.quota_used += QUOTA_COST.get(method, 1)
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if method == 'search':
+            query = params.get('q', '').lstrip('@')
+            channel_id = self.handles.get(query)
+            items = [{'snippet': {'channelId': channel_id, 'title': self.channels[channel_id]['snippet']['title']}}] if channel_id else []
+            return 200, {'items': items}
+
+        if method == 'channels':
+            if 'forHandle' in params:
+                channel_id = self.handles.get(params['forHandle'].lstrip('@'))
+                return 200, {'items': [{'id': channel_id}] if channel_id else []}
+            ids = self._ids(params)
+            if ids is None:
+                return self._error(400, 'Too many ids (max 50)')
+            return 200, {'items': [self.channels[i] for i in ids if i in self.channels]}
+
+        if method == 'playlistItems':
+            video_ids = self.playlists.get(params.get('playlistId'))
+            if video_ids is None:
+                return self._error(404, 'playlistNotFound')
+            limit = min(int(params.get('maxResults', 5)), 50)
+            # Page tokens encode an offset into the playlist, like the real ones
+            token = params.get('pageToken')
+            offset = int(token[len('page'):]) if token else 0
+            with self.lock:
+                page = video_ids[offset:offset + limit]
+                total = len(video_ids)
+            body = {
+                'items': [{'contentDetails': {'videoId': video_id}} for video_id in page],
+                'pageInfo': {'totalResults': total, 'resultsPerPage': limit}
+            }
+            if offset + limit < total:
+                body['nextPageToken'] = f"page{offset + limit}"
+            return self.conditional(body, headers)
+
+        if method == 'videos':
+            ids = self._ids(params)
+            if ids is None:
+                return self._error(400, 'Too many ids (max 50)')
+            with self.lock:
+                items = json.loads(json.dumps([self.videos[i] for i in ids if i in self.videos]))
+            return self.conditional({'items': items}, headers)
+
+        return self._error(404, 'Not Found')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Stub YouTube Data API server')
+    parser.add_argument('--port', type=int, default=8082)
+    parser.add_argument('--channels', type=int, default=10)
+    parser.add_argument('--videos', type=int, default=20, help='uploads per channel')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every call')
+    parser.add_argument('--write-channels', help='write {handle: name} JSON for YOUTUBE_CHANNELS_FILE')
+    parser.add_argument('--activity', type=float, default=0.0, help='upload or add views every N seconds')
+    args = parser.parse_args()
+
+    api = FakeYouTubeAPI(args.channels, args.videos, args.latency)
+    if args.write_channels:
+        with open(args.write_channels, 'w', encoding='utf-8') as f:
+            json.dump(api.channel_map(), f, indent=2)
+
+    if args.activity:
+        api.simulate(args.activity)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(api))
+    print(f"📺 Fake YouTube API on http://127.0.0.1:{args.port} ({args.channels} channels)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nServed {len(api.calls)} calls, {api.quota_used} quota units ({api.not_modified} not modified)")
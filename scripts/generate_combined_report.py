@@ -8,6 +8,13 @@ import pandas as pd
 from datetime import datetime, timedelta
 import os
 
+from rollups import window_delta
+from write_layer import write_text
+from instrumentation import traced, export
+
+REPORT_PATH = 'README.md'
+
+@traced()
 def load_latest_data():
     """Load latest data from both sources"""
     youtube_data = None
@@ -25,9 +32,19 @@ def load_latest_data():
     
     return youtube_data, telegram_data
 
-def generate_report():
-    """Generate markdown report for README"""
-    youtube_data, telegram_data = load_latest_data()
+def load_growth():
+    """24h subscriber change per YouTube channel from the hourly rollups (None if unavailable)"""
+    try:
+        return window_delta('youtube', days=1, period='hour')
+    except (OSError, KeyError, ValueError) as e:
+        print(f"⚠️  Growth trends unavailable: {e}")
+        return None
+
+@traced()
+def generate_report(youtube_data=None, telegram_data=None, growth_24h=None):
+    """Generate markdown report for README; the pipeline passes data it already loaded"""
+    if youtube_data is None and telegram_data is None:
+        youtube_data, telegram_data = load_latest_data()
     
     # Start report
     report = f"# 📊 AI Media Empire - Analytics Dashboard\n\n"
@@ -103,39 +120,25 @@ def generate_report():
     # Growth trends (if historical data exists)
     report += f"\n## 📈 Growth Trends\n\n"
     
-    # Try to load historical data
-    try:
-        youtube_csv = pd.read_csv('data/youtube_stats.csv') if os.path.exists('data/youtube_stats.csv') else None
-        telegram_csv = pd.read_csv('data/telegram_stats.csv') if os.path.exists('data/telegram_stats.csv') else None
+    # 24h change per channel from the hourly rollups (a few dozen rows per channel)
+    if growth_24h is None:
+        growth_24h = load_growth()
+    
+    if growth_24h is not None and not growth_24h.empty:
+        report += f"### YouTube Growth (24h)\n\n"
+        titles = {ch['channel_id']: ch['title'] for ch in (youtube_data or {}).get('channels', [])}
         
-        if youtube_csv is not None and not youtube_csv.empty:
-            # Convert timestamp to datetime
-            youtube_csv['timestamp'] = pd.to_datetime(youtube_csv['timestamp'])
-            
-            # Get data from 24 hours ago
-            yesterday = datetime.now() - timedelta(days=1)
-            yesterday_data = youtube_csv[youtube_csv['timestamp'] <= yesterday]
-            
-            if not yesterday_data.empty:
-                report += f"### YouTube Growth (24h)\n\n"
-                
-                for channel_id in youtube_csv['channel_id'].unique():
-                    channel_data = youtube_csv[youtube_csv['channel_id'] == channel_id].sort_values('timestamp')
-                    if len(channel_data) > 1:
-                        latest = channel_data.iloc[-1]
-                        previous = channel_data.iloc[-2]
-                        growth = latest['subscribers'] - previous['subscribers']
-                        if growth != 0:
-                            report += f"- **{latest['title']}**: {growth:+,} subscribers\n"
-    except:
-        pass
+        for channel_id, growth in growth_24h.items():
+            if growth != 0:
+                report += f"- **{titles.get(channel_id, channel_id)}**: {int(growth):+,} subscribers\n"
     
     # Data access
     report += f"\n## 🔗 Data Access\n\n"
     report += f"### YouTube Data\n"
     report += f"- Latest: [data/latest.json](data/latest.json)\n"
     report += f"- History: [data/youtube_stats.csv](data/youtube_stats.csv)\n"
-    report += f"- API: `https://raw.githubusercontent.com/Sigurd313/ai-media-empire-analytics/main/data/latest.json`\n\n"
+    report += f"- API: `https://raw.githubusercontent.com/Sigurd313/ai-media-empire-analytics/main/data/latest.json`\n"
+    report += f"- Report: [youtube_report.md](youtube_report.md)\n\n"
     
     report += f"### Telegram Data\n"
     report += f"- Latest: [data/telegram_latest.json](data/telegram_latest.json)\n"
@@ -150,11 +153,12 @@ def generate_report():
     report += f"---\n"
     report += f"*Generated by AI Media Empire Analytics Bot | [Dmitry DataDriven]*\n"
     
-    # Save report
-    with open('README.md', 'w', encoding='utf-8') as f:
-        f.write(report)
+    # Save report (left untouched when only the update time changed)
+    write_text(REPORT_PATH, report)
     
     print("✅ Combined report generated successfully!")
+    return report
 
 if __name__ == "__main__":
     generate_report()
+    export('combined_report')
@@ -1,25 +1,39 @@
 #!/usr/bin/env python3
 """
-Generate README report from collected data
+Generate the YouTube report from collected data
+(README.md is the combined report, see generate_combined_report.py)
 """
 
 import json
 import pandas as pd
 from datetime import datetime, timedelta
 
-def generate_report():
-    """Generate markdown report for README"""
+from rollups import values_at
+from write_layer import write_text
+from instrumentation import traced, export
+
+REPORT_PATH = 'youtube_report.md'
+
+def load_closing():
+    """Closing subscriber counts at the end of yesterday, from the daily rollups"""
+    yesterday = datetime.now() - timedelta(days=1)
+    end_of_yesterday = datetime.combine(yesterday.date(), datetime.max.time())
+    try:
+        return values_at('youtube', end_of_yesterday)
+    except (OSError, KeyError, ValueError):
+        return pd.DataFrame()
+
+@traced()
+def generate_report(data=None, closing=None):
+    """Generate the markdown YouTube report; the pipeline passes data it already loaded"""
     
     # Load latest data
-    with open('data/latest.json', 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    if data is None:
+        with open('data/latest.json', 'r', encoding='utf-8') as f:
+            data = json.load(f)
     
-    # Load historical data for growth calculation
-    try:
-        df = pd.read_csv('data/youtube_stats.csv')
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-    except:
-        df = pd.DataFrame()
+    if closing is None:
+        closing = load_closing()
     
     # Start report
     report = f"# 📊 AI Media Empire - YouTube Analytics\n\n"
@@ -44,13 +58,9 @@ def generate_report():
     for channel in data['channels']:
         # Calculate daily growth if historical data exists
         growth = "N/A"
-        if not df.empty:
-            yesterday = datetime.now() - timedelta(days=1)
-            hist = df[(df['channel_id'] == channel['channel_id']) & 
-                     (df['timestamp'].dt.date <= yesterday.date())]
-            if not hist.empty:
-                last_subs = hist.iloc[-1]['subscribers']
-                growth = f"{channel['subscribers'] - last_subs:+,}"
+        if not closing.empty and channel['channel_id'] in closing.index:
+            last_subs = int(closing.loc[channel['channel_id'], 'subscribers_last'])
+            growth = f"{channel['subscribers'] - last_subs:+,}"
         
         report += f"| {channel['title']} | {channel['subscribers']:,} | {channel['views']:,} | {channel['videos']} | {growth} |\n"
     
@@ -78,11 +88,12 @@ def generate_report():
     report += f"---\n"
     report += f"*Generated by AI Media Empire Analytics Bot*\n"
     
-    # Save report
-    with open('README.md', 'w', encoding='utf-8') as f:
-        f.write(report)
+    # Save report (left untouched when only the update time changed)
+    write_text(REPORT_PATH, report)
     
-    print("✅ Report generated successfully!")
+    print(f"✅ Report generated successfully! ({REPORT_PATH})")
+    return report
 
 if __name__ == "__main__":
     generate_report()
+    export('report')
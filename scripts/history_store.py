@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Columnar history store for AI Media Empire Analytics
+Keeps channel history as month-partitioned Parquet files with typed timestamps
+(tables rewritten every hour, like the hourly rollups, are partitioned by day)
+
+Layout: data/history/<source>/<YYYY-MM>.parquet
+Usage:  python scripts/history_store.py migrate   # one-shot import of the legacy CSVs
+"""
+
+import os
+import sys
+import pandas as pd
+
+from instrumentation import traced
+
+HISTORY_DIR = 'data/history'
+# Rollup tables (written by rollups.py, read here for ranges past the raw retention)
+ROLLUP_DIR = os.path.join(HISTORY_DIR, 'rollups')
+
+# Legacy append-only CSVs (still written by the collectors as a public export)
+LEGACY_CSV = {
+    'youtube': 'data/youtube_stats.csv',
+    'telegram': 'data/telegram_stats.csv'
+}
+
+
+# Partition name per granularity: one file per month, or per day
+PARTITION_FORMATS = {'month': '%Y-%m', 'day': '%Y-%m-%d'}
+
+
+def partition_key(timestamp, granularity='month'):
+    """Partition name for a timestamp (one file per month, or per day)"""
+    return timestamp.strftime(PARTITION_FORMATS[granularity])
+
+
+def key_granularity(key):
+    """Granularity of a partition name"""
+    return 'day' if len(key) == len('YYYY-MM-DD') else 'month'
+
+
+@traced()
+def read_legacy_csv(path):
+    """Parse a legacy history CSV with typed timestamps"""
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    df = pd.read_csv(path)
+    if 'timestamp' in df.columns:
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df
+
+
+class HistoryStore:
+    def __init__(self, source, root=HISTORY_DIR, granularity='month'):
+        self.source = source
+        self.path = os.path.join(root, source)
+        self.granularity = granularity
+
+    def partition_key(self, timestamp):
+        return partition_key(timestamp, self.granularity)
+
+    def exists(self):
+        """Whether any partition has been written yet"""
+        return bool(self.partitions())
+
+    def partitions(self):
+        """List (key, path) of all partitions in time order"""
+        if not os.path.isdir(self.path):
+            return []
+        return [
+            (name[:-len('.parquet')], os.path.join(self.path, name))
+            for name in sorted(os.listdir(self.path))
+            if name.endswith('.parquet')
+        ]
+
+    def _write_partition(self, path, df):
+        """Atomically replace a partition file"""
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = path + '.tmp'
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    def write_partition(self, key, df):
+        """Replace one partition with a DataFrame"""
+        self._write_partition(os.path.join(self.path, f"{key}.parquet"), df)
+
+    @traced()
+    def append(self, rows):
+        """Append rows (DataFrame or list of dicts) to their month partitions"""
+        df = pd.DataFrame(rows)
+        if df.empty:
+            return 0
+
+        # First write ever: seed the store from the legacy CSV so no history is lost
+        if not self.exists() and self.source in LEGACY_CSV:
+            self.import_csv(LEGACY_CSV[self.source])
+
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+
+        for key, part in df.groupby(df['timestamp'].map(self.partition_key), sort=True):
+            path = os.path.join(self.path, f"{key}.parquet")
+            if os.path.exists(path):
+                part = pd.concat([pd.read_parquet(path), part], ignore_index=True)
+            self._write_partition(path, part.sort_values('timestamp', kind='stable'))
+
+        return len(df)
+
+    def import_csv(self, path):
+        """Replace the store contents with a legacy CSV history"""
+        df = read_legacy_csv(path)
+        if df.empty:
+            return 0
+
+        for _, old_path in self.partitions():
+            os.remove(old_path)
+
+        for key, part in df.groupby(df['timestamp'].map(self.partition_key), sort=True):
+            self._write_partition(os.path.join(self.path, f"{key}.parquet"), part)
+
+        return len(df)
+
+    @traced()
+    def load(self, start=None, end=None, columns=None):
+        """Load rows with start <= timestamp <= end, reading only the partitions and columns needed"""
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+
+        if columns is not None:
+            columns = ['timestamp'] + [col for col in columns if col != 'timestamp']
+
+        frames = []
+        for key, path in self.partitions():
+            if start is not None and key < partition_key(start, key_granularity(key)):
+                continue
+            if end is not None and key > partition_key(end, key_granularity(key)):
+                continue
+            frames.append(pd.read_parquet(path, columns=columns))
+
+        if not frames:
+            return pd.DataFrame()
+
+        df = pd.concat(frames, ignore_index=True)
+        if start is not None:
+            df = df[df['timestamp'] >= start]
+        if end is not None:
+            df = df[df['timestamp'] <= end]
+        return df.reset_index(drop=True)
+
+
+def raw_earliest(source):
+    """Timestamp of the oldest raw row still kept (None if the store is empty)"""
+    partitions = HistoryStore(source).partitions()
+    if not partitions:
+        return None
+    return pd.read_parquet(partitions[0][1], columns=['timestamp'])['timestamp'].min()
+
+
+def raw_latest(source):
+    """Timestamp of the newest raw row (None if the store is empty); reads one column of one partition"""
+    partitions = HistoryStore(source).partitions()
+    if not partitions:
+        return None
+    return pd.read_parquet(partitions[-1][1], columns=['timestamp'])['timestamp'].max()
+
+
+def older_than_raw(source, start=None, end=None):
+    """History rows for a range the raw store no longer holds, from the finest rollups left
+
+    Each rollup bucket becomes one row at its last observation with the closing values,
+    so consumers see the same columns as raw history (at hourly or daily resolution).
+    """
+    raw_from = raw_earliest(source)
+    if raw_from is None or (start is not None and pd.Timestamp(start) >= raw_from):
+        return pd.DataFrame()
+
+    frames = []
+    covered_from = raw_from
+    for period in ['hour', 'day']:
+        df = HistoryStore(period, root=os.path.join(ROLLUP_DIR, source)).load(start=start, end=end)
+        if df.empty:
+            continue
+        df = df[df['last_at'] < covered_from]
+        if df.empty:
+            continue
+        # Rollup tables lead with the series key; <metric>_last holds the closing values
+        key = df.columns[0]
+        frames.append(pd.DataFrame({
+            'timestamp': df['last_at'],
+            key: df[key],
+            **{column[:-len('_last')]: df[column] for column in df.columns if column.endswith('_last')}
+        }))
+        covered_from = df['last_at'].min()
+
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames[::-1], ignore_index=True).sort_values('timestamp', kind='stable').reset_index(drop=True)
+
+
+def load_history(source, start=None, end=None, columns=None):
+    """Load history from the columnar store, falling back to the legacy CSV"""
+    store = HistoryStore(source)
+    if store.exists():
+        df = store.load(start=start, end=end, columns=columns)
+        
+        # Ranges older than the raw retention window are served from the rollups
+        older = older_than_raw(source, start=start, end=end)
+        if older.empty:
+            return df
+        if columns is not None:
+            older = older[[col for col in ['timestamp'] + list(columns) if col in older.columns]]
+        return pd.concat([older, df], ignore_index=True)
+
+    df = read_legacy_csv(LEGACY_CSV[source])
+    if df.empty:
+        return df
+    if start is not None:
+        df = df[df['timestamp'] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df['timestamp'] <= pd.Timestamp(end)]
+    if columns is not None:
+        keep = ['timestamp'] + [col for col in columns if col != 'timestamp']
+        df = df[[col for col in keep if col in df.columns]]
+    return df.reset_index(drop=True)
+
+
+def migrate():
+    """Import the legacy CSVs into the columnar store"""
+    for source, csv_path in LEGACY_CSV.items():
+        if not os.path.exists(csv_path):
+            print(f"⏭️  {csv_path} not found, skipping {source}")
+            continue
+        store = HistoryStore(source)
+        count = store.import_csv(csv_path)
+        print(f"✅ {source}: imported {count:,} rows into {len(store.partitions())} partitions ({store.path})")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'migrate'
+    if command == 'migrate':
+        migrate()
+    else:
+        print(f"Unknown command: {command}")
+        print("Usage: python scripts/history_store.py migrate")
+        sys.exit(1)
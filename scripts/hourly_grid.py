@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Hourly grid resampling for the channel history
+Aligns every series of a source onto one shared hourly axis (series × hours,
+contiguous float64 per metric) so analytics are array ops that don't depend on
+collection jitter: the last observation in each hour wins, skipped runs are
+bridged by a limited forward fill and longer gaps stay marked as missing
+
+Layout: data/grid/<source>.npz
+Usage:  python scripts/hourly_grid.py build     # rebuild the grids from the full history
+        python scripts/hourly_grid.py info      # shape and gap statistics
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+from instrumentation import traced
+
+GRID_DIR = 'data/grid'
+
+# Series key and metrics resampled per source
+GRID_SERIES = {
+    'youtube': ('channel_id', ['subscribers', 'views', 'videos']),
+    'telegram': ('username', ['subscribers'])
+}
+
+# Hours a value is carried forward over skipped runs before the cell counts as a gap
+FFILL_LIMIT = 6
+
+# Columns are allocated in blocks so hourly folds don't reallocate every run
+GROW_HOURS = 24 * 30
+
+HOUR = np.timedelta64(1, 'h')
+
+
+def forward_fill(raw, limit=FFILL_LIMIT):
+    """Carry each observation forward along the rows for up to `limit` hours (NaN beyond and before the first)
+
+    Only looks back, so a trailing slice with `limit` extra leading columns fills
+    its remaining columns exactly like the whole matrix.
+    """
+    cols = np.arange(raw.shape[1])
+    # Column of the latest observation at or before each cell (-1 before the first)
+    last = np.where(~np.isnan(raw), cols, -1)
+    np.maximum.accumulate(last, axis=1, out=last)
+
+    values = raw[np.arange(raw.shape[0])[:, None], np.maximum(last, 0)]
+    values[(last < 0) | (cols - last > limit)] = np.nan
+    return values
+
+
+class HourlyGrid:
+    """Series × hours matrices of one source, NaN where an hour has no observation"""
+
+    def __init__(self, key, metrics, keys=None, start=None, values=None, until=None):
+        self.key = key
+        self.metrics = list(metrics)
+        self.keys = list(keys) if keys is not None else []
+        self.index = {series: row for row, series in enumerate(self.keys)}
+        # First hour of the axis (datetime64[h]) and number of hours in use
+        self.start = np.datetime64(start, 'h') if start is not None else None
+        self.n_hours = next(iter(values.values())).shape[1] if values else 0
+        self.values = {
+            metric: np.ascontiguousarray(values[metric], dtype=float) if values else np.empty((0, 0))
+            for metric in self.metrics
+        }
+        # Latest raw timestamp folded in
+        self.until = pd.Timestamp(until) if until is not None else None
+        # Set on as_of() views: the full grid whose leading columns the view shows
+        self.base = None
+        self._filled = {}
+
+    @classmethod
+    def for_source(cls, source):
+        key, metrics = GRID_SERIES[source]
+        return cls(key, metrics)
+
+    @property
+    def hours(self):
+        """Hour axis (datetime64[h]) of the columns in use"""
+        if self.start is None:
+            return np.array([], dtype='datetime64[h]')
+        return self.start + np.arange(self.n_hours)
+
+    def matrix(self, metric):
+        """Raw aligned values of a metric (series × hours view, NaN = not observed)"""
+        return self.values[metric][:len(self.keys), :self.n_hours]
+
+    def _reserve(self, n_series, first_hour, last_hour):
+        """Make room for n_series rows and the hour range, keeping existing cells"""
+        shift = 0
+        if self.start is None:
+            self.start = first_hour
+        elif first_hour < self.start:
+            shift = int((self.start - first_hour) / HOUR)
+            self.start = first_hour
+        n_hours = max(self.n_hours + shift, int((last_hour - self.start) / HOUR) + 1)
+
+        for metric in self.metrics:
+            current = self.values[metric]
+            rows, cols = current.shape
+            if n_series <= rows and n_hours <= cols and shift == 0:
+                continue
+            grown = np.full((max(n_series, rows), max(n_hours + GROW_HOURS, cols)), np.nan)
+            grown[:rows, shift:shift + self.n_hours] = current[:, :self.n_hours]
+            self.values[metric] = grown
+        self.n_hours = n_hours
+
+    def fold(self, rows):
+        """Resample history rows newer than `until` into their hourly cells; returns rows folded"""
+        if rows is None or rows.empty or self.key not in rows.columns:
+            return 0
+        metrics = [metric for metric in self.metrics if metric in rows.columns]
+        if not metrics:
+            return 0
+
+        keys, series = np.unique(rows[self.key].astype(str).to_numpy(), return_inverse=True)
+        return self.fold_arrays(
+            keys.tolist(),
+            pd.to_datetime(rows['timestamp']).to_numpy(),
+            series,
+            {metric: pd.to_numeric(rows[metric], errors='coerce').to_numpy(dtype=float) for metric in metrics}
+        )
+
+    @traced()
+    def fold_arrays(self, keys, timestamps, series, metrics):
+        """Resample rows given as arrays into their hourly cells; returns rows folded
+
+        series holds codes into keys, timestamps is datetime64 and metrics maps
+        metric -> values (NaN or negative = not observed). The arrays may be
+        memory-mapped views (see series_store.py); only rows newer than `until` are read.
+        """
+        if self.until is not None:
+            newer = timestamps > np.datetime64(self.until.to_datetime64())
+            timestamps, series = timestamps[newer], series[newer]
+            metrics = {metric: values[newer] for metric, values in metrics.items()}
+        if len(timestamps) == 0:
+            return 0
+
+        # Grid row of every series code that has rows here
+        rows_of = np.full(len(keys), -1)
+        for code in np.unique(series):
+            key = keys[code]
+            if key not in self.index:
+                self.index[key] = len(self.keys)
+                self.keys.append(key)
+            rows_of[code] = self.index[key]
+
+        hours = timestamps.astype('datetime64[h]')
+        self._reserve(len(self.keys), hours.min(), hours.max())
+        row = rows_of[series]
+        col = ((hours - self.start) / HOUR).astype(int)
+
+        # Last observation per series and hour (duplicated runs, ~1 s spread within a run)
+        order = np.argsort(timestamps, kind='stable')[::-1]
+        _, first_seen = np.unique(row[order] * self.n_hours + col[order], return_index=True)
+        keep = order[first_seen]
+
+        for metric in [metric for metric in self.metrics if metric in metrics]:
+            value = np.asarray(metrics[metric][keep], dtype=float)
+            known = value >= 0  # False for NaN and the store's MISSING marker
+            self.values[metric][row[keep][known], col[keep][known]] = value[known]
+
+        until = pd.Timestamp(timestamps.max())
+        self.until = until if self.until is None else max(self.until, until)
+        self._filled = {}
+        return len(timestamps)
+
+    def filled(self, metric, limit=FFILL_LIMIT):
+        """Forward-filled values (NaN in gaps longer than `limit` hours) and the observed mask"""
+        if self.base is not None:
+            # The fill only looks back, so the leading columns of the full grid's fill are the view's fill
+            if (metric, limit) not in self.base._filled:
+                self.base._filled[(metric, limit)] = self.base.filled(metric, limit)
+            values, observed = self.base._filled[(metric, limit)]
+            return values[:, :self.n_hours], observed[:, :self.n_hours]
+
+        raw = self.matrix(metric)
+        return forward_fill(raw, limit), ~np.isnan(raw)
+
+    def as_of(self, at):
+        """Read-only view of the grid as it stood at `at`: the hours up to and including at's hour
+
+        The columns are found with a binary search on the hour axis and shared with
+        this grid (no copy), so replaying many points in time never re-filters the history.
+        """
+        hour = np.datetime64(pd.Timestamp(at).floor('h'), 'h')
+        view = HourlyGrid(self.key, self.metrics)
+        view.keys, view.index = self.keys, self.index
+        view.start, view.values = self.start, self.values
+        view.n_hours = int(np.searchsorted(self.hours, hour, side='right'))
+        view.until = min(self.until, pd.Timestamp(at)) if self.until is not None else None
+        view.base = self
+        return view
+
+    def to_arrays(self):
+        arrays = {
+            'keys': np.array(self.keys, dtype=str),
+            'start': np.array([self.start if self.start is not None else np.datetime64('NaT')], dtype='datetime64[h]'),
+            'until': np.array([self.until.to_datetime64() if self.until is not None else np.datetime64('NaT')],
+                              dtype='datetime64[ns]')
+        }
+        for metric in self.metrics:
+            arrays[f'values_{metric}'] = self.matrix(metric)
+        return arrays
+
+    @traced()
+    def save(self, path):
+        """Write the grid (columns in use only) to a compressed .npz"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(tmp_path, **self.to_arrays())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    @traced()
+    def load(cls, path, key, metrics):
+        """Read a saved grid, or None if there is none (or it predates a metric)"""
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            if any(f'values_{metric}' not in data for metric in metrics):
+                return None
+            start = data['start'][0]
+            until = data['until'][0]
+            return cls(
+                key, metrics,
+                keys=data['keys'].tolist(),
+                start=None if np.isnat(start) else start,
+                values={metric: data[f'values_{metric}'] for metric in metrics},
+                until=None if np.isnat(until) else until
+            )
+
+
+def grid_path(source, root=GRID_DIR):
+    return os.path.join(root, f"{source}.npz")
+
+
+def build_grid(source, history):
+    """Grid of a source from a full history table"""
+    grid = HourlyGrid.for_source(source)
+    grid.fold(history)
+    return grid
+
+
+def load_grid(source, root=GRID_DIR):
+    key, metrics = GRID_SERIES[source]
+    return HourlyGrid.load(grid_path(source, root), key, metrics)
+
+
+if __name__ == "__main__":
+    from history_store import load_history
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'info'
+
+    if command == 'build':
+        for source in GRID_SERIES:
+            grid = build_grid(source, load_history(source))
+            grid.save(grid_path(source))
+            print(f"✅ {source}: {len(grid.keys)} series × {grid.n_hours:,} hours -> {grid_path(source)}")
+    elif command == 'info':
+        for source in GRID_SERIES:
+            grid = load_grid(source)
+            if grid is None:
+                print(f"⏭️  {source}: no grid yet (run 'build')")
+                continue
+            values, observed = grid.filled('subscribers')
+            # Gap cells: missing hours between a series' first and last observation
+            started = np.logical_or.accumulate(observed, axis=1)
+            running = np.logical_or.accumulate(observed[:, ::-1], axis=1)[:, ::-1]
+            gaps = np.isnan(values) & started & running
+            print(f"📊 {source}: {len(grid.keys)} series × {grid.n_hours:,} hours from {grid.start} "
+                  f"({observed.mean():.1%} observed, {gaps.mean():.1%} gap cells)")
+    else:
+        print(f"Unknown command: {command}")
+        print("Usage: python scripts/hourly_grid.py build | info")
+        sys.exit(1)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Pooled HTTP client for the collectors
+One keep-alive requests.Session shared by asyncio tasks, with per-call timeouts,
+bounded concurrency and retries that honor rate-limit hints (retry_after / Retry-After).
+Every call is a span with latency, status, retries and bytes per API endpoint
+"""
+
+import time
+import asyncio
+import functools
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import span, count, observe
+
+
+def endpoint_labels(url):
+    """(api host, endpoint) of a URL; the endpoint is the last path segment, so Bot API tokens never leak"""
+    parsed = urlparse(url)
+    return parsed.hostname or '', parsed.path.rstrip('/').rsplit('/', 1)[-1]
+
+
+class AsyncHTTPClient:
+    def __init__(self, max_concurrency=8, timeout=10, max_retries=3, backoff=0.5):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_concurrency = max_concurrency
+
+        # Keep-alive pool sized to the concurrency limit
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_concurrency, pool_maxsize=max_concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._semaphore = None
+
+        # Per-run counters
+        self.requests_made = 0
+        self.retries = 0
+
+    @property
+    def semaphore(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def retry_delay(self, response, data, attempt):
+        """Seconds to wait before retrying, or None if the response is final"""
+        if response.status_code == 429 or (isinstance(data, dict) and data.get('error_code') == 429):
+            # Telegram puts the hint in the body, most other APIs in the header
+            if isinstance(data, dict) and data.get('parameters', {}).get('retry_after') is not None:
+                return float(data['parameters']['retry_after'])
+            if response.headers.get('Retry-After', '').isdigit():
+                return float(response.headers['Retry-After'])
+            return self.backoff * 2 ** attempt
+        if response.status_code >= 500:
+            return self.backoff * 2 ** attempt
+        return None
+
+    async def request(self, method, url, endpoint=None, **kwargs):
+        """Send a request through the pool and return (response, parsed JSON or None)
+
+        endpoint names the call in metrics when the URL's last segment is a secret (webhooks).
+        """
+        loop = asyncio.get_running_loop()
+        call = functools.partial(self.session.request, method, url, timeout=self.timeout, **kwargs)
+        api, default_endpoint = endpoint_labels(url)
+        endpoint = endpoint or default_endpoint
+        started = time.perf_counter()
+
+        with span(f"http {method} {endpoint}", api=api) as record:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    async with self.semaphore:
+                        self.requests_made += 1
+                        response = await loop.run_in_executor(self.executor, call)
+                except requests.RequestException as e:
+                    count('http_requests_total', api=api, endpoint=endpoint, status=type(e).__name__)
+                    if attempt == self.max_retries:
+                        raise
+                    self.retries += 1
+                    count('http_retries_total', api=api, endpoint=endpoint)
+                    await asyncio.sleep(self.backoff * 2 ** attempt)
+                    continue
+
+                request = response.request
+                count('http_requests_total', api=api, endpoint=endpoint, status=str(response.status_code))
+                count('http_request_bytes_total', len(request.url) + len(request.body or b''), api=api, endpoint=endpoint)
+                count('http_response_bytes_total', len(response.content), api=api, endpoint=endpoint)
+
+                try:
+                    data = response.json()
+                except ValueError:
+                    data = None
+
+                delay = self.retry_delay(response, data, attempt)
+                if delay is None or attempt == self.max_retries:
+                    record['attrs'].update(status=response.status_code, retries=attempt, bytes=len(response.content))
+                    observe('http_request_duration_seconds', time.perf_counter() - started, api=api, endpoint=endpoint)
+                    return response, data
+
+                self.retries += 1
+                count('http_retries_total', api=api, endpoint=endpoint)
+                await asyncio.sleep(delay)
+
+    async def get_json(self, url, params=None, **kwargs):
+        """GET a URL and return the parsed JSON body (None if not JSON)"""
+        _, data = await self.request('GET', url, params=params, **kwargs)
+        return data
+
+    async def post_json(self, url, payload, **kwargs):
+        """POST a JSON payload and return the response"""
+        response, _ = await self.request('POST', url, json=payload, **kwargs)
+        return response
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
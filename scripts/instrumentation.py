@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+In-process instrumentation for every pipeline stage
+Spans (nested through contextvars, so concurrent asyncio tasks keep their
+parent), counters and latency histograms are held in memory for one run and
+exported as an OpenMetrics text file plus a JSON trace (Chrome trace event
+format, opens in Perfetto / chrome://tracing). Stdlib only, so the fast
+entry points can import it
+
+Layout: metrics/<job>_<YYYYMMDD_HHMMSS>.prom
+        metrics/<job>_<YYYYMMDD_HHMMSS>.trace.json
+Usage:  from instrumentation import span, traced, count, observe, export
+        python scripts/instrumentation.py summary [job] [--runs 10]
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import inspect
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+
+METRICS_DIR = os.environ.get('METRICS_DIR', 'metrics')
+
+# INSTRUMENTATION=0 keeps recording (it is cheap) but skips the export
+ENABLED = os.environ.get('INSTRUMENTATION', '1') != '0'
+
+# Histogram buckets (seconds) for every latency
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Spans kept per run for the trace (metrics keep counting past it)
+MAX_SPANS = 50000
+
+HELP = {
+    'span_duration_seconds': 'Wall time of each pipeline stage',
+    'http_request_duration_seconds': 'HTTP request latency per API endpoint, retries included',
+    'http_requests_total': 'HTTP requests sent, per endpoint and status',
+    'http_retries_total': 'HTTP requests retried after a rate limit, 5xx or connection error',
+    'http_request_bytes_total': 'Bytes sent (URL and body)',
+    'http_response_bytes_total': 'Bytes received (response bodies)',
+    'api_quota_units_total': 'API quota units spent',
+    'file_write_bytes_total': 'Bytes written to artifacts and snapshots',
+    'file_write_avoided_bytes_total': 'Bytes not written because the content was unchanged',
+    'run_duration_seconds': 'Wall time from the first recorded event to the export'
+}
+
+_current = contextvars.ContextVar('span', default=None)
+
+
+class Registry:
+    """Spans, counters and histograms of one run"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = datetime.now()
+        self.origin = time.perf_counter()
+        self.next_id = 1
+        self.spans = []
+        self.dropped_spans = 0
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.lanes = {}
+
+    def lane(self):
+        """Trace row: one per asyncio task (concurrent spans must not share a row), else per thread"""
+        key = threading.get_ident()
+        asyncio = sys.modules.get('asyncio')
+        if asyncio is not None:
+            try:
+                task = asyncio.current_task()
+            except RuntimeError:
+                task = None
+            if task is not None:
+                key = id(task)
+        with self.lock:
+            return self.lanes.setdefault(key, len(self.lanes) + 1)
+
+    def span_id(self):
+        with self.lock:
+            self.next_id += 1
+            return self.next_id - 1
+
+    def add_span(self, record):
+        with self.lock:
+            if len(self.spans) < MAX_SPANS:
+                self.spans.append(record)
+            else:
+                self.dropped_spans += 1
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, name, value, **labels):
+        with self.lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': [0] * len(LATENCY_BUCKETS), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+
+REGISTRY = Registry()
+
+
+def reset():
+    """Start a new run (long-running processes export and reset per cycle)"""
+    global REGISTRY
+    REGISTRY = Registry()
+
+
+def count(name, value=1, **labels):
+    REGISTRY.count(name, value, **labels)
+
+
+def gauge(name, value, **labels):
+    REGISTRY.gauge(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    REGISTRY.observe(name, value, **labels)
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time a stage; yields the span record so callers can add attributes"""
+    registry = REGISTRY
+    parent = _current.get()
+    record = {
+        'id': registry.span_id(),
+        'parent': parent['id'] if parent else None,
+        'name': name,
+        'lane': registry.lane(),
+        'start': time.perf_counter(),
+        'attrs': attrs
+    }
+    token = _current.set(record)
+    try:
+        yield record
+    except BaseException as e:
+        record['attrs']['error'] = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        record['duration'] = time.perf_counter() - record['start']
+        registry.add_span(record)
+        registry.observe('span_duration_seconds', record['duration'], span=name)
+
+
+def traced(name=None):
+    """Decorator: run every call of a function (sync or async) in a span"""
+    def decorate(func):
+        label = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(label):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        f'{key}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _number(value):
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+def _family(name, kind):
+    return name[:-len('_total')] if kind == 'counter' and name.endswith('_total') else name
+
+
+def openmetrics(registry=None):
+    """The run's metrics in OpenMetrics text format"""
+    registry = registry or REGISTRY
+    lines = []
+
+    def header(name, kind):
+        family = _family(name, kind)
+        lines.append(f"# TYPE {family} {kind}")
+        if name in HELP:
+            lines.append(f"# HELP {family} {HELP[name]}")
+
+    for kind, series in (('counter', registry.counters), ('gauge', registry.gauges)):
+        for name in sorted({name for name, _ in series}):
+            header(name, kind)
+            for (metric, labels), value in sorted(series.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+    for name in sorted({name for name, _ in registry.histograms}):
+        header(name, 'histogram')
+        for (metric, labels), histogram in sorted(registry.histograms.items()):
+            if metric != name:
+                continue
+            for bound, value in zip(LATENCY_BUCKETS, histogram['buckets']):
+                lines.append(f"{name}_bucket{_labels(labels + (('le', f'{bound:g}'),))} {value}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+            lines.append(f"{name}_sum{_labels(labels)} {histogram['sum']:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram['count']}")
+
+    lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+
+def trace(job, registry=None):
+    """The run's spans as a Chrome trace event document"""
+    registry = registry or REGISTRY
+    pid = os.getpid()
+    events = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': job}}]
+    for record in sorted(registry.spans, key=lambda record: record['start']):
+        events.append({
+            'name': record['name'],
+            'ph': 'X',
+            'ts': round((record['start'] - registry.origin) * 1e6, 1),
+            'dur': round(record['duration'] * 1e6, 1),
+            'pid': pid,
+            'tid': record['lane'],
+            'args': {'id': record['id'], 'parent': record['parent'], **record['attrs']}
+        })
+    return {
+        'traceEvents': events,
+        'displayTimeUnit': 'ms',
+        'metadata': {
+            'job': job,
+            'started_at': registry.started_at.isoformat(),
+            'dropped_spans': registry.dropped_spans
+        }
+    }
+
+
+def export(job, directory=None):
+    """Write this run's OpenMetrics file and JSON trace; returns their paths (None when disabled)"""
+    if not ENABLED:
+        return None
+    registry = REGISTRY
+    registry.gauge('run_duration_seconds', time.perf_counter() - registry.origin, job=job)
+
+    directory = directory or METRICS_DIR
+    os.makedirs(directory, exist_ok=True)
+    key = registry.started_at.strftime('%Y%m%d_%H%M%S')
+    prom_path = os.path.join(directory, f"{job}_{key}.prom")
+    trace_path = os.path.join(directory, f"{job}_{key}.trace.json")
+
+    with open(prom_path, 'w', encoding='utf-8') as f:
+        f.write(openmetrics(registry))
+    with open(trace_path, 'w', encoding='utf-8') as f:
+        json.dump(trace(job, registry), f, default=str, separators=(',', ':'))
+
+    print(f"📈 Metrics: {prom_path} ({len(registry.spans):,} spans in {trace_path})")
+    return prom_path, trace_path
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def trace_files(directory=None):
+    """{job: trace paths in time order}"""
+    jobs = {}
+    for path in sorted(glob.glob(os.path.join(directory or METRICS_DIR, '*_*_*.trace.json'))):
+        job, day, clock = os.path.basename(path)[:-len('.trace.json')].rsplit('_', 2)
+        jobs.setdefault(job, []).append((day, clock, path))
+    return {job: [path for *_, path in sorted(entries)] for job, entries in jobs.items()}
+
+
+def summarize(job, runs=10, directory=None):
+    """Per-stage time of a job's latest run against the median of the runs before it"""
+    paths = trace_files(directory).get(job, [])[-runs:]
+    if not paths:
+        print(f"No traces for {job}")
+        return
+
+    per_run = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            events = [event for event in json.load(f)['traceEvents'] if event['ph'] == 'X']
+        stages = {}
+        for event in events:
+            stages.setdefault(event['name'], []).append(event['dur'] / 1e6)
+        per_run.append(stages)
+
+    latest, previous = per_run[-1], per_run[:-1]
+    print(f"📈 {os.path.basename(paths[-1])} vs median of {len(previous)} earlier runs")
+    print(f"{'stage':<48} {'calls':>6} {'total s':>9} {'p95 s':>8} {'before s':>9} {'change':>8}")
+    for name, durations in sorted(latest.items(), key=lambda item: -sum(item[1]))[:25]:
+        total = sum(durations)
+        history = [sum(stages[name]) for stages in previous if name in stages]
+        before = percentile(history, 0.5) if history else None
+        change = f"{(total / before - 1) * 100:+.0f}%" if before else 'new'
+        before_text = f"{before:.3f}" if before is not None else '-'
+        print(f"{name[:48]:<48} {len(durations):>6} {total:>9.3f} {percentile(durations, 0.95):>8.3f} "
+              f"{before_text:>9} {change:>8}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args and args[0] == 'summary':
+        runs = 10
+        if '--runs' in args:
+            i = args.index('--runs')
+            runs = int(args[i + 1])
+            del args[i:i + 2]
+        for job in ([args[1]] if len(args) > 1 else sorted(trace_files())):
+            summarize(job, runs)
+            print()
+    else:
+        print("Usage: python scripts/instrumentation.py summary [job] [--runs 10]")
+        sys.exit(1)
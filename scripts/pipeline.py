@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Single-pass pipeline runner for the dashboard, alerts and reports
+The stages form a DAG with explicit inputs (files, directories, upstream
+stages) and outputs. Every source is parsed at most once per run into a shared
+in-memory model, independent stages run concurrently on a thread pool, and a
+stage whose inputs hash the same as on its last successful run is skipped
+
+Stages: dashboard -> alerts
+        youtube_report (youtube_report.md), readme (README.md)
+Layout: data/pipeline_cache.json   (input hash of every stage's last successful run)
+Usage:  python scripts/pipeline.py [stage ...] [--force] [--sequential] [--full-rebuild]
+        python scripts/pipeline.py --plan     # what would run, without running it
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+import contextvars
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from history_store import HISTORY_DIR, LEGACY_CSV
+from rollups import ROLLUP_DIR
+from write_layer import write_json, report as report_writes
+from instrumentation import span, export
+
+CACHE_PATH = 'data/pipeline_cache.json'
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Renderers are mostly file I/O and pandas; a few threads are plenty
+MAX_WORKERS = int(os.environ.get('PIPELINE_WORKERS', 4))
+
+
+def load_json(path):
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return None
+
+
+def file_digest(path, digest):
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+
+
+def path_signature(path):
+    """sha256 of a file, or of every file under a directory (names and contents; mtimes are ignored
+    because a fresh checkout resets them)"""
+    digest = hashlib.sha256()
+    if os.path.isfile(path):
+        file_digest(path, digest)
+    elif os.path.isdir(path):
+        for directory, subdirs, files in os.walk(path):
+            subdirs.sort()
+            for name in sorted(files):
+                if name.endswith('.tmp'):
+                    continue
+                file_path = os.path.join(directory, name)
+                digest.update(os.path.relpath(file_path, path).encode('utf-8') + b'\0')
+                file_digest(file_path, digest)
+    else:
+        return 'missing'
+    return digest.hexdigest()
+
+
+class Model:
+    """Sources and stage results of one run, each computed at most once (safe across threads)"""
+
+    def __init__(self, loaders):
+        self.loaders = loaders
+        self.values = {}
+        self.locks = {name: threading.Lock() for name in loaders}
+
+    def get(self, name):
+        with self.locks[name]:
+            if name not in self.values:
+                with span(f"load {name}"):
+                    self.values[name] = self.loaders[name]()
+            return self.values[name]
+
+    def put(self, name, value):
+        with self.locks[name]:
+            self.values[name] = value
+
+
+def model_loaders():
+    """How to obtain each shared value when no stage of this run produced it"""
+    from generate_report import load_closing
+    from generate_combined_report import load_growth
+
+    return {
+        'youtube': lambda: load_json('data/latest.json'),
+        'telegram': lambda: load_json('data/telegram_latest.json'),
+        'closing': load_closing,
+        'growth_24h': load_growth,
+        # Written by the dashboard stage; read back only when that stage was skipped
+        'dashboard': lambda: load_json('data/dashboard.json')
+    }
+
+
+class Stage:
+    """One node of the DAG: run(model, options) reads its inputs from the model"""
+
+    def __init__(self, name, run, inputs=(), code=(), after=(), outputs=(), cache=True, hourly=False):
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)      # files and directories the result depends on
+        self.code = list(code)          # scripts whose changes invalidate the cached result
+        self.after = list(after)        # upstream stages
+        self.outputs = list(outputs)    # files that must exist for a cached result to count
+        self.cache = cache              # False: run every time (e.g. time-dependent cooldowns)
+        self.hourly = hourly            # True: the result depends on the current hour, which joins the input hash
+
+
+def run_dashboard(model, options):
+    from analytics_dashboard import AnalyticsDashboard
+
+    dashboard = AnalyticsDashboard(incremental=not options.full_rebuild,
+                                   youtube_data=model.get('youtube'), telegram_data=model.get('telegram'))
+    data = dashboard.generate_dashboard()
+    dashboard.save_dashboard(data)
+    dashboard.save_state()
+    model.put('dashboard', data)
+
+
+def run_alerts(model, options):
+    import analytics_alerts
+
+    analytics_alerts.main(dashboard=model.get('dashboard'))
+
+
+def run_youtube_report(model, options):
+    from generate_report import generate_report
+
+    if model.get('youtube') is None:
+        print("⏭️  No YouTube data yet")
+        return
+    generate_report(data=model.get('youtube'), closing=model.get('closing'))
+
+
+def run_readme(model, options):
+    from generate_combined_report import generate_report
+
+    generate_report(youtube_data=model.get('youtube'), telegram_data=model.get('telegram'),
+                    growth_24h=model.get('growth_24h'))
+
+
+STAGES = [
+    Stage('dashboard', run_dashboard,
+          # load_history falls back to the legacy CSVs while a source has no partitions yet
+          inputs=['data/latest.json', 'data/telegram_latest.json',
+                  os.path.join(HISTORY_DIR, 'youtube'), os.path.join(HISTORY_DIR, 'telegram'),
+                  LEGACY_CSV['youtube'], LEGACY_CSV['telegram']],
+          code=['analytics_dashboard.py', 'analytics_engine.py', 'dashboard_state.py', 'hourly_grid.py',
+                'seasonal_baseline.py', 'engine_state.py', 'alert_engine.py'],
+          # The 24h window, the stale rule and the projections move with the clock
+          outputs=['data/dashboard.json', 'data/summary.json', 'dashboard.md'], hourly=True),
+    Stage('alerts', run_alerts, code=['analytics_alerts.py', 'alert_engine.py'], after=['dashboard'], cache=False),
+    Stage('youtube_report', run_youtube_report,
+          inputs=['data/latest.json', os.path.join(ROLLUP_DIR, 'youtube')],
+          code=['generate_report.py'], outputs=['youtube_report.md']),
+    Stage('readme', run_readme,
+          inputs=['data/latest.json', 'data/telegram_latest.json', os.path.join(ROLLUP_DIR, 'youtube')],
+          code=['generate_combined_report.py'], outputs=['README.md'])
+]
+
+
+class Pipeline:
+    """Runs the selected stages and their upstream stages, skipping those whose inputs did not change"""
+
+    def __init__(self, stages=STAGES, cache_path=CACHE_PATH):
+        self.stages = {stage.name: stage for stage in stages}
+        self.cache_path = cache_path
+        self.cache = load_json(cache_path) or {}
+        self.signatures = {}
+        self.hashes = {}
+
+    def select(self, names=None):
+        """The named stages plus everything upstream of them, in DAG order"""
+        selected = []
+
+        def visit(name):
+            if name not in self.stages:
+                raise KeyError(f"unknown stage {name} (stages: {', '.join(self.stages)})")
+            if name in selected:
+                return
+            for upstream in self.stages[name].after:
+                visit(upstream)
+            selected.append(name)
+
+        for name in names or self.stages:
+            visit(name)
+        return selected
+
+    def signature(self, path):
+        # Shared inputs are hashed once per run
+        if path not in self.signatures:
+            self.signatures[path] = path_signature(path)
+        return self.signatures[path]
+
+    def input_hash(self, name):
+        """Hash of a stage's inputs, code, upstream input hashes and (hourly stages) the current hour"""
+        if name not in self.hashes:
+            stage = self.stages[name]
+            digest = hashlib.sha256()
+            for path in stage.inputs:
+                digest.update(f"{path}={self.signature(path)}\n".encode('utf-8'))
+            for script in stage.code:
+                digest.update(f"{script}={self.signature(os.path.join(SCRIPTS_DIR, script))}\n".encode('utf-8'))
+            for upstream in stage.after:
+                digest.update(f"{upstream}={self.input_hash(upstream)}\n".encode('utf-8'))
+            if stage.hourly:
+                digest.update(f"hour={datetime.now():%Y-%m-%d %H}\n".encode('utf-8'))
+            self.hashes[name] = digest.hexdigest()
+        return self.hashes[name]
+
+    def plan(self, names=None, force=False):
+        """[(stage, reason)] for every selected stage; reason None means up to date"""
+        with span('plan'):
+            plan = []
+            for name in self.select(names):
+                stage = self.stages[name]
+                if force:
+                    reason = 'forced'
+                elif not stage.cache:
+                    reason = 'always runs'
+                elif self.cache.get(name, {}).get('inputs') != self.input_hash(name):
+                    reason = 'inputs changed' if name in self.cache else 'first run'
+                elif not all(os.path.exists(path) for path in stage.outputs):
+                    reason = 'output missing'
+                else:
+                    reason = None
+                plan.append((name, reason))
+            return plan
+
+    def run(self, names=None, force=False, options=None, workers=MAX_WORKERS):
+        """Run the plan; independent stages overlap. Returns {stage: 'ran' | 'skipped' | 'failed' | 'blocked'}"""
+        options = options or argparse.Namespace(full_rebuild=False)
+        plan = self.plan(names, force)
+        model = Model(model_loaders())
+        status = {name: 'skipped' for name, reason in plan if reason is None}
+        pending = {name: reason for name, reason in plan if reason is not None}
+        for name in status:
+            print(f"⏭️  {name}: inputs unchanged")
+
+        def execute(name, reason):
+            started = time.perf_counter()
+            with span(f"stage {name}", reason=reason):
+                self.stages[name].run(model, options)
+            return time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            running = {}
+            while pending or running:
+                for name in list(pending):
+                    # None while an upstream stage is still pending or running
+                    upstream = [status.get(dep) for dep in self.stages[name].after]
+                    if any(state in ('failed', 'blocked') for state in upstream):
+                        print(f"⛔ {name}: upstream stage failed")
+                        status[name] = 'blocked'
+                        del pending[name]
+                    elif all(state in ('ran', 'skipped') for state in upstream):
+                        print(f"▶️  {name} ({pending[name]})")
+                        # Each stage inherits the current span so the trace nests under the run
+                        future = executor.submit(contextvars.copy_context().run, execute, name, pending.pop(name))
+                        running[future] = name
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        elapsed = future.result()
+                    except Exception as e:
+                        status[name] = 'failed'
+                        print(f"❌ {name} failed: {type(e).__name__}: {e}")
+                        continue
+                    status[name] = 'ran'
+                    print(f"✅ {name} finished in {elapsed:.2f}s")
+                    if self.stages[name].cache:
+                        self.cache[name] = {'inputs': self.input_hash(name),
+                                            'finished_at': datetime.now().isoformat()}
+
+        write_json(self.cache_path, self.cache)
+        return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the dashboard, alerts and report stages in one pass')
+    parser.add_argument('stages', nargs='*', help=f"stages to run with their upstream stages (default: all of "
+                                                  f"{', '.join(stage.name for stage in STAGES)})")
+    parser.add_argument('--force', action='store_true', help='ignore the input-hash cache')
+    parser.add_argument('--sequential', action='store_true', help='run one stage at a time')
+    parser.add_argument('--full-rebuild', action='store_true', help='recompute the dashboard state from the whole history')
+    parser.add_argument('--plan', action='store_true', help='print what would run and exit')
+    args = parser.parse_args()
+
+    pipeline = Pipeline()
+    if args.plan:
+        for name, reason in pipeline.plan(args.stages, args.force):
+            print(f"{'▶️ ' if reason else '⏭️ '} {name}: {reason or 'up to date'}")
+        return 0
+
+    print(f"🚀 Pipeline run at {datetime.now()}")
+    with span('pipeline'):
+        status = pipeline.run(args.stages, args.force, options=args, workers=1 if args.sequential else MAX_WORKERS)
+    report_writes()
+    export('pipeline')
+
+    counts = {state: sum(1 for value in status.values() if value == state) for state in set(status.values())}
+    print(f"📋 {', '.join(f'{count} {state}' for state, count in sorted(counts.items()))}")
+    return 1 if counts.get('failed') or counts.get('blocked') else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
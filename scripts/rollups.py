@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Pre-aggregated rollups and retention for the channel history
+Maintains min/max/first/last/delta per channel per hour, day and week at ingest,
+so window queries read a few rollup rows instead of scanning raw history, and
+drops raw points older than the retention window (checked at ingest, applied
+once a day)
+
+Layout: data/history/rollups/<source>/hour/<YYYY-MM-DD>.parquet
+        data/history/rollups/<source>/{day,week}/<YYYY-MM>.parquet
+Usage:  python scripts/rollups.py rebuild             # build rollups from the full raw history
+        python scripts/rollups.py prune               # apply the retention policy now
+        python scripts/rollups.py delta [days]        # subscriber delta per channel over N days (default 30)
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+import pandas as pd
+
+from history_store import HistoryStore, ROLLUP_DIR, partition_key, key_granularity, load_history, raw_earliest
+
+PERIODS = ['hour', 'day', 'week']
+
+# Partition size per level: hourly commits rewrite one day of hour rollups, not a month
+PARTITION_BY = {'hour': 'day', 'day': 'month', 'week': 'month'}
+
+# Series key and rolled-up metrics per source
+SERIES = {
+    'youtube': ('channel_id', ['subscribers', 'views']),
+    'telegram': ('username', ['subscribers'])
+}
+
+# Days of data kept per level (None: forever). Older raw ranges are served from rollups.
+RETENTION_DAYS = {
+    'raw': int(os.environ['RAW_RETENTION_DAYS']) if os.environ.get('RAW_RETENTION_DAYS') else 180,
+    'hour': 400,
+    'day': None,
+    'week': None
+}
+
+# Ingest prunes once the oldest kept row is this far past its retention window
+PRUNE_SLACK = timedelta(days=1)
+
+
+def bucket_start(timestamps, period):
+    """Start of the hour/day/week (Monday) bucket of each timestamp"""
+    if period == 'hour':
+        return timestamps.dt.floor('h')
+    if period == 'day':
+        return timestamps.dt.floor('D')
+    return (timestamps - pd.to_timedelta(timestamps.dt.dayofweek, unit='D')).dt.floor('D')
+
+
+def aggregate(rows, source, period):
+    """Rollup rows for raw history rows: one per series per bucket"""
+    key, metrics = SERIES[source]
+    metrics = [metric for metric in metrics if metric in rows.columns]
+
+    df = rows[[key, 'timestamp'] + metrics].dropna(subset=metrics, how='all')
+    df = df.assign(bucket=bucket_start(pd.to_datetime(df['timestamp']), period))
+    df = df.sort_values([key, 'timestamp'], kind='stable')
+
+    grouped = df.groupby([key, 'bucket'], sort=True)
+    result = grouped['timestamp'].agg(count='size', first_at='min', last_at='max')
+    for metric in metrics:
+        stats = grouped[metric].agg(['min', 'max', 'first', 'last'])
+        stats.columns = [f'{metric}_{stat}' for stat in stats.columns]
+        result = result.join(stats)
+
+    return result.reset_index().rename(columns={'bucket': 'timestamp'})
+
+
+def merge(existing, new):
+    """Replace the rows of the buckets in `new`, which were recomputed from every raw row they hold
+
+    A bucket whose stored row starts earlier than its recomputed one keeps the
+    stored row: retention already dropped the bucket's first raw rows.
+    """
+    df = pd.concat([new, existing], ignore_index=True)
+    key = df.columns[0]
+    earliest = df.groupby([key, 'timestamp'], sort=False)['first_at'].transform('min')
+    df = df[df['first_at'] == earliest]
+    return df.drop_duplicates([key, 'timestamp'], keep='first').reset_index(drop=True)
+
+
+def with_deltas(df, previous_last=None):
+    """Add <metric>_delta: change of the closing value since the previous bucket
+
+    previous_last maps series -> closing values of the last bucket before df
+    (from the previous partition); a series' very first bucket uses last - first.
+    """
+    key = df.columns[0]
+    metrics = [column[:-len('_last')] for column in df.columns if column.endswith('_last')]
+    df = df.sort_values([key, 'timestamp'], kind='stable').reset_index(drop=True)
+
+    for metric in metrics:
+        previous = df.groupby(key, sort=False)[f'{metric}_last'].shift()
+        if previous_last is not None and f'{metric}_last' in previous_last.columns:
+            carried = df[key].map(previous_last[f'{metric}_last'])
+            previous = previous.fillna(carried)
+        df[f'{metric}_delta'] = (df[f'{metric}_last'] - previous).fillna(df[f'{metric}_last'] - df[f'{metric}_first'])
+
+    return df
+
+
+class RollupStore:
+    """Rollup table of one source at one period, partitioned by PARTITION_BY"""
+
+    def __init__(self, source, period, root=ROLLUP_DIR):
+        self.source = source
+        self.period = period
+        self.store = HistoryStore(period, root=os.path.join(root, source), granularity=PARTITION_BY[period])
+
+    def exists(self):
+        return self.store.exists()
+
+    def closing_values(self, partition):
+        """Closing values per series in a partition (None if it doesn't exist)"""
+        path = os.path.join(self.store.path, f"{partition}.parquet")
+        if not os.path.exists(path):
+            return None
+        df = pd.read_parquet(path)
+        key = df.columns[0]
+        return df.sort_values('timestamp', kind='stable').groupby(key).last()
+
+    def write(self, partition, df):
+        """Replace a partition unless it already holds these rows; returns whether it was written"""
+        path = os.path.join(self.store.path, f"{partition}.parquet")
+        if os.path.exists(path) and pd.read_parquet(path).equals(df):
+            return False
+        self.store.write_partition(partition, df)
+        return True
+
+    def split_partitions(self):
+        """Rewrite partitions named at another granularity (tables written before PARTITION_BY)"""
+        for key, path in self.store.partitions():
+            if key_granularity(key) == self.store.granularity:
+                continue
+            df = pd.read_parquet(path)
+            for part_key, part in df.groupby(df['timestamp'].map(self.store.partition_key), sort=True):
+                self.store.write_partition(part_key, part.reset_index(drop=True))
+            os.remove(path)
+
+    def update(self, rows, raw=None):
+        """Recompute the buckets new raw rows fall in and refresh the affected deltas
+
+        Buckets are aggregated again from all their rows in the raw store (`raw`:
+        raw rows from the first touched bucket on, read here when not given), so
+        ingesting the same rows twice leaves the rollups unchanged.
+        """
+        touched = bucket_start(pd.to_datetime(rows['timestamp']), self.period)
+        if raw is None:
+            raw = HistoryStore(self.source).load(start=touched.min())
+        if raw.empty:
+            return 0
+        raw = raw[bucket_start(pd.to_datetime(raw['timestamp']), self.period).isin(touched.unique())]
+        new = aggregate(raw, self.source, self.period)
+        if new.empty:
+            return 0
+
+        self.split_partitions()
+        partitions = [name for name, _ in self.store.partitions()]
+        changed = set()
+
+        for key, part in new.groupby(new['timestamp'].map(self.store.partition_key), sort=True):
+            path = os.path.join(self.store.path, f"{key}.parquet")
+            if os.path.exists(path):
+                part = merge(pd.read_parquet(path), part)
+            earlier = [name for name in partitions if name < key]
+            previous = self.closing_values(earlier[-1]) if earlier else None
+            if self.write(key, with_deltas(part, previous)):
+                changed.add(key)
+            # Later buckets of this update carry on from the partition just written
+            partitions = sorted(set(partitions) | {key})
+
+        # A later partition's first deltas depend on the closing values just rewritten
+        partitions = [name for name, _ in self.store.partitions()]
+        for key in sorted(changed):
+            later = [name for name in partitions if name > key]
+            if later and later[0] not in changed:
+                path = os.path.join(self.store.path, f"{later[0]}.parquet")
+                self.write(later[0], with_deltas(pd.read_parquet(path), self.closing_values(key)))
+
+        return len(new)
+
+    def rebuild(self, history):
+        """Replace the rollups with ones computed from a full raw history"""
+        for _, path in self.store.partitions():
+            os.remove(path)
+        if history.empty:
+            return 0
+
+        df = with_deltas(aggregate(history, self.source, self.period))
+        for key, part in df.groupby(df['timestamp'].map(self.store.partition_key), sort=True):
+            self.store.write_partition(key, part)
+        return len(df)
+
+    def load(self, start=None, end=None, columns=None):
+        return self.store.load(start=start, end=end, columns=columns)
+
+    def earliest(self):
+        """First bucket start in the table (None if empty)"""
+        partitions = self.store.partitions()
+        if not partitions:
+            return None
+        return pd.read_parquet(partitions[0][1], columns=['timestamp'])['timestamp'].min()
+
+
+def update_rollups(source, rows):
+    """Ingest hook: fold rows just appended to the raw store into every rollup level, then prune when due"""
+    rows = pd.DataFrame(rows)
+    if rows.empty:
+        return
+    rows['timestamp'] = pd.to_datetime(rows['timestamp'])
+    # The raw rows of every touched bucket, read once for all levels (weeks reach back furthest)
+    raw = HistoryStore(source).load(start=bucket_start(rows['timestamp'], 'week').min())
+
+    for period in PERIODS:
+        rollup = RollupStore(source, period)
+        if rollup.exists():
+            rollup.update(rows, raw)
+        else:
+            # First run: the raw store already holds these rows
+            rollup.rebuild(load_history(source))
+
+    # Retention runs against the newest ingested row, so a replay of old rows prunes nothing new
+    now = rows['timestamp'].max()
+    if prune_due(source, now):
+        prune(source, now)
+
+
+def rebuild_rollups(source):
+    history = load_history(source)
+    for period in PERIODS:
+        count = RollupStore(source, period).rebuild(history)
+        print(f"✅ {source}/{period}: {count:,} rollup rows from {len(history):,} raw rows")
+
+
+def prune_level(store, days, now):
+    """Drop rows older than the retention window from a partitioned store"""
+    cutoff = pd.Timestamp(now - timedelta(days=days))
+    removed = 0
+    for key, path in store.partitions():
+        if key > partition_key(cutoff, key_granularity(key)):
+            break
+        df = pd.read_parquet(path)
+        keep = df[df['timestamp'] >= cutoff]
+        removed += len(df) - len(keep)
+        if keep.empty:
+            os.remove(path)
+        elif len(keep) < len(df):
+            store.write_partition(key, keep)
+    return removed
+
+
+def prune_due(source, now):
+    """Whether a level holds rows more than PRUNE_SLACK past its retention window (reads one column per level)"""
+    levels = [('raw', raw_earliest(source))]
+    levels += [(period, RollupStore(source, period).earliest()) for period in PERIODS]
+    return any(
+        earliest is not None and RETENTION_DAYS[level] is not None
+        and earliest < pd.Timestamp(now - timedelta(days=RETENTION_DAYS[level]) - PRUNE_SLACK)
+        for level, earliest in levels
+    )
+
+
+def prune(source, now=None):
+    """Apply RETENTION_DAYS; raw rows are only dropped once day/week rollups cover them"""
+    now = now or datetime.now()
+
+    raw_from = raw_earliest(source)
+    for period in ['day', 'week']:
+        rollup_from = RollupStore(source, period).earliest()
+        if raw_from is not None and (rollup_from is None or rollup_from > raw_from):
+            print(f"⚠️  {source}: {period} rollups don't cover the raw history yet, run 'rebuild' first")
+            return
+
+    if RETENTION_DAYS['raw'] is not None:
+        removed = prune_level(HistoryStore(source), RETENTION_DAYS['raw'], now)
+        print(f"✅ {source}/raw: dropped {removed:,} rows older than {RETENTION_DAYS['raw']} days")
+
+    for period in PERIODS:
+        if RETENTION_DAYS[period] is not None:
+            removed = prune_level(RollupStore(source, period).store, RETENTION_DAYS[period], now)
+            print(f"✅ {source}/{period}: dropped {removed:,} rows older than {RETENTION_DAYS[period]} days")
+
+
+def rollup_rows(source, period, start, end=None, columns=None):
+    """Rollup rows in [start, end], computed from raw history if the table isn't built yet"""
+    rollup = RollupStore(source, period)
+    if rollup.exists():
+        return rollup.load(start=start, end=end, columns=columns)
+
+    # One extra week of raw rows so the first bucket's delta has a predecessor
+    raw = load_history(source, start=pd.Timestamp(start) - pd.Timedelta(days=8), end=end)
+    if raw.empty:
+        return pd.DataFrame()
+    df = with_deltas(aggregate(raw, source, period))
+    df = df[df['timestamp'] >= pd.Timestamp(start)]
+    if columns is not None:
+        df = df[['timestamp'] + [column for column in columns if column != 'timestamp']]
+    return df.reset_index(drop=True)
+
+
+def window_delta(source, metric='subscribers', days=30, now=None, period='day'):
+    """Change of a metric per series over the last N days from the rollups
+
+    Sums the deltas of the buckets after the one containing now - days, i.e. the
+    latest closing value minus the closing value of the window's first bucket.
+    """
+    now = pd.Timestamp(now or datetime.now())
+    start_bucket = bucket_start(pd.Series([now - pd.Timedelta(days=days)]), period).iloc[0]
+    key, _ = SERIES[source]
+
+    df = rollup_rows(source, period, start_bucket, columns=[key, f'{metric}_delta'])
+    if df.empty:
+        return pd.Series(dtype=float, name=f'{metric}_delta')
+    df = df[(df['timestamp'] > start_bucket) & (df['timestamp'] <= now)]
+    return df.groupby(key)[f'{metric}_delta'].sum()
+
+
+def values_at(source, at, period='day'):
+    """Closing values per series of the last bucket observed at or before `at`"""
+    key, _ = SERIES[source]
+    at = pd.Timestamp(at)
+    # Daily buckets: the last one before `at` is within a month of it (or the series stopped)
+    df = rollup_rows(source, period, at - pd.Timedelta(days=40), end=at)
+    if df.empty:
+        return pd.DataFrame()
+    df = df[df['last_at'] <= at]
+    return df.sort_values('timestamp', kind='stable').groupby(key).last()
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'rebuild'
+
+    if command == 'rebuild':
+        for source in SERIES:
+            rebuild_rollups(source)
+    elif command == 'prune':
+        for source in SERIES:
+            prune(source)
+    elif command == 'delta':
+        days = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+        for source in SERIES:
+            for series, delta in window_delta(source, days=days).items():
+                print(f"{source:<9} {series:<28} {delta:+,.0f} subscribers in {days} days")
+    else:
+        print(f"Unknown command: {command}")
+        print("Usage: python scripts/rollups.py rebuild | prune | delta [days]")
+        sys.exit(1)
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Seasonal anomaly baselines for the hourly grids
+For every series and metric of a grid, keeps the hourly changes of the last
+BASELINE_WEEKS weeks per hour-of-week slot (a small ring per slot) together
+with their median and MAD. New hours are scored as robust z-scores against
+their slot in one array pass over every series and metric, then folded in;
+only the slots they touch get their median and MAD recomputed
+
+Layout: data/grid/<source>_seasonal.npz
+Usage:  python scripts/seasonal_baseline.py build    # rebuild the baselines from the grids
+        python scripts/seasonal_baseline.py scan     # anomalies of the latest hour
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+from hourly_grid import GRID_DIR, GRID_SERIES, load_grid
+from analytics_engine import last_true, series_key
+from instrumentation import traced
+
+SEASON_HOURS = 7 * 24
+# Weeks of history per hour-of-week slot
+BASELINE_WEEKS = 8
+# Slots with fewer samples don't score (the dashboard falls back to the rolling-mean rule)
+MIN_WEEKS = 3
+
+# MAD -> standard deviation of a normal distribution
+MAD_SCALE = 1.4826
+# |robust z| that counts as an anomaly
+Z_THRESHOLD = 6.0
+# Counts move in whole units: a slot that never changes must not turn +1 into an anomaly
+MIN_SCALE = 1.0
+
+SCORE_COLUMNS = ['metric', 'hour', 'current', 'expected', 'z', 'change_pct', 'anomaly_type']
+
+# Hour 0 of datetime64 (1970-01-01) is a Thursday: slot 0 is Monday 00:00
+EPOCH_OFFSET = 3 * 24
+
+
+def hour_slots(hours):
+    """Hour-of-week slot and week number of datetime64[h] hours"""
+    shifted = hours.astype('datetime64[h]').astype(np.int64) + EPOCH_OFFSET
+    return shifted % SEASON_HOURS, shifted // SEASON_HOURS
+
+
+def nan_median(a, count):
+    """Median along the last axis ignoring NaN, given the non-NaN count (0 where there is none)
+
+    A sort of the short rings beats np.nanmedian, which is slow on many small slices.
+    """
+    ordered = np.sort(a, axis=-1)  # NaN sorts last
+    low = np.take_along_axis(ordered, np.maximum((count - 1) // 2, 0)[..., None], axis=-1)[..., 0]
+    high = np.take_along_axis(ordered, (count // 2)[..., None], axis=-1)[..., 0]
+    return np.where(count > 0, (low + high) / 2, 0.0)
+
+
+def baseline_path(source, root=GRID_DIR):
+    return os.path.join(root, f"{source}_seasonal.npz")
+
+
+class SeasonalBaseline:
+    """Hour-of-week median and MAD of the hourly change of every series and metric of one grid"""
+
+    def __init__(self, metrics, keys=None, arrays=None, until=None):
+        self.metrics = list(metrics)
+        self.keys = list(keys) if keys is not None else []
+        shape = (len(self.metrics), len(self.keys), SEASON_HOURS)
+        arrays = arrays or {}
+        # metrics × series × slots × weeks; NaN = no change recorded
+        self.ring = arrays.get('ring', np.full(shape + (BASELINE_WEEKS,), np.nan))
+        self.median = arrays.get('median', np.zeros(shape))
+        self.mad = arrays.get('mad', np.zeros(shape))
+        self.samples = arrays.get('samples', np.zeros(shape, dtype=np.int16))
+        # Last hour folded in (datetime64[h]), None before the first update
+        self.until = np.datetime64(until, 'h') if until is not None else None
+
+    @classmethod
+    def for_source(cls, source):
+        return cls(GRID_SERIES[source][1])
+
+    def align(self, keys):
+        """Add rows for the series a grid gained since the last update (grids only append keys)"""
+        if list(keys[:len(self.keys)]) != self.keys:
+            # The grid was rebuilt with another row order: start over
+            self.__init__(self.metrics)
+        extra = len(keys) - len(self.keys)
+        if extra <= 0:
+            return
+
+        def grow(array, fill):
+            padding = np.full((array.shape[0], extra) + array.shape[2:], fill, dtype=array.dtype)
+            return np.concatenate([array, padding], axis=1)
+
+        self.ring = grow(self.ring, np.nan)
+        self.median = grow(self.median, 0.0)
+        self.mad = grow(self.mad, 0.0)
+        self.samples = grow(self.samples, 0)
+        self.keys = list(keys)
+
+    def changes(self, grid, start):
+        """Hourly change of every metric and series from grid column `start` on (metrics × series × hours)
+
+        NaN unless both the hour and the one before it were observed.
+        """
+        raw = np.stack([grid.matrix(metric)[:, max(start - 1, 0):] for metric in self.metrics])
+        delta = np.diff(raw, axis=2)
+        if start == 0:
+            delta = np.concatenate([np.full(raw.shape[:2] + (1,), np.nan), delta], axis=2)
+        return delta
+
+    def refresh(self, slots):
+        """Recompute median, MAD and sample count of some hour-of-week slots"""
+        window = self.ring[:, :, slots, :]
+        count = (~np.isnan(window)).sum(axis=-1)
+        median = nan_median(window, count)
+        self.median[:, :, slots] = median
+        self.mad[:, :, slots] = nan_median(np.abs(window - median[..., None]), count)
+        self.samples[:, :, slots] = count
+
+    def score(self, delta, slots):
+        """Robust z-score of changes against their slots (NaN where a slot has too few samples) and the slot medians"""
+        median = self.median[:, :, slots]
+        # Eight samples can give a slot a freakishly small MAD: the series' typical MAD over its
+        # scoring slots is the floor (slots without enough weeks yet would pull it to 0)
+        ready = self.samples >= MIN_WEEKS
+        typical = nan_median(np.where(ready, self.mad, np.nan), ready.sum(axis=2))[..., None]
+        scale = np.maximum(MAD_SCALE * np.maximum(self.mad[:, :, slots], typical), MIN_SCALE)
+        with np.errstate(invalid='ignore'):
+            z = (delta - median) / scale
+        return np.where(self.samples[:, :, slots] >= MIN_WEEKS, z, np.nan), median
+
+    def fold(self, delta, slots, weeks):
+        """Write changes (at most BASELINE_WEEKS weeks of hours) into the rings and refresh their slots"""
+        self.ring[:, :, slots, weeks % BASELINE_WEEKS] = delta
+        self.refresh(np.unique(slots))
+
+    @traced()
+    def update(self, grid, platform):
+        """Score the hours since the last update, then fold the complete ones in
+
+        The grid's last hour can still change (the last observation in an hour
+        wins), so it is scored on every run but only folded once the next hour
+        exists. Returns one row per series and metric that has a scored hour: the
+        latest one, indexed by engine key.
+        """
+        self.align(grid.keys)
+        if grid.n_hours < 2:
+            return pd.DataFrame(columns=SCORE_COLUMNS)
+        hours = grid.hours
+        last = grid.n_hours - 1
+        capacity = SEASON_HOURS * BASELINE_WEEKS
+
+        if self.until is None:
+            # First update: warm up on the weeks before the last hour without scoring them
+            start = max(last - capacity, 0)
+            slots, weeks = hour_slots(hours[start:last])
+            self.fold(self.changes(grid, start)[:, :, :last - start], slots, weeks)
+            self.until = hours[last - 1]
+
+        # After a long outage only the newest weeks still fit in the rings
+        start = max(int(np.searchsorted(hours, self.until, side='right')), last - capacity + 1)
+        start = min(start, last)
+        delta = self.changes(grid, start)
+        slots, weeks = hour_slots(hours[start:])
+        z, median = self.score(delta, slots)
+
+        if last > start:
+            self.fold(delta[:, :, :-1], slots[:-1], weeks[:-1])
+        self.until = max(self.until, hours[last - 1])
+
+        return self.latest(grid, platform, start, delta, z, median)
+
+    def latest(self, grid, platform, start, delta, z, median):
+        """The newest scored hour of every series and metric as rows"""
+        n_metrics, n_series, _ = z.shape
+        col = last_true(~np.isnan(z).reshape(n_metrics * n_series, -1)).reshape(n_metrics, n_series)
+        metric_index, series_index = np.nonzero(col >= 0)
+        if len(metric_index) == 0:
+            return pd.DataFrame(columns=SCORE_COLUMNS)
+
+        cols = col[metric_index, series_index]
+        change = delta[metric_index, series_index, cols]
+        scores = z[metric_index, series_index, cols]
+        current = np.stack([grid.matrix(metric)[:, start:] for metric in self.metrics])[metric_index, series_index, cols]
+        expected = current - change + median[metric_index, series_index, cols]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change_pct = np.where(expected > 0, (current - expected) / expected * 100, np.nan)
+
+        anomaly_type = np.full(len(scores), None, dtype=object)
+        anomaly_type[(scores <= -Z_THRESHOLD) & np.isfinite(change_pct)] = 'drop'
+        anomaly_type[(scores >= Z_THRESHOLD) & np.isfinite(change_pct)] = 'spike'
+        return pd.DataFrame({
+            'metric': [self.metrics[m] for m in metric_index],
+            'hour': grid.hours[start + cols],
+            'current': current,
+            'expected': expected,
+            'z': scores,
+            'change_pct': change_pct,
+            'anomaly_type': anomaly_type
+        }, index=pd.Index([series_key(platform, grid.keys[s]) for s in series_index], name='series'))
+
+    @traced()
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        # Hourly changes of counts fit float32 exactly; compressed, the mostly-NaN rings shrink a lot
+        np.savez_compressed(tmp_path, keys=np.array(self.keys, dtype=str), metrics=np.array(self.metrics, dtype=str),
+                            until=np.array([self.until if self.until is not None else np.datetime64('NaT')],
+                                           dtype='datetime64[h]'),
+                            ring=self.ring.astype(np.float32), median=self.median.astype(np.float32),
+                            mad=self.mad.astype(np.float32), samples=self.samples)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    @traced()
+    def load(cls, path, metrics):
+        """Read saved baselines, or None if there are none (or they were kept for other metrics)"""
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            if data['metrics'].tolist() != list(metrics) or data['ring'].shape[-1] != BASELINE_WEEKS:
+                return None
+            until = data['until'][0]
+            return cls(metrics, keys=data['keys'].tolist(),
+                       arrays={'ring': data['ring'].astype(float), 'median': data['median'].astype(float),
+                               'mad': data['mad'].astype(float), 'samples': data['samples']},
+                       until=None if np.isnat(until) else until)
+
+
+def load_baseline(source, root=GRID_DIR):
+    return SeasonalBaseline.load(baseline_path(source, root), GRID_SERIES[source][1])
+
+
+def apply_seasonal(metrics, seasonal):
+    """Engine metrics with the subscriber anomaly columns taken from the seasonal scores where they exist"""
+    if metrics.empty or seasonal.empty:
+        return metrics
+    subscribers = seasonal[seasonal['metric'].to_numpy() == 'subscribers']
+    rows = metrics.index.get_indexer(subscribers.index)
+    found = rows >= 0
+    if not found.any():
+        return metrics
+    metrics = metrics.copy()
+    for column in ['anomaly_type', 'change_pct', 'expected']:
+        values = metrics[column].to_numpy().copy()
+        values[rows[found]] = subscribers[column].to_numpy()[found]
+        metrics[column] = values
+    return metrics
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'scan'
+
+    if command not in ('build', 'scan'):
+        print(f"Unknown command: {command}")
+        print("Usage: python scripts/seasonal_baseline.py build | scan")
+        sys.exit(1)
+
+    for source in GRID_SERIES:
+        grid = load_grid(source)
+        if grid is None:
+            print(f"⏭️  {source}: no grid yet (run 'python scripts/hourly_grid.py build')")
+            continue
+        baseline = (load_baseline(source) if command == 'scan' else None) or SeasonalBaseline.for_source(source)
+        scores = baseline.update(grid, source)
+        baseline.save(baseline_path(source))
+        ready = int((baseline.samples >= MIN_WEEKS).sum())
+        print(f"📊 {source}: {len(baseline.keys)} series × {len(baseline.metrics)} metrics, "
+              f"{ready / max(baseline.samples.size, 1):.0%} of slots scoring, through {baseline.until}")
+        if scores.empty:
+            continue
+        for key, row in scores[scores['anomaly_type'].notna()].iterrows():
+            print(f"   ⚠️  {key} {row['metric']}: {row['anomaly_type']} at {row['hour']} "
+                  f"({row['current']:,.0f} vs {row['expected']:,.0f} expected, z {row['z']:+.1f})")
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped fixed-width series files for the channel history
+One raw little-endian file per column (int64 timestamps, int32 series codes,
+int64 metrics) plus a series dictionary, so analytics map the history as NumPy
+views without parsing or copying. The files are derived from the history store
+and not committed: the collectors append to them as they ingest, and readers
+sync them to catch up on a fresh checkout
+
+Layout: data/series/<source>/{meta.json, timestamp.i64, series.i32, <metric>.i64}
+Usage:  python scripts/series_store.py sync      # catch up with the history store
+        python scripts/series_store.py import    # rebuild from the history store / CSV
+        python scripts/series_store.py info
+"""
+
+import os
+import sys
+import json
+import numpy as np
+import pandas as pd
+
+from instrumentation import traced
+
+SERIES_DIR = 'data/series'
+
+# Series key and stored metrics per source
+SERIES_COLUMNS = {
+    'youtube': ('channel_id', ['subscribers', 'views', 'videos']),
+    'telegram': ('username', ['subscribers'])
+}
+
+# Stored in place of a metric the collector could not read (counts are never negative)
+MISSING = -1
+
+DTYPES = {'timestamp': '<i8', 'series': '<i4'}
+METRIC_DTYPE = '<i8'
+
+
+class SeriesStore:
+    """Append-only columnar files of one source, read through np.memmap"""
+
+    def __init__(self, source, root=SERIES_DIR):
+        self.source = source
+        self.key, self.metrics = SERIES_COLUMNS[source]
+        self.path = os.path.join(root, source)
+        self.meta_path = os.path.join(self.path, 'meta.json')
+        self.meta = self.read_meta()
+
+    def read_meta(self):
+        if not os.path.exists(self.meta_path):
+            return {'count': 0, 'keys': [], 'sorted': True, 'last': None}
+        with open(self.meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def exists(self):
+        return self.meta['count'] > 0
+
+    @property
+    def count(self):
+        return self.meta['count']
+
+    @property
+    def keys(self):
+        """Series dictionary: code -> channel_id / username"""
+        return self.meta['keys']
+
+    def column_path(self, column):
+        extension = 'i32' if column == 'series' else 'i64'
+        return os.path.join(self.path, f"{column}.{extension}")
+
+    def dtype(self, column):
+        return DTYPES.get(column, METRIC_DTYPE)
+
+    @traced()
+    def append(self, rows):
+        """Append rows (DataFrame or list of dicts): one write per column file, then the row count
+
+        The count in meta.json is written last, so a run interrupted halfway leaves
+        trailing bytes that readers ignore and the next append overwrites.
+        """
+        df = pd.DataFrame(rows)
+        if df.empty or self.key not in df.columns:
+            return 0
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+
+        timestamps = df['timestamp']
+        order = np.argsort(timestamps.to_numpy(), kind='stable')
+        df = df.iloc[order]
+        timestamps = timestamps.iloc[order]
+
+        index = {key: code for code, key in enumerate(self.keys)}
+        for key in pd.unique(df[self.key].astype(str)):
+            if key not in index:
+                index[key] = len(self.meta['keys'])
+                self.meta['keys'].append(key)
+
+        columns = {
+            'timestamp': timestamps.to_numpy().astype('datetime64[ns]').view('<i8'),
+            'series': df[self.key].astype(str).map(index).to_numpy(dtype='<i4')
+        }
+        for metric in self.metrics:
+            values = pd.to_numeric(df[metric], errors='coerce') if metric in df.columns else pd.Series(np.nan, index=df.index)
+            columns[metric] = values.fillna(MISSING).to_numpy(dtype=METRIC_DTYPE)
+
+        os.makedirs(self.path, exist_ok=True)
+        for column, values in columns.items():
+            itemsize = np.dtype(self.dtype(column)).itemsize
+            mode = 'r+b' if os.path.exists(self.column_path(column)) else 'wb'
+            with open(self.column_path(column), mode) as f:
+                f.seek(self.count * itemsize)
+                f.write(values.tobytes())
+                f.truncate()
+
+        last = pd.Timestamp(self.meta['last']) if self.meta['last'] is not None else None
+        if last is not None and timestamps.iloc[0] < last:
+            self.meta['sorted'] = False
+        newest = timestamps.iloc[-1] if last is None else max(last, timestamps.iloc[-1])
+        self.meta['last'] = newest.isoformat()
+        self.meta['count'] += len(df)
+        self.write_meta()
+        return len(df)
+
+    @traced()
+    def sync(self):
+        """Catch up with the history store: the rows newer than the files (all of them on a fresh checkout)
+
+        The collectors append here as they ingest, so this only finds rows when the
+        files were missing or written without (another checkout, a CI job that
+        doesn't carry them); checking costs one column of the newest partition.
+        """
+        from history_store import load_history, raw_latest
+        last = self.meta['last']
+        if last is not None:
+            latest = raw_latest(self.source)
+            if latest is None or latest <= pd.Timestamp(last):
+                return 0
+        df = load_history(self.source, start=last)
+        if last is not None and not df.empty:
+            df = df[pd.to_datetime(df['timestamp']) > pd.Timestamp(last)]
+        return self.append(df)
+
+    def write_meta(self):
+        tmp_path = self.meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        os.replace(tmp_path, self.meta_path)
+
+    def column(self, column):
+        """Read-only memory-mapped view of one column (the first `count` rows)"""
+        if self.count == 0:
+            return np.empty(0, dtype=self.dtype(column))
+        return np.memmap(self.column_path(column), dtype=self.dtype(column), mode='r', shape=(self.count,))
+
+    def timestamps(self):
+        return self.column('timestamp').view('datetime64[ns]')
+
+    @traced()
+    def arrays(self, since=None):
+        """Columns as memory-mapped views, optionally only rows with timestamp > since
+
+        Returns (keys, timestamps, series codes, {metric: values}); sorted files are
+        cut with one binary search, so the views stay zero-copy.
+        """
+        timestamps = self.timestamps()
+        series = self.column('series')
+        metrics = {metric: self.column(metric) for metric in self.metrics}
+
+        if since is not None:
+            since = np.datetime64(pd.Timestamp(since).to_datetime64(), 'ns')
+            if self.meta['sorted']:
+                start = np.searchsorted(timestamps, since, side='right')
+                timestamps, series = timestamps[start:], series[start:]
+                metrics = {metric: values[start:] for metric, values in metrics.items()}
+            else:
+                newer = timestamps > since
+                timestamps, series = timestamps[newer], series[newer]
+                metrics = {metric: values[newer] for metric, values in metrics.items()}
+
+        return self.keys, timestamps, series, metrics
+
+    def to_frame(self, since=None):
+        """The stored rows as a history DataFrame (copies; for tools, not the hot path)"""
+        keys, timestamps, series, metrics = self.arrays(since)
+        df = pd.DataFrame({'timestamp': np.asarray(timestamps), self.key: np.asarray(keys, dtype=object)[series]})
+        for metric, values in metrics.items():
+            df[metric] = np.where(values == MISSING, np.nan, values)
+        return df
+
+
+def import_history(source):
+    """Replace a source's series files with the full history"""
+    from history_store import load_history
+    store = SeriesStore(source)
+    if os.path.isdir(store.path):
+        for name in os.listdir(store.path):
+            os.remove(os.path.join(store.path, name))
+    return SeriesStore(source).append(load_history(source))
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'info'
+
+    if command == 'sync':
+        for source in SERIES_COLUMNS:
+            store = SeriesStore(source)
+            count = store.sync()
+            print(f"✅ {source}: {count:,} new rows, {store.count:,} in {store.path}")
+    elif command == 'import':
+        for source in SERIES_COLUMNS:
+            count = import_history(source)
+            print(f"✅ {source}: {count:,} rows -> {SeriesStore(source).path}")
+    elif command == 'info':
+        for source in SERIES_COLUMNS:
+            store = SeriesStore(source)
+            if not store.exists():
+                print(f"⏭️  {source}: no series files yet (run 'import')")
+                continue
+            size = sum(os.path.getsize(os.path.join(store.path, name)) for name in os.listdir(store.path))
+            print(f"📊 {source}: {store.count:,} rows, {len(store.keys)} series, "
+                  f"{size / 1024 / 1024:.1f} MB, until {store.meta['last']}")
+    else:
+        print(f"Unknown command: {command}")
+        print("Usage: python scripts/series_store.py sync | import | info")
+        sys.exit(1)
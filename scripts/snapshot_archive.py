@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Snapshot archive for AI Media Empire Analytics
+Packs timestamped collector snapshots into compressed daily segments
+A snapshot whose content (observation times aside) equals the previous one is
+stored as a reference record {generated_at, same_as, content_hash}; every
+reader resolves it back to the full payload, restamped with its own time
+
+Layout: data/archive/<source>/<YYYY-MM-DD>.jsonl.gz  (one gzip member per snapshot)
+        data/archive/<source>/index.jsonl            (key -> segment, offset, length)
+
+Usage:  python scripts/snapshot_archive.py compact [--delete]
+        python scripts/snapshot_archive.py get youtube 20250803_094659
+"""
+
+import os
+import sys
+import json
+import glob
+import gzip
+import bisect
+from datetime import datetime
+
+from write_layer import content_hash, count_written, count_avoided
+from instrumentation import traced
+
+ARCHIVE_DIR = 'data/archive'
+SOURCES = ['youtube', 'telegram']
+
+# 'files' keeps one pretty-printed JSON per run, 'archive' appends to segments
+SNAPSHOT_MODE = os.environ.get('SNAPSHOT_MODE', 'files')
+
+KEY_FORMAT = '%Y%m%d_%H%M%S'
+
+
+def snapshot_key(timestamp):
+    """Archive key (as used in snapshot filenames) for a datetime or key string"""
+    if isinstance(timestamp, str):
+        return timestamp
+    return timestamp.strftime(KEY_FORMAT)
+
+
+def loose_snapshots(source, data_dir='data'):
+    """Timestamped snapshot files still lying in data/, as (key, path) in time order"""
+    prefix = f"{source}_"
+    paths = glob.glob(os.path.join(data_dir, f"{prefix}????????_??????.json"))
+    return sorted((os.path.basename(path)[len(prefix):-len('.json')], path) for path in paths)
+
+
+def is_reference(payload):
+    return 'same_as' in payload
+
+
+def restamp(payload, generated_at):
+    """A full snapshot as observed again at generated_at"""
+    channels = [
+        {**channel, 'timestamp': generated_at} if 'timestamp' in channel else channel
+        for channel in payload.get('channels', [])
+    ]
+    return {**payload, 'generated_at': generated_at, 'channels': channels}
+
+
+def snapshot_hash(payload):
+    """Content hash of a snapshot without the times a reference restamps (generated_at, channel timestamps)"""
+    return content_hash(restamp(payload, None))
+
+
+def resolve(payload, lookup):
+    """Full payload of a snapshot; references are resolved with lookup(key)"""
+    if not is_reference(payload):
+        return payload
+    return restamp(lookup(payload['same_as']), payload['generated_at'])
+
+
+class SnapshotArchive:
+    def __init__(self, source, root=ARCHIVE_DIR):
+        self.source = source
+        self.data_dir = os.path.dirname(os.path.normpath(root))
+        self.path = os.path.join(root, source)
+        self.index_path = os.path.join(self.path, 'index.jsonl')
+        self._index = None
+        self._keys = None
+
+    def _load_index(self):
+        if self._index is None:
+            self._index = []
+            if os.path.exists(self.index_path):
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self._index = [json.loads(line) for line in f if line.strip()]
+            self._index.sort(key=lambda entry: entry['key'])
+            self._keys = [entry['key'] for entry in self._index]
+
+    @property
+    def index(self):
+        """Index entries sorted by key, loaded on first use"""
+        self._load_index()
+        return self._index
+
+    def keys(self):
+        """Snapshot keys in time order"""
+        self._load_index()
+        return self._keys
+
+    def __contains__(self, key):
+        keys = self.keys()
+        i = bisect.bisect_left(keys, key)
+        return i < len(keys) and keys[i] == key
+
+    def segment_name(self, key):
+        """Daily segment file for a key"""
+        return f"{key[:4]}-{key[4:6]}-{key[6:8]}.jsonl.gz"
+
+    def append(self, key, payload):
+        """Append one snapshot as its own gzip member and index it"""
+        key = snapshot_key(key)
+        os.makedirs(self.path, exist_ok=True)
+
+        line = json.dumps(payload, ensure_ascii=False, separators=(',', ':')) + '\n'
+        member = gzip.compress(line.encode('utf-8'))
+
+        segment = self.segment_name(key)
+        with open(os.path.join(self.path, segment), 'ab') as f:
+            offset = f.tell()
+            f.write(member)
+
+        entry = {'key': key, 'segment': segment, 'offset': offset, 'length': len(member)}
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+
+        if self._index is not None:
+            i = bisect.bisect_right(self._keys, key)
+            self._index.insert(i, entry)
+            self._keys.insert(i, key)
+
+        return entry
+
+    def _read(self, f, entry):
+        f.seek(entry['offset'])
+        return json.loads(gzip.decompress(f.read(entry['length'])))
+
+    def read(self, key, resolved=True):
+        """Snapshot stored under exactly this key, or None"""
+        key = snapshot_key(key)
+        i = bisect.bisect_left(self.keys(), key)
+        if i == len(self._keys) or self._keys[i] != key:
+            return None
+
+        entry = self.index[i]
+        with open(os.path.join(self.path, entry['segment']), 'rb') as f:
+            payload = self._read(f, entry)
+        return self.resolve(payload) if resolved else payload
+
+    def resolve(self, payload):
+        # A reference may point at a loose file written before the switch to archive mode
+        return resolve(payload, lambda key: load_snapshot(self.source, key, self.data_dir, resolved=False))
+
+    def get(self, timestamp):
+        """Latest snapshot at or before a timestamp, as (key, payload) or None"""
+        key = snapshot_key(timestamp)
+        i = bisect.bisect_right(self.keys(), key)
+        if i == 0:
+            return None
+
+        entry = self.index[i - 1]
+        with open(os.path.join(self.path, entry['segment']), 'rb') as f:
+            return entry['key'], self.resolve(self._read(f, entry))
+
+    def iter_raw(self, start=None, end=None):
+        """Lazily yield stored (key, payload) in time order, decompressing one snapshot at a time"""
+        keys = self.keys()
+        lo = bisect.bisect_left(keys, snapshot_key(start)) if start is not None else 0
+        hi = bisect.bisect_right(keys, snapshot_key(end)) if end is not None else len(keys)
+
+        f = None
+        segment = None
+        try:
+            for entry in self.index[lo:hi]:
+                if entry['segment'] != segment:
+                    if f:
+                        f.close()
+                    segment = entry['segment']
+                    f = open(os.path.join(self.path, segment), 'rb')
+                yield entry['key'], self._read(f, entry)
+        finally:
+            if f:
+                f.close()
+
+    def iter_snapshots(self, start=None, end=None):
+        """Lazily yield (key, payload) in time order, references resolved"""
+        return resolving(self.source, self.iter_raw(start, end), self.data_dir)
+
+
+def load_snapshot(source, key, data_dir='data', resolved=True):
+    """Snapshot stored under exactly this key, from a loose file or the archive"""
+    key = snapshot_key(key)
+    path = os.path.join(data_dir, f"{source}_{key}.json")
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+    else:
+        payload = SnapshotArchive(source, root=os.path.join(data_dir, 'archive')).read(key, resolved=False)
+        if payload is None:
+            raise KeyError(f"No {source} snapshot {key}")
+
+    if resolved:
+        return resolve(payload, lambda ref: load_snapshot(source, ref, data_dir, resolved=False))
+    return payload
+
+
+def resolving(source, snapshots, data_dir='data'):
+    """Resolve references in a (key, payload) stream
+
+    References point at the last full snapshot before them, which the stream
+    has usually just yielded, so only that one is kept.
+    """
+    last = None
+    for key, payload in snapshots:
+        if is_reference(payload):
+            if last is None or last[0] != payload['same_as']:
+                last = (payload['same_as'], load_snapshot(source, payload['same_as'], data_dir, resolved=False))
+            payload = restamp(last[1], payload['generated_at'])
+        else:
+            last = (key, payload)
+        yield key, payload
+
+
+def iter_snapshots(source, start=None, end=None, data_dir='data'):
+    """Yield (key, payload) from the archive and any loose files, merged in time order"""
+    return resolving(source, iter_raw(source, start, end, data_dir), data_dir)
+
+
+def iter_raw(source, start=None, end=None, data_dir='data'):
+    """Stored (key, payload) from the archive and loose files in time order, references unresolved"""
+    archive = SnapshotArchive(source, root=os.path.join(data_dir, 'archive'))
+    start_key = snapshot_key(start) if start is not None else None
+    end_key = snapshot_key(end) if end is not None else None
+
+    loose = [
+        (key, path) for key, path in loose_snapshots(source, data_dir)
+        if (start_key is None or key >= start_key) and (end_key is None or key <= end_key)
+        and key not in archive
+    ]
+
+    archived = archive.iter_raw(start, end)
+    pending = next(archived, None)
+    for key, path in loose:
+        while pending is not None and pending[0] < key:
+            yield pending
+            pending = next(archived, None)
+        with open(path, 'r', encoding='utf-8') as f:
+            yield key, json.load(f)
+
+    while pending is not None:
+        yield pending
+        pending = next(archived, None)
+
+
+def snapshot_at(source, at, data_dir='data'):
+    """Latest snapshot at or before a time, from the archive or a loose file, as (key, payload) or None"""
+    key = snapshot_key(at)
+    loose = [loose_key for loose_key, _ in loose_snapshots(source, data_dir)]
+    archive_keys = SnapshotArchive(source, root=os.path.join(data_dir, 'archive')).keys()
+    candidates = [keys[i - 1] for keys in (loose, archive_keys) for i in [bisect.bisect_right(keys, key)] if i]
+    if not candidates:
+        return None
+    return max(candidates), load_snapshot(source, max(candidates), data_dir)
+
+
+def snapshots_at(source, times, data_dir='data'):
+    """Yield the snapshot in effect (payload or None) at each of a sorted sequence of times
+
+    One lookup for the first time, then a single forward pass over the stream.
+    """
+    times = list(times)
+    if not times:
+        return
+    first = snapshot_at(source, times[0], data_dir)
+    stream = iter_snapshots(source, start=first[0] if first else None, end=times[-1], data_dir=data_dir)
+    current = first
+    pending = next(stream, None)
+    for at in times:
+        key = snapshot_key(at)
+        while pending is not None and pending[0] <= key:
+            current = pending
+            pending = next(stream, None)
+        yield current[1] if current else None
+
+
+def snapshot_head(source, data_dir='data'):
+    """(key, content hash) of the last full snapshot of a source, or None"""
+    archive = SnapshotArchive(source, root=os.path.join(data_dir, 'archive'))
+    loose = loose_snapshots(source, data_dir)
+    keys = [key for key in (loose[-1][0] if loose else None, archive.keys()[-1] if archive.keys() else None) if key]
+    if not keys:
+        return None
+
+    latest = load_snapshot(source, max(keys), data_dir, resolved=False)
+    if is_reference(latest):
+        return latest['same_as'], latest['content_hash']
+    return max(keys), snapshot_hash(latest)
+
+
+@traced()
+def write_snapshot(source, payload, timestamp=None):
+    """Write a timestamped snapshot according to SNAPSHOT_MODE
+
+    When the content matches the last full snapshot only a reference record
+    is written.
+    """
+    key = snapshot_key(timestamp or datetime.now())
+    full = payload
+    digest = snapshot_hash(payload)
+    head = snapshot_head(source)
+    if head and head[1] == digest:
+        payload = {'generated_at': payload.get('generated_at'), 'same_as': head[0], 'content_hash': digest}
+
+    if SNAPSHOT_MODE == 'archive':
+        archive = SnapshotArchive(source)
+        entry = archive.append(key, payload)
+        path = os.path.join(archive.path, entry['segment'])
+        size = entry['length']
+    else:
+        path = f"data/{source}_{key}.json"
+        data = json.dumps(payload, indent=2, ensure_ascii=False).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(data)
+        size = len(data)
+
+    count_written(size)
+    if payload is not full:
+        count_avoided(len(json.dumps(full, indent=2, ensure_ascii=False).encode('utf-8')) - size)
+    return path
+
+
+def compact(delete=False):
+    """Pack loose snapshot files into the archive"""
+    for source in SOURCES:
+        archive = SnapshotArchive(source)
+        packed = 0
+        skipped = 0
+        size_before = 0
+
+        for key, path in loose_snapshots(source):
+            size_before += os.path.getsize(path)
+            if key in archive:
+                skipped += 1
+            else:
+                with open(path, 'r', encoding='utf-8') as f:
+                    archive.append(key, json.load(f))
+                packed += 1
+            if delete:
+                os.remove(path)
+
+        size_after = sum(
+            os.path.getsize(os.path.join(archive.path, name))
+            for name in os.listdir(archive.path)
+        ) if os.path.isdir(archive.path) else 0
+
+        print(f"✅ {source}: packed {packed:,} snapshots ({skipped:,} already archived)")
+        print(f"   {size_before / 1024 / 1024:.1f} MB loose -> {size_after / 1024 / 1024:.1f} MB archived")
+        if delete:
+            print(f"   Removed {packed + skipped:,} loose files")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'compact'
+
+    if command == 'compact':
+        compact(delete='--delete' in sys.argv[2:])
+    elif command == 'get' and len(sys.argv) == 4:
+        found = SnapshotArchive(sys.argv[2]).get(sys.argv[3])
+        if not found:
+            print(f"No snapshot at or before {sys.argv[3]}")
+            sys.exit(1)
+        print(json.dumps({'key': found[0], **found[1]}, indent=2, ensure_ascii=False))
+    else:
+        print("Usage: python scripts/snapshot_archive.py compact [--delete]")
+        print("       python scripts/snapshot_archive.py get <youtube|telegram> <YYYYMMDD_HHMMSS>")
+        sys.exit(1)
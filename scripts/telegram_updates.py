@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Event-driven Telegram ingestion via getUpdates long polling
+Streams channel posts and edits, member joins/leaves and discussion-chat
+messages into the history store as they happen. Channels whose membership
+changed get one getChatMemberCount call per flush, so the subscriber history
+is minutes fresh instead of hourly. The update offset is checkpointed after
+every flush (at-least-once; replayed updates are dropped by update_id on read)
+
+Layout: data/history/telegram_events/<YYYY-MM>.parquet
+        data/telegram_updates.json   (offset checkpoint)
+Usage:  python scripts/telegram_updates.py [listen] [--flush-interval 60]
+        python scripts/telegram_updates.py drain    # fetch what is pending and exit
+        python scripts/telegram_updates.py stats [days]
+"""
+
+import os
+import sys
+import json
+import signal
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+import pandas as pd
+
+from history_store import HistoryStore
+from http_client import AsyncHTTPClient
+from instrumentation import traced, export
+from collect_telegram_data import (API_BASE, BOT_TOKEN, CHANNELS, REQUEST_TIMEOUT,
+                                   append_history, call_api_async)
+
+EVENTS_SOURCE = 'telegram_events'
+CHECKPOINT_PATH = 'data/telegram_updates.json'
+
+# Seconds the server holds a getUpdates call open when nothing is pending
+POLL_TIMEOUT = int(os.environ.get('TELEGRAM_POLL_TIMEOUT', 30))
+# Seconds between writes to the history store (and checkpoints)
+FLUSH_INTERVAL = float(os.environ.get('TELEGRAM_FLUSH_INTERVAL', 60))
+
+# chat_member updates are only delivered when asked for explicitly
+ALLOWED_UPDATES = ['channel_post', 'edited_channel_post', 'chat_member', 'my_chat_member', 'message']
+
+MEDIA_TYPES = ['photo', 'video', 'animation', 'audio', 'voice', 'video_note', 'document', 'poll']
+JOINED = {'member', 'administrator', 'creator', 'restricted'}
+
+EVENT_COLUMNS = ['timestamp', 'update_id', 'kind', 'username', 'chat', 'chat_id', 'message_id',
+                 'member_delta', 'text_length', 'media', 'is_forward', 'status']
+
+
+def chat_username(chat):
+    """'@name' for public chats, the numeric id for private ones"""
+    return f"@{chat['username']}" if chat.get('username') else str(chat['id'])
+
+
+def discussion_chats(channels=CHANNELS):
+    """Discussion chat -> channel it belongs to"""
+    return {info['chat']: username for username, info in channels.items() if info.get('chat')}
+
+
+def parse_update(update, discussions=None):
+    """One update as an event row, or None for updates we don't track"""
+    discussions = discussions if discussions is not None else discussion_chats()
+
+    for kind, field in (('post', 'channel_post'), ('post_edit', 'edited_channel_post'), ('chat_message', 'message')):
+        message = update.get(field)
+        if message is None:
+            continue
+        chat = chat_username(message['chat'])
+        if kind == 'chat_message' and chat not in discussions:
+            return None
+        return {
+            'timestamp': datetime.fromtimestamp(message.get('edit_date') or message['date']),
+            'update_id': update['update_id'],
+            'kind': kind,
+            'username': discussions.get(chat, chat),
+            'chat': chat,
+            'chat_id': message['chat']['id'],
+            'message_id': message['message_id'],
+            'text_length': len(message.get('text') or message.get('caption') or ''),
+            'media': next((media for media in MEDIA_TYPES if media in message), None),
+            'is_forward': bool(message.get('is_automatic_forward') or message.get('forward_origin')
+                               or message.get('forward_from_chat'))
+        }
+
+    for kind, field in (('member', 'chat_member'), ('bot_status', 'my_chat_member')):
+        change = update.get(field)
+        if change is None:
+            continue
+        old, new = change['old_chat_member']['status'], change['new_chat_member']['status']
+        chat = chat_username(change['chat'])
+        return {
+            'timestamp': datetime.fromtimestamp(change['date']),
+            'update_id': update['update_id'],
+            'kind': kind,
+            'username': discussions.get(chat, chat),
+            'chat': chat,
+            'chat_id': change['chat']['id'],
+            'member_delta': (new in JOINED) - (old in JOINED) if kind == 'member' else 0,
+            'status': new
+        }
+
+    return None
+
+
+def load_checkpoint(path=CHECKPOINT_PATH):
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {'offset': 0, 'events': 0, 'updated_at': None}
+
+
+def save_checkpoint(checkpoint, path=CHECKPOINT_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_events(start=None, end=None):
+    """Stored events, each update once"""
+    df = HistoryStore(EVENTS_SOURCE).load(start=start, end=end)
+    if df.empty:
+        return df
+    return df.drop_duplicates(subset='update_id', keep='last').reset_index(drop=True)
+
+
+def write_stores(events, rows):
+    """Append buffered events and member-count history rows to the stores"""
+    if not events.empty:
+        HistoryStore(EVENTS_SOURCE).append(events)
+    if not rows.empty:
+        append_history(rows)
+
+
+class UpdatesListener:
+    """Long-polls getUpdates and flushes events and fresh member counts to the stores"""
+
+    def __init__(self, client, channels=CHANNELS, poll_timeout=POLL_TIMEOUT, flush_interval=FLUSH_INTERVAL,
+                 checkpoint_path=CHECKPOINT_PATH, on_rows=None, write_lock=None):
+        self.client = client
+        self.channels = channels
+        self.discussions = discussion_chats(channels)
+        self.poll_timeout = poll_timeout
+        self.flush_interval = flush_interval
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint = load_checkpoint(checkpoint_path)
+        # Called with the member-count history rows of every flush (the daemon queues them)
+        self.on_rows = on_rows
+        # Held around every store write; the daemon shares it with the collectors' saves
+        self.write_lock = write_lock or asyncio.Lock()
+
+        # Not yet flushed: events, the offset after them and channels whose membership moved
+        self.offset = self.checkpoint['offset']
+        self.events = []
+        self.touched = {}
+
+    async def poll(self, timeout):
+        """One getUpdates call; returns the updates (empty on timeout)"""
+        data = await self.client.get_json(f"{API_BASE}/bot{BOT_TOKEN}/getUpdates", params={
+            'offset': self.offset,
+            'timeout': timeout,
+            'allowed_updates': json.dumps(ALLOWED_UPDATES)
+        })
+        if not data or not data.get('ok'):
+            # 409 Conflict: a webhook is set, getUpdates is disabled until it is removed
+            raise RuntimeError(data.get('description') if data else 'invalid getUpdates response')
+        return data['result']
+
+    def ingest(self, updates):
+        """Buffer tracked events and advance the in-memory offset"""
+        for update in updates:
+            self.offset = max(self.offset, update['update_id'] + 1)
+            event = parse_update(update, self.discussions)
+            if event is None:
+                continue
+            self.events.append(event)
+            if event['kind'] == 'member' and event['username'] == event['chat']:
+                change = update['chat_member']
+                self.touched[event['username']] = change['chat'].get('title')
+
+    async def member_rows(self):
+        """Current member count of every channel whose membership changed, as history rows"""
+        usernames = list(self.touched)
+        counts = await asyncio.gather(*(
+            call_api_async(self.client, 'getChatMemberCount', {'chat_id': username}) for username in usernames
+        ))
+        now = datetime.now().isoformat()
+        rows = [{
+            'timestamp': now,
+            'username': username,
+            'title': self.touched[username] or self.channels.get(username, {}).get('name'),
+            'subscribers': count
+        } for username, count in zip(usernames, counts) if count is not None]
+        return pd.DataFrame(rows)
+
+    @traced('flush updates')
+    async def flush(self):
+        """Persist buffered events and fresh member counts, then checkpoint the offset"""
+        if self.offset == self.checkpoint['offset']:
+            return 0
+
+        events = len(self.events)
+        df = pd.DataFrame(self.events).reindex(columns=EVENT_COLUMNS)
+        if self.events:
+            df = df.astype({'update_id': 'int64', 'chat_id': 'int64', 'message_id': 'Int64',
+                            'member_delta': 'Int64', 'text_length': 'Int64', 'is_forward': 'boolean'})
+        rows = await self.member_rows() if self.touched else pd.DataFrame()
+
+        # Parquet, rollup and CSV writes run off the event loop, one writer at a time
+        async with self.write_lock:
+            await asyncio.to_thread(write_stores, df, rows)
+        if not rows.empty and self.on_rows:
+            self.on_rows(rows)
+
+        # The offset is saved only once everything before it is stored
+        self.checkpoint = {
+            'offset': self.offset,
+            'events': self.checkpoint['events'] + events,
+            'updated_at': datetime.now().isoformat()
+        }
+        save_checkpoint(self.checkpoint, self.checkpoint_path)
+        print(f"📥 {events} events, {len(self.touched)} member counts refreshed (offset {self.offset})")
+        self.events = []
+        self.touched = {}
+        return events
+
+    async def run(self, stop=None, drain=False):
+        """Poll until stop is set (or, with drain, until nothing is pending), flushing periodically"""
+        stop = stop or asyncio.Event()
+        loop = asyncio.get_running_loop()
+        last_flush = loop.time()
+        failures = 0
+
+        try:
+            while not stop.is_set():
+                try:
+                    updates = await self.poll(0 if drain else self.poll_timeout)
+                    failures = 0
+                except Exception as e:
+                    failures += 1
+                    print(f"⚠️  getUpdates failed: {e}")
+                    if drain:
+                        break
+                    await asyncio.sleep(min(60, 2 ** failures))
+                    continue
+
+                self.ingest(updates)
+                if drain and not updates:
+                    break
+                if loop.time() - last_flush >= self.flush_interval:
+                    await self.flush()
+                    last_flush = loop.time()
+        finally:
+            await self.flush()
+
+
+def print_stats(days=7):
+    """Posts, edits, net member change and discussion messages per channel"""
+    df = load_events(start=datetime.now() - timedelta(days=days))
+    if df.empty:
+        print(f"No events in the last {days} days")
+        return
+
+    counts = df.pivot_table(index='username', columns='kind', values='update_id', aggfunc='count', fill_value=0)
+    net = df[df['kind'] == 'member'].groupby('username')['member_delta'].sum()
+    print(f"📊 Telegram events, last {days} days")
+    for username, row in counts.iterrows():
+        print(f"   {username}: {row.get('post', 0)} posts, {row.get('post_edit', 0)} edits, "
+              f"{int(net.get(username, 0)):+d} members, {row.get('chat_message', 0)} discussion messages")
+
+
+async def listen(args):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    # The HTTP timeout has to outlast the long poll
+    async with AsyncHTTPClient(max_concurrency=4, timeout=args.poll_timeout + REQUEST_TIMEOUT) as client:
+        listener = UpdatesListener(client, poll_timeout=args.poll_timeout, flush_interval=args.flush_interval)
+        print(f"👂 Listening for updates from offset {listener.offset}")
+        await listener.run(stop, drain=args.command == 'drain')
+    print(f"✅ Stopped at offset {listener.checkpoint['offset']} ({listener.checkpoint['events']:,} events total)")
+    export('telegram_updates')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Ingest Telegram updates via getUpdates long polling')
+    parser.add_argument('command', nargs='?', default='listen', choices=['listen', 'drain', 'stats'])
+    parser.add_argument('days', nargs='?', type=int, default=7, help='window for stats')
+    parser.add_argument('--poll-timeout', type=int, default=POLL_TIMEOUT, help='seconds per long poll')
+    parser.add_argument('--flush-interval', type=float, default=FLUSH_INTERVAL, help='seconds between store writes')
+    args = parser.parse_args()
+
+    if args.command == 'stats':
+        print_stats(args.days)
+        sys.exit(0)
+
+    if not BOT_TOKEN:
+        print("❌ Error: TELEGRAM_BOT_TOKEN not set!")
+        sys.exit(1)
+    asyncio.run(listen(args))
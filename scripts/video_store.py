@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Per-video metrics store for AI Media Empire Analytics
+Records views/likes/comments per video_id only when a counter changes, and the
+uploads catalog of every channel (ids in discovery order, playlist sync progress
+and the ETag of every 50-id statistics batch)
+
+Usage:  python scripts/video_store.py backfill              # stream data/youtube_* snapshots in
+        python scripts/video_store.py curve <video_id>
+        python scripts/video_store.py channel <channel_id> [YYYY-MM-DDTHH:MM:SS]
+        python scripts/video_store.py catalog
+"""
+
+import os
+import sys
+import sqlite3
+from datetime import datetime
+
+from snapshot_archive import iter_snapshots
+
+VIDEO_DB = 'data/video_metrics.sqlite'
+
+COUNTERS = ['views', 'likes', 'comments']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    video_id TEXT PRIMARY KEY,
+    channel_id TEXT,
+    channel_title TEXT,
+    title TEXT,
+    published_at TEXT,
+    duration TEXT,
+    first_seen TEXT,
+    last_seen TEXT,
+    views INTEGER,
+    likes INTEGER,
+    comments INTEGER
+);
+CREATE INDEX IF NOT EXISTS videos_by_channel ON videos (channel_id);
+
+-- One row per change of any counter (run-length encoded: a row holds until the next one)
+CREATE TABLE IF NOT EXISTS observations (
+    video_id TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    views INTEGER,
+    likes INTEGER,
+    comments INTEGER,
+    PRIMARY KEY (video_id, ts)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+-- Uploads playlist sync per channel: complete once paged to the end, page_token resumes an unfinished first sync
+CREATE TABLE IF NOT EXISTS catalog (
+    channel_id TEXT PRIMARY KEY,
+    playlist_id TEXT,
+    complete INTEGER DEFAULT 0,
+    page_token TEXT,
+    head_etag TEXT,
+    synced_at TEXT
+);
+
+-- Every known upload; rowid order is discovery order, so statistics batches stay stable as the catalog grows
+CREATE TABLE IF NOT EXISTS catalog_items (
+    video_id TEXT PRIMARY KEY,
+    channel_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS catalog_items_by_channel ON catalog_items (channel_id);
+
+-- Statistics batch n = catalog_items n*50 .. n*50+49 in rowid order; size as of its last refresh
+CREATE TABLE IF NOT EXISTS catalog_batches (
+    batch INTEGER PRIMARY KEY,
+    etag TEXT,
+    refreshed_at TEXT,
+    size INTEGER
+);
+"""
+
+# Video ids per videos.list request
+BATCH_SIZE = 50
+
+
+def normalize_ts(timestamp):
+    """Second-precision ISO timestamp, so stored values sort lexicographically"""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return timestamp.isoformat(timespec='seconds')
+
+
+class VideoStore:
+    def __init__(self, path=VIDEO_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else None
+
+    def set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def record(self, videos, timestamp, commit=True):
+        """Record one collection run; returns the number of observations written"""
+        ts = normalize_ts(timestamp)
+        written = 0
+
+        for video in videos:
+            counters = [int(video.get(counter) or 0) for counter in COUNTERS]
+            row = self.conn.execute(
+                "SELECT last_seen, views, likes, comments FROM videos WHERE video_id = ?",
+                (video['video_id'],)
+            ).fetchone()
+
+            if row is None:
+                self.conn.execute(
+                    "INSERT INTO videos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (video['video_id'], video.get('channel_id'), video.get('channel_title'),
+                     video.get('title'), video.get('published_at'), video.get('duration'),
+                     ts, ts, *counters)
+                )
+                changed = True
+            elif ts <= row['last_seen']:
+                # Already recorded (replayed snapshot)
+                continue
+            else:
+                changed = counters != [row[counter] for counter in COUNTERS]
+                self.conn.execute(
+                    "UPDATE videos SET last_seen = ?, title = ?, views = ?, likes = ?, comments = ? WHERE video_id = ?",
+                    (ts, video.get('title'), *counters, video['video_id'])
+                )
+
+            if changed:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO observations VALUES (?, ?, ?, ?, ?)",
+                    (video['video_id'], ts, *counters)
+                )
+                written += 1
+
+        if commit:
+            self.conn.commit()
+        return written
+
+    def views_curve(self, video_id):
+        """Change points for one video as dicts, closed with the last time it was seen"""
+        rows = self.conn.execute(
+            "SELECT ts, views, likes, comments FROM observations WHERE video_id = ? ORDER BY ts",
+            (video_id,)
+        ).fetchall()
+        curve = [dict(row) for row in rows]
+
+        last_seen = self.conn.execute(
+            "SELECT last_seen FROM videos WHERE video_id = ?", (video_id,)
+        ).fetchone()
+        if curve and last_seen and last_seen['last_seen'] > curve[-1]['ts']:
+            curve.append({**curve[-1], 'ts': last_seen['last_seen']})
+
+        return curve
+
+    def channel_videos_at(self, channel_id, at=None):
+        """Counters of every video of a channel as of a moment (latest change point <= at)"""
+        at = normalize_ts(at or datetime.now())
+        rows = self.conn.execute(
+            """
+            SELECT v.video_id, v.title, v.published_at, v.last_seen,
+                   o.ts AS observed_at, o.views, o.likes, o.comments
+            FROM videos v
+            JOIN observations o ON o.video_id = v.video_id
+            WHERE v.channel_id = ?
+              AND o.ts = (SELECT MAX(ts) FROM observations WHERE video_id = v.video_id AND ts <= ?)
+            ORDER BY o.views DESC
+            """,
+            (channel_id, at)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def catalog_state(self, channel_id):
+        row = self.conn.execute("SELECT * FROM catalog WHERE channel_id = ?", (channel_id,)).fetchone()
+        return dict(row) if row else None
+
+    def set_catalog_state(self, channel_id, playlist_id, **fields):
+        self.conn.execute("INSERT OR IGNORE INTO catalog (channel_id, playlist_id) VALUES (?, ?)", (channel_id, playlist_id))
+        fields = {'playlist_id': playlist_id, 'synced_at': normalize_ts(datetime.now()), **fields}
+        assignments = ', '.join(f"{column} = ?" for column in fields)
+        self.conn.execute(f"UPDATE catalog SET {assignments} WHERE channel_id = ?", (*fields.values(), channel_id))
+
+    def catalog_ids(self, channel_id):
+        """Known upload ids of a channel"""
+        rows = self.conn.execute("SELECT video_id FROM catalog_items WHERE channel_id = ?", (channel_id,))
+        return {row['video_id'] for row in rows}
+
+    def add_catalog_items(self, channel_id, video_ids):
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO catalog_items (video_id, channel_id) VALUES (?, ?)",
+            [(video_id, channel_id) for video_id in video_ids]
+        )
+
+    def catalog_batches(self):
+        """Every statistics batch as (batch, video ids, etag, refreshed_at, stale)
+
+        The catalog only grows at the end, so a batch holds ids never refreshed
+        (is stale) exactly when it is larger than at its last refresh.
+        """
+        ids = [row['video_id'] for row in self.conn.execute("SELECT video_id FROM catalog_items ORDER BY rowid")]
+        state = {row['batch']: row for row in self.conn.execute("SELECT * FROM catalog_batches")}
+        batches = []
+        for n, i in enumerate(range(0, len(ids), BATCH_SIZE)):
+            chunk = ids[i:i + BATCH_SIZE]
+            row = state.get(n)
+            stale = row is None or row['size'] != len(chunk)
+            batches.append((n, chunk, row['etag'] if row else None, row['refreshed_at'] if row else None, stale))
+        return batches
+
+    def refresh_plan(self, budget, recent=5, uploads=()):
+        """Batches to refresh this run, at most budget of them
+
+        First the batches holding this run's new uploads, then those holding each
+        channel's newest known uploads, then stale batches (ids never refreshed,
+        e.g. a first sync), then the least recently refreshed ones.
+        """
+        batches = self.catalog_batches()
+        newest = {
+            row['video_id'] for row in self.conn.execute(
+                """
+                SELECT video_id FROM (
+                    SELECT c.video_id, ROW_NUMBER() OVER (
+                        PARTITION BY c.channel_id ORDER BY v.published_at DESC, c.rowid
+                    ) AS n
+                    FROM catalog_items c LEFT JOIN videos v ON v.video_id = c.video_id
+                ) WHERE n <= ?
+                """,
+                (recent,)
+            )
+        }
+        uploads = set(uploads)
+        ranked = sorted(batches, key=lambda batch: (
+            not uploads.intersection(batch[1]),
+            not newest.intersection(batch[1]),
+            not batch[4],
+            batch[3] or ''
+        ))
+        return ranked[:budget]
+
+    def mark_batch(self, batch, etag, timestamp, size):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO catalog_batches (batch, etag, refreshed_at, size) VALUES (?, ?, ?, ?)",
+            (batch, etag, normalize_ts(timestamp), size)
+        )
+
+    def latest_videos(self, channel_id, limit=5):
+        """Newest uploads of a channel with their current counters, as collector video records"""
+        rows = self.conn.execute(
+            """
+            SELECT video_id, title, published_at, duration, views, likes, comments, channel_id, channel_title
+            FROM videos WHERE channel_id = ? ORDER BY published_at DESC LIMIT ?
+            """,
+            (channel_id, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def empty(self):
+        """True until a snapshot was ingested (first run, fresh checkout or cache miss)"""
+        return self.get_meta('last_snapshot') is None
+
+    def ingest(self, key, videos, timestamp):
+        """Record the run stored as snapshot `key`; an empty store is first rebuilt from the snapshots
+
+        The rebuild streams every snapshot, this run's included, so it keeps the
+        store in time order; afterwards each run costs one record().
+        """
+        if self.empty():
+            return self.backfill()[1]
+        written = self.record(videos, timestamp, commit=False)
+        self.set_meta('last_snapshot', key)
+        self.conn.commit()
+        return written
+
+    def backfill(self, batch_size=500):
+        """Stream snapshots newer than the last backfilled one into the store"""
+        since = self.get_meta('last_snapshot')
+        snapshots = 0
+        written = 0
+
+        for key, snapshot in iter_snapshots('youtube', start=since):
+            if since is not None and key <= since:
+                continue
+
+            written += self.record(snapshot.get('recent_videos', []), snapshot['generated_at'], commit=False)
+            self.set_meta('last_snapshot', key)
+            snapshots += 1
+
+            # Commit in batches so an interrupted backfill resumes where it stopped
+            if snapshots % batch_size == 0:
+                self.conn.commit()
+
+        self.conn.commit()
+        return snapshots, written
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'backfill'
+    store = VideoStore()
+
+    if command == 'backfill':
+        snapshots, written = store.backfill()
+        videos = store.conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+        print(f"✅ Backfilled {snapshots:,} snapshots: {written:,} change points, {videos:,} videos tracked")
+    elif command == 'curve' and len(sys.argv) == 3:
+        for point in store.views_curve(sys.argv[2]):
+            print(f"{point['ts']}  views={point['views']:,}  likes={point['likes']:,}  comments={point['comments']:,}")
+    elif command == 'catalog':
+        rows = store.conn.execute(
+            """
+            SELECT c.channel_id, c.complete, c.synced_at, COUNT(i.video_id) AS videos
+            FROM catalog c LEFT JOIN catalog_items i ON i.channel_id = c.channel_id
+            GROUP BY c.channel_id ORDER BY c.channel_id
+            """
+        ).fetchall()
+        for row in rows:
+            status = 'complete' if row['complete'] else 'syncing'
+            print(f"{row['channel_id']}  {row['videos']:>6,} videos  {status:<8}  synced {row['synced_at']}")
+        batches = store.catalog_batches()
+        stale = sum(1 for batch in batches if batch[4])
+        print(f"📦 {len(batches):,} statistics batches ({stale:,} with ids never refreshed)")
+    elif command == 'channel' and len(sys.argv) in (3, 4):
+        at = sys.argv[3] if len(sys.argv) == 4 else None
+        for video in store.channel_videos_at(sys.argv[2], at):
+            print(f"{video['views']:>10,}  {video['video_id']}  {video['title']}  (as of {video['observed_at']})")
+    else:
+        print("Usage: python scripts/video_store.py backfill")
+        print("       python scripts/video_store.py curve <video_id>")
+        print("       python scripts/video_store.py channel <channel_id> [timestamp]")
+        print("       python scripts/video_store.py catalog")
+        sys.exit(1)
+
+    store.close()
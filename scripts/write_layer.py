@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Content-hashed writes for snapshots and generated artifacts
+Payloads are hashed in canonical form (sorted keys, the top-level generated_at
+removed), so a rewrite whose only change is the generation time is skipped and
+the file, its mtime and the git tree stay untouched
+
+Usage:  from write_layer import write_json, write_text, report
+        python scripts/write_layer.py hash data/latest.json
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+
+from instrumentation import span, count
+
+# Top-level fields that change on every run without the content changing
+VOLATILE_FIELDS = ('generated_at',)
+
+# Lines of generated Markdown that only carry the generation time
+VOLATILE_LINES = [re.compile(r'^\*(Generated|Last updated): .*\*$', re.MULTILINE)]
+
+# Per-run counters (one process = one run)
+STATS = {'files_written': 0, 'files_skipped': 0, 'bytes_written': 0, 'bytes_avoided': 0}
+
+
+def strip_volatile(value, volatile=VOLATILE_FIELDS):
+    """Copy of a JSON value without its top-level volatile keys (nested ones are content)"""
+    if isinstance(value, dict):
+        return {key: item for key, item in value.items() if key not in volatile}
+    return value
+
+
+def canonical(payload, volatile=VOLATILE_FIELDS):
+    """Canonical JSON text of a payload: sorted keys, no whitespace, no volatile fields"""
+    return json.dumps(strip_volatile(payload, volatile), sort_keys=True, ensure_ascii=False,
+                      separators=(',', ':'), default=str)
+
+
+def content_hash(payload, volatile=VOLATILE_FIELDS):
+    """sha256 of the canonical payload"""
+    return hashlib.sha256(canonical(payload, volatile).encode('utf-8')).hexdigest()
+
+
+def text_hash(text, volatile_lines=VOLATILE_LINES):
+    """sha256 of a text artifact with its volatile lines blanked"""
+    for pattern in volatile_lines:
+        text = pattern.sub('', text)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def count_written(size):
+    STATS['files_written'] += 1
+    STATS['bytes_written'] += size
+    count('file_write_bytes_total', size)
+
+
+def count_avoided(size):
+    STATS['bytes_avoided'] += size
+    count('file_write_avoided_bytes_total', size)
+
+
+def _replace(path, data):
+    """Write bytes atomically (temp file + rename)"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def write_json(path, payload, indent=2, separators=None):
+    """Write a JSON artifact unless the file already holds the same content; True if written"""
+    with span(f"write {os.path.basename(path)}") as record:
+        record['attrs']['written'] = written = _write_json(path, payload, indent, separators)
+    return written
+
+
+def _write_json(path, payload, indent, separators):
+    data = json.dumps(payload, indent=indent, separators=separators, ensure_ascii=False).encode('utf-8')
+
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                unchanged = content_hash(json.load(f)) == content_hash(payload)
+        except (OSError, ValueError):
+            unchanged = False
+        if unchanged:
+            STATS['files_skipped'] += 1
+            count_avoided(len(data))
+            return False
+
+    _replace(path, data)
+    count_written(len(data))
+    return True
+
+
+def write_text(path, text, volatile_lines=VOLATILE_LINES):
+    """Write a text artifact unless only its volatile lines differ; True if written"""
+    with span(f"write {os.path.basename(path)}") as record:
+        record['attrs']['written'] = written = _write_text(path, text, volatile_lines)
+    return written
+
+
+def _write_text(path, text, volatile_lines):
+    data = text.encode('utf-8')
+
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            unchanged = text_hash(f.read(), volatile_lines) == text_hash(text, volatile_lines)
+        if unchanged:
+            STATS['files_skipped'] += 1
+            count_avoided(len(data))
+            return False
+
+    _replace(path, data)
+    count_written(len(data))
+    return True
+
+
+def stats():
+    """This run's counters"""
+    return dict(STATS)
+
+
+def report():
+    """Print this run's write counters"""
+    print(f"💾 Writes: {STATS['bytes_written'] / 1024:.1f} KB in {STATS['files_written']} files, "
+          f"{STATS['bytes_avoided'] / 1024:.1f} KB avoided ({STATS['files_skipped']} unchanged)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == 'hash':
+        for path in sys.argv[2:]:
+            with open(path, 'r', encoding='utf-8') as f:
+                if path.endswith('.json'):
+                    digest = content_hash(json.load(f))
+                else:
+                    digest = text_hash(f.read())
+            print(f"{digest}  {path}")
+    else:
+        print("Usage: python scripts/write_layer.py hash <file> [<file> ...]")
+        sys.exit(1)
@@ -0,0 +1,64 @@
+"""
+Shared fixtures: the scripts are flat modules, so scripts/ goes on sys.path, and
+the collectors talk to the local fake APIs instead of the real ones
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+# Read at import time by the collectors
+os.environ.setdefault('YOUTUBE_API_KEY', 'test-key')
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', '123:test')
+
+import collect_telegram_data
+import collect_youtube_data
+import telegram_updates
+from fake_bot_api import FakeBotAPI, serve
+from fake_youtube_api import FakeYouTubeAPI
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in an empty directory so data/ paths land in tmp"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def server_url(server):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+@pytest.fixture
+def bot_api(monkeypatch):
+    """A fake Bot API server the Telegram collectors point at; chats are added to api.chats"""
+    api = FakeBotAPI()
+    server = serve(api)
+    for module in (collect_telegram_data, telegram_updates):
+        monkeypatch.setattr(module, 'API_BASE', server_url(server))
+        monkeypatch.setattr(module, 'BOT_TOKEN', '123:test')
+    yield api
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def youtube_api(monkeypatch):
+    """start(**options): a fake Data API server (see FakeYouTubeAPI) the YouTube collector points at"""
+    servers = []
+
+    def start(**options):
+        api = FakeYouTubeAPI(**options)
+        server = serve(api)
+        servers.append(server)
+        monkeypatch.setattr(collect_youtube_data, 'API_BASE', server_url(server))
+        return api
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
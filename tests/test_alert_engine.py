@@ -0,0 +1,163 @@
+"""Alert state between runs: dedup, cooldowns, escalation and resolution"""
+
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import alert_engine
+from alert_engine import (AlertState, COOLDOWN_HOURS, ESCALATE_AFTER_HOURS, KEEP_RESOLVED_DAYS, condition,
+                          evaluate_rules)
+
+T0 = datetime(2026, 3, 2, 9, 0)
+
+
+def drop(level='WARNING', pct=12.0):
+    return condition('subscriber_drop', 'youtube:UC1', level, f"lost {pct}%", 'Expected: 100, Actual: 88')
+
+
+def run(state, conditions, hours, sent=True):
+    """One alerts run `hours` after T0; returns the events of the notifications"""
+    now = T0 + timedelta(hours=hours)
+    notifications = state.update(conditions, now=now)
+    if sent:
+        state.mark_sent(notifications, now=now)
+    return [n['event'] for n in notifications]
+
+
+def test_open_alert_is_sent_once_per_cooldown():
+    state = AlertState()
+    cooldown = COOLDOWN_HOURS['INFO']
+    milestone = condition('milestone_1000', 'portfolio', 'INFO', 'soon', 'details')
+
+    assert run(state, [milestone], 0) == ['new']
+    assert run(state, [milestone], 1) == []
+    assert run(state, [milestone], cooldown - 1) == []
+    assert run(state, [milestone], cooldown) == ['reminder']
+    assert run(state, [milestone], cooldown + 1) == []
+    assert state.alerts[milestone['fingerprint']]['sent_count'] == 2
+
+
+def test_undelivered_alert_is_sent_again_next_run():
+    state = AlertState()
+
+    assert run(state, [drop()], 0, sent=False) == ['new']
+    assert run(state, [drop()], 1) == ['new']
+    assert run(state, [drop()], 2) == []
+
+
+def test_warning_escalates_after_staying_open():
+    state = AlertState()
+
+    assert run(state, [drop()], 0) == ['new']
+    assert run(state, [drop()], ESCALATE_AFTER_HOURS - 1) == []
+    assert run(state, [drop()], ESCALATE_AFTER_HOURS) == ['escalated']
+
+    alert = state.alerts[drop()['fingerprint']]
+    assert alert['level'] == 'CRITICAL' and alert['escalated']
+    assert state.open_alerts('CRITICAL') == [alert]
+    # Now on the CRITICAL cooldown
+    assert run(state, [drop()], ESCALATE_AFTER_HOURS + COOLDOWN_HOURS['CRITICAL']) == ['reminder']
+
+
+def test_escalation_can_be_turned_off(monkeypatch):
+    monkeypatch.setattr(alert_engine, 'ESCALATE_AFTER_HOURS', 0)
+    state = AlertState()
+
+    assert run(state, [drop()], 0) == ['new']
+    assert run(state, [drop()], 24 * 7) == ['reminder']
+    assert state.alerts[drop()['fingerprint']]['level'] == 'WARNING'
+
+
+def test_drops_alert_below_the_critical_threshold_unless_warnings_are_enabled(monkeypatch):
+    metrics = pd.DataFrame({'anomaly_type': ['drop', 'drop', 'spike'], 'change_pct': [-25.0, -12.0, 80.0],
+                            'expected': [100.0, 100.0, 100.0], 'current': [75.0, 88.0, 180.0]},
+                           index=['youtube:UC1', 'youtube:UC2', 'youtube:UC3'])
+
+    def drops():
+        conditions = evaluate_rules(metrics, {}, {}, {}, {}, now=T0)
+        return [(c['subject'], c['level']) for c in conditions if c['rule'] == 'subscriber_drop']
+
+    assert drops() == [('youtube:UC1', 'CRITICAL')]
+    monkeypatch.setattr(alert_engine, 'WARNING_DROP_PCT', -10)
+    assert drops() == [('youtube:UC1', 'CRITICAL'), ('youtube:UC2', 'WARNING')]
+    monkeypatch.setattr(alert_engine, 'WARNING_DROP_PCT', -15)
+    assert drops() == [('youtube:UC1', 'CRITICAL')]
+
+
+def test_higher_level_escalates_and_lower_level_does_not_downgrade():
+    state = AlertState()
+
+    assert run(state, [drop('WARNING')], 0) == ['new']
+    assert run(state, [drop('CRITICAL', 30.0)], 1) == ['escalated']
+    assert run(state, [drop('WARNING')], 2) == []
+
+    alert = state.alerts[drop()['fingerprint']]
+    assert alert['level'] == 'CRITICAL' and not alert['escalated']
+    assert alert['message'] == 'lost 12.0%'
+
+
+def test_resolved_alert_reopens_and_is_forgotten_later():
+    state = AlertState()
+    key = drop()['fingerprint']
+
+    run(state, [drop()], 0)
+    assert run(state, [], 1) == ['resolved']
+    assert state.alerts[key]['status'] == 'resolved'
+    assert run(state, [], 2) == []
+
+    # Firing again opens a new alert with a fresh escalation clock
+    assert run(state, [drop()], 3) == ['new']
+    assert state.alerts[key]['first_seen'] == (T0 + timedelta(hours=3)).isoformat()
+
+    run(state, [], 4)
+    run(state, [], 4 + KEEP_RESOLVED_DAYS * 24)
+    assert key in state.alerts
+    run(state, [], 5 + KEEP_RESOLVED_DAYS * 24)
+    assert key not in state.alerts
+
+
+def test_state_round_trips_through_disk(tmp_path):
+    path = str(tmp_path / 'alert_state.json')
+    state = AlertState()
+    run(state, [drop()], 0)
+    state.save(path)
+
+    loaded = AlertState.load(path)
+    assert loaded.alerts == state.alerts
+    assert run(loaded, [drop()], 1) == []
+
+
+def test_failed_sink_catches_up_without_resending_to_the_others():
+    state = AlertState()
+    now = T0
+    notifications = state.update([drop()], now=now)
+    batches = {sink: state.outbox(sink, notifications) for sink in ['file', 'discord']}
+    state.mark_delivered(notifications, batches, failed=['discord'], now=now)
+
+    # The file sink took it: the cooldown runs, and only Discord has it pending
+    alert = state.alerts[drop()['fingerprint']]
+    assert alert['sent_count'] == 1 and set(alert['delivered']) == {'file'}
+    assert run(state, [drop()], 1, sent=False) == []
+    assert state.outbox('file', []) == []
+    assert [n['event'] for n in state.outbox('discord', [])] == ['new']
+
+    later = T0 + timedelta(hours=1)
+    batches = {sink: state.outbox(sink, []) for sink in ['file', 'discord']}
+    state.mark_delivered([], batches, failed=[], now=later)
+    assert state.pending == {}
+    assert alert['delivered'] == {'file': T0.isoformat(), 'discord': later.isoformat()}
+    assert alert['sent_count'] == 1
+
+
+def test_pending_batches_keep_the_latest_event_per_alert():
+    state = AlertState()
+    notifications = state.update([drop()], now=T0)
+    state.mark_delivered(notifications, {'file': notifications, 'slack': notifications}, failed=['slack'], now=T0)
+
+    # Resolved before Slack came back: it gets the resolution only
+    resolved = state.update([], now=T0 + timedelta(hours=1))
+    assert [n['event'] for n in state.outbox('slack', resolved)] == ['resolved']
+
+    # A sink that is no longer configured drops what it had pending
+    state.mark_delivered(resolved, {'file': state.outbox('file', resolved)}, failed=[])
+    assert state.pending == {}
@@ -0,0 +1,102 @@
+"""Uploads catalog sync against the fake Data API: page-token resume and ETag revalidation"""
+
+import asyncio
+
+import pytest
+
+import collect_youtube_data
+from collect_youtube_data import QuotaMeter, sync_uploads_async, refresh_catalog_async
+from http_client import AsyncHTTPClient
+from video_store import VideoStore
+
+CHANNEL_ID = 'UCstub000000000000000000'
+PLAYLIST_ID = 'UUstub000000000000000000'
+
+
+@pytest.fixture
+def store(workdir):
+    store = VideoStore()
+    yield store
+    store.close()
+
+
+def call(function, *args, **kwargs):
+    async def run():
+        async with AsyncHTTPClient(max_concurrency=4, timeout=5) as client:
+            return await function(client, QuotaMeter(), *args, **kwargs)
+    return asyncio.run(run())
+
+
+def sync(store):
+    return call(sync_uploads_async, store, CHANNEL_ID, PLAYLIST_ID)
+
+
+def test_first_sync_resumes_from_its_page_token(store, youtube_api, monkeypatch):
+    monkeypatch.setattr(collect_youtube_data, 'CATALOG_PAGES_PER_RUN', 2)
+    api = youtube_api(channel_count=1, videos_per_channel=130)
+
+    # Out of pages after 100 of 130 uploads: the backlog is not new uploads
+    assert sync(store) == (100, [])
+    state = store.catalog_state(CHANNEL_ID)
+    assert (state['complete'], state['page_token']) == (0, 'page100')
+
+    # The unchanged head costs a 304, then the sync continues where it stopped
+    assert sync(store) == (30, [])
+    state = store.catalog_state(CHANNEL_ID)
+    assert (state['complete'], state['page_token']) == (1, None)
+    assert api.not_modified == 1
+    assert store.catalog_ids(CHANNEL_ID) == set(api.playlists[PLAYLIST_ID])
+    tokens = [params.get('pageToken') for _, method, params in api.calls if method == 'playlistItems']
+    assert tokens == [None, 'page50', None, 'page100']
+
+
+def test_new_uploads_are_found_at_the_head(store, youtube_api):
+    api = youtube_api(channel_count=1, videos_per_channel=60)
+    sync(store)
+    calls = len(api.calls)
+
+    assert sync(store) == (0, [])
+    assert api.not_modified == 1
+    assert len(api.calls) == calls + 1
+
+    uploads = [api.upload(CHANNEL_ID), api.upload(CHANNEL_ID)]
+    added, new = sync(store)
+    assert added == 2
+    assert sorted(new) == sorted(uploads)
+    assert store.catalog_ids(CHANNEL_ID) == set(api.playlists[PLAYLIST_ID])
+
+
+def test_unchanged_batches_are_not_modified(store, youtube_api):
+    api = youtube_api(channel_count=1, videos_per_channel=120)
+    sync(store)
+
+    refreshed, not_modified = call(refresh_catalog_async, store)
+    assert (len(refreshed), not_modified) == (120, 0)
+    assert all(not stale for *_, stale in store.catalog_batches())
+
+    refreshed, not_modified = call(refresh_catalog_async, store)
+    assert (refreshed, not_modified) == ([], 3)
+
+    # Views on one video change only its batch's ETag
+    batches = store.catalog_batches()
+    video_id = batches[1][1][7]
+    api.add_views(video_id, 1000)
+    refreshed, not_modified = call(refresh_catalog_async, store)
+    assert not_modified == 2
+    assert [video['video_id'] for video in refreshed] == batches[1][1]
+    views = {video['video_id']: video['views'] for video in refreshed}
+    assert views[video_id] == int(api.videos[video_id]['statistics']['viewCount'])
+
+
+def test_refresh_budget_prefers_new_uploads(store, youtube_api):
+    api = youtube_api(channel_count=1, videos_per_channel=200)
+    sync(store)
+    call(refresh_catalog_async, store)
+
+    upload = api.upload(CHANNEL_ID)
+    _, new = sync(store)
+    assert new == [upload]
+
+    # The upload sits in a fresh fifth batch, refreshed before the older, up-to-date ones
+    refreshed, _ = call(refresh_catalog_async, store, uploads=new, budget=1)
+    assert [video['video_id'] for video in refreshed] == [upload]
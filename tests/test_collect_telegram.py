@@ -0,0 +1,85 @@
+"""Concurrent Telegram collection against the fake Bot API"""
+
+import asyncio
+import threading
+
+from collect_telegram_data import collect_all_async
+from http_client import AsyncHTTPClient
+
+CHANNELS = {
+    '@alpha': {'name': 'Alpha', 'chat': '@alpha_chat'},
+    '@beta': {'name': 'Beta', 'chat': None},
+    '@gamma': {'name': 'Gamma', 'chat': None},
+    '@missing': {'name': 'Missing', 'chat': None}
+}
+
+
+def add_chats(api):
+    for n, username in enumerate(['@alpha', '@beta', '@gamma']):
+        api.chats[username] = {'id': -1000 - n, 'title': username[1:].title(), 'type': 'channel',
+                               'member_count': 100 * (n + 1), 'bot_status': 'administrator'}
+    api.chats['@alpha_chat'] = {'id': -2000, 'title': 'Alpha chat', 'type': 'supergroup',
+                                'member_count': 42, 'bot_status': 'member'}
+
+
+def track_in_flight(api):
+    """Record the peak number of calls the server handles at once"""
+    handle, lock = api.handle, threading.Lock()
+    state = {'now': 0, 'peak': 0}
+
+    def tracked(*args, **kwargs):
+        with lock:
+            state['now'] += 1
+            state['peak'] = max(state['peak'], state['now'])
+        try:
+            return handle(*args, **kwargs)
+        finally:
+            with lock:
+                state['now'] -= 1
+
+    api.handle = tracked
+    return state
+
+
+def collect(channels, **client_options):
+    async def run():
+        async with AsyncHTTPClient(**client_options) as client:
+            return await collect_all_async(channels, client), client
+    return asyncio.run(run())
+
+
+def test_collects_every_channel_concurrently(bot_api):
+    add_chats(bot_api)
+    bot_api.latency = 0.05
+    in_flight = track_in_flight(bot_api)
+
+    results, client = collect(CHANNELS, max_concurrency=4)
+    by_name = {result['username']: result for result in results}
+
+    assert [result['username'] for result in results] == list(CHANNELS)
+    assert by_name['@alpha']['subscribers'] == 100
+    assert by_name['@beta']['subscribers'] == 200
+    assert by_name['@gamma']['subscribers'] == 300
+    assert by_name['@alpha']['bot_is_admin'] is True
+    assert by_name['@alpha']['chat_data'] == {'chat_exists': True, 'chat_title': 'Alpha chat',
+                                              'chat_type': 'supergroup', 'chat_members': 42}
+    assert by_name['@missing']['error'] == 'Bot cannot access channel'
+    # 3 calls per channel plus 2 for the discussion chat
+    assert client.requests_made == 3 * len(CHANNELS) + 2
+    # The calls overlapped, up to the client's concurrency limit
+    assert 1 < in_flight['peak'] <= 4
+
+
+def test_rate_limited_calls_are_retried(bot_api):
+    add_chats(bot_api)
+    bot_api.rate_limit_every = 3
+    bot_api.retry_after = 0
+
+    results, client = collect(CHANNELS, max_concurrency=4)
+    by_name = {result['username']: result for result in results}
+
+    assert client.retries > 0
+    # Every 429 was followed by one more request for the same call
+    assert len(bot_api.calls) == client.requests_made == 3 * len(CHANNELS) + 2 + client.retries
+    assert [by_name[username]['subscribers'] for username in ('@alpha', '@beta', '@gamma')] == [100, 200, 300]
+    assert by_name['@alpha']['chat_data']['chat_members'] == 42
@@ -0,0 +1,56 @@
+"""Batched YouTube collection against the fake Data API"""
+
+import asyncio
+import json
+
+from collect_youtube_data import collect_batched_async, CHANNEL_ID_CACHE
+
+
+def collect(channels):
+    results, videos, quota = asyncio.run(collect_batched_async(channels))
+    return {result['handle']: result for result in results}, videos, quota
+
+
+def methods(api, since=0):
+    return [method + ('/forHandle' if 'forHandle' in params else '') for _, method, params in api.calls[since:]]
+
+
+def test_batches_stay_within_the_id_limit(workdir, youtube_api):
+    api = youtube_api(channel_count=120, videos_per_channel=3)
+
+    results, videos, quota = collect(api.channel_map())
+
+    assert len(results) == 120
+    assert results['stub_channel_007']['subscribers'] == 149
+    assert results['stub_channel_007']['channel_id'] == 'UCstub000000000000000007'
+    # 120 channels in three channels.list calls; the fake rejects more than 50 ids
+    stats_calls = [params for _, method, params in api.calls if method == 'channels' and 'id' in params]
+    assert sorted(len(params['id'].split(',')) for params in stats_calls) == [20, 50, 50]
+    assert len(videos) == 120 * 3
+
+
+def test_handles_are_resolved_once(workdir, youtube_api):
+    api = youtube_api(channel_count=60, videos_per_channel=2)
+    channels = api.channel_map()
+
+    collect(channels)
+    assert methods(api).count('channels/forHandle') == 60
+    with open(CHANNEL_ID_CACHE, 'r', encoding='utf-8') as f:
+        assert json.load(f)['stub_channel_059'] == 'UCstub000000000000000059'
+
+    before = len(api.calls)
+    results, _, quota = collect(channels)
+    assert len(results) == 60
+    assert 'channels/forHandle' not in methods(api, before)
+    assert 'search' not in methods(api, before)
+    assert 'search' not in quota.calls
+
+
+def test_quota_matches_the_server(workdir, youtube_api):
+    api = youtube_api(channel_count=55, videos_per_channel=2)
+
+    _, _, quota = collect(api.channel_map())
+
+    assert quota.units == api.quota_used
+    assert sum(quota.calls.values()) == len(api.calls)
+    assert quota.calls['channels'] == 55 + 2
@@ -0,0 +1,164 @@
+"""Rollup maintenance at ingest: chunked updates, replays and retention"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+
+import rollups
+from history_store import HistoryStore, load_history
+from rollups import PERIODS, RollupStore, aggregate, with_deltas, update_rollups, prune
+
+START = pd.Timestamp('2026-01-05')  # a Monday
+DAYS = 60
+
+
+def history():
+    """Three channels every two hours for DAYS days"""
+    rng = np.random.default_rng(7)
+    timestamps = pd.date_range(START, periods=DAYS * 12, freq='2h')
+    frames = [pd.DataFrame({
+        'timestamp': timestamps,
+        'username': username,
+        'title': username.title(),
+        'subscribers': 1000 * (n + 1) + rng.integers(-3, 10, len(timestamps)).cumsum()
+    }) for n, username in enumerate(['@alpha', '@beta', '@gamma'])]
+    return pd.concat(frames).sort_values('timestamp', kind='stable').reset_index(drop=True)
+
+
+def ingest(rows):
+    HistoryStore('telegram').append(rows)
+    update_rollups('telegram', rows)
+
+
+def chunks(df, sizes):
+    """Split rows at uneven boundaries, so buckets and month partitions span several chunks"""
+    start = 0
+    for size in sizes:
+        yield df.iloc[start:start + size]
+        start += size
+    if start < len(df):
+        yield df.iloc[start:]
+
+
+def stored(period):
+    df = RollupStore('telegram', period).load()
+    return df.sort_values(['username', 'timestamp'], kind='stable').reset_index(drop=True)
+
+
+def expected(df, period):
+    return with_deltas(aggregate(df, 'telegram', period))
+
+
+def assert_rollups_match(df, periods=PERIODS):
+    for period in periods:
+        pdt.assert_frame_equal(stored(period), expected(df, period), check_dtype=False)
+
+
+def test_chunked_ingest_matches_a_rebuild(workdir):
+    df = history()
+    for chunk in chunks(df, [5, 97, 400, 1, 333, 777]):
+        ingest(chunk)
+
+    assert_rollups_match(df)
+
+
+def test_replayed_rows_leave_the_rollups_unchanged(workdir):
+    df = history()
+    for chunk in chunks(df, [1000, 500]):
+        ingest(chunk)
+    last = df.iloc[1500:]
+
+    update_rollups('telegram', last)
+    update_rollups('telegram', last.iloc[::3])
+
+    assert_rollups_match(df)
+
+
+def test_prune_keeps_rollups_of_partially_dropped_buckets(workdir, monkeypatch):
+    monkeypatch.setitem(rollups.RETENTION_DAYS, 'raw', 20)
+    df = history()
+    ingest(df)
+    now = df['timestamp'].max()
+
+    prune('telegram', now=now)
+
+    cutoff = now - pd.Timedelta(days=20)
+    assert HistoryStore('telegram').load()['timestamp'].min() >= cutoff
+    assert_rollups_match(df)
+
+    # Replaying rows of the bucket the cutoff falls in recomputes it from the raw rows left;
+    # the stored rows, which saw the dropped ones, must win
+    partial = df[(df['timestamp'] >= cutoff) & (df['timestamp'] < cutoff + pd.Timedelta(days=2))]
+    update_rollups('telegram', partial)
+    assert_rollups_match(df)
+
+
+def test_pruned_ranges_are_served_from_rollups(workdir, monkeypatch):
+    monkeypatch.setitem(rollups.RETENTION_DAYS, 'raw', 20)
+    df = history()
+    ingest(df)
+    prune('telegram', now=df['timestamp'].max())
+
+    # One row per two hours: every hourly bucket closes on the raw row it held
+    loaded = load_history('telegram', start=START, columns=['username', 'subscribers'])
+    loaded = loaded.sort_values(['timestamp', 'username'], kind='stable').reset_index(drop=True)
+    original = df[['timestamp', 'username', 'subscribers']].sort_values(['timestamp', 'username'], kind='stable')
+    pdt.assert_frame_equal(loaded, original.reset_index(drop=True), check_dtype=False)
+
+
+def test_ingest_prunes_once_a_day_past_retention(workdir, monkeypatch):
+    monkeypatch.setitem(rollups.RETENTION_DAYS, 'raw', 20)
+    df = history()
+    first = df[df['timestamp'] < START + pd.Timedelta(days=21)]
+    ingest(first)
+    # Within the slack: the oldest rows stay until they are a day past the window
+    assert HistoryStore('telegram').load()['timestamp'].min() == START
+
+    ingest(df[len(first):])
+    cutoff = df['timestamp'].max() - pd.Timedelta(days=20)
+    assert HistoryStore('telegram').load()['timestamp'].min() >= cutoff
+    assert_rollups_match(df)
+
+
+def mtimes():
+    return {(period, key): os.path.getmtime(path) for period in PERIODS
+            for key, path in RollupStore('telegram', period).store.partitions()}
+
+
+def test_hourly_ingest_rewrites_only_the_touched_partitions(workdir):
+    df = history()
+    cut = len(df) - 3
+    ingest(df.iloc[:cut])
+    store = RollupStore('telegram', 'hour').store
+    assert [key for key, _ in store.partitions()][:2] == ['2026-01-05', '2026-01-06']
+    before = mtimes()
+
+    ingest(df.iloc[cut:])
+    # The last rows move one day of hour rollups and the current month of day and week rollups
+    last = df['timestamp'].max()
+    rewritten = {partition for partition, mtime in mtimes().items() if mtime != before[partition]}
+    assert rewritten == {('hour', last.strftime('%Y-%m-%d')), ('day', last.strftime('%Y-%m')),
+                         ('week', last.strftime('%Y-%m'))}
+
+    before = mtimes()
+    update_rollups('telegram', df.iloc[cut:])
+    assert mtimes() == before
+    assert_rollups_match(df)
+
+
+def test_month_partitioned_hour_rollups_are_split(workdir):
+    df = history()
+    ingest(df.iloc[:-3])
+    # Hour rollups written before they were partitioned by day
+    store = RollupStore('telegram', 'hour').store
+    hours = store.load()
+    for _, path in store.partitions():
+        os.remove(path)
+    for key, part in hours.groupby(hours['timestamp'].dt.strftime('%Y-%m')):
+        store.write_partition(key, part)
+
+    ingest(df.iloc[-3:])
+    assert all(len(key) == len('YYYY-MM-DD') for key, _ in store.partitions())
+    assert_rollups_match(df)
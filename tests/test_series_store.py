@@ -0,0 +1,58 @@
+"""Series files kept current at ingest; sync only catches up on files that are missing or behind"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import history_store
+from collect_telegram_data import append_history
+from history_store import HistoryStore
+from series_store import SeriesStore
+
+START = pd.Timestamp('2026-02-01')
+
+
+def rows(hours, subscribers=100):
+    return pd.DataFrame({
+        'timestamp': [START + pd.Timedelta(hours=h) for h in hours for _ in range(2)],
+        'username': ['@alpha', '@beta'] * len(hours),
+        'name': ['Alpha', 'Beta'] * len(hours),
+        'subscribers': [subscribers + h for h in hours for _ in range(2)]
+    })
+
+
+def stored(store):
+    df = store.to_frame()
+    return df.sort_values(['timestamp', 'username'], kind='stable').reset_index(drop=True)
+
+
+def test_ingest_appends_without_reading_history(workdir, monkeypatch):
+    append_history(rows(range(3)))
+    # No files yet: nothing to keep current, the first sync builds them from the history
+    store = SeriesStore('telegram')
+    assert not store.exists()
+    assert store.sync() == 6
+
+    with monkeypatch.context() as patch:
+        patch.setattr(history_store, 'load_history', lambda *args, **kwargs: pytest.fail('history parsed'))
+        append_history(rows(range(3, 5)))
+        assert SeriesStore('telegram').sync() == 0
+
+    df = stored(SeriesStore('telegram'))
+    assert len(df) == 10
+    assert list(df['subscribers'][-2:]) == [104, 104]
+
+
+def test_files_behind_the_history_catch_up_before_appending(workdir):
+    append_history(rows(range(2)))
+    SeriesStore('telegram').sync()
+    # Rows written by a job that didn't have the files
+    HistoryStore('telegram').append(rows(range(2, 4)))
+
+    append_history(rows(range(4, 6)))
+
+    df = stored(SeriesStore('telegram'))
+    expected = rows(range(6))
+    np.testing.assert_array_equal(df['timestamp'], expected['timestamp'])
+    np.testing.assert_array_equal(df['subscribers'], expected['subscribers'])
+    assert SeriesStore('telegram').meta['sorted']
@@ -0,0 +1,91 @@
+"""Reference records for unchanged snapshots and their resolution on read"""
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+import snapshot_archive
+from snapshot_archive import (write_snapshot, load_snapshot, iter_snapshots, snapshot_at, snapshots_at,
+                              snapshot_head, compact, is_reference, snapshot_key)
+
+T0 = datetime(2026, 2, 1, 10, 0)
+
+
+def payload(at, subscribers):
+    stamp = at.isoformat()
+    return {
+        'generated_at': stamp,
+        'channels': [{'channel_id': 'UC1', 'subscribers': subscribers, 'timestamp': stamp},
+                     {'channel_id': 'UC2', 'subscribers': 50, 'timestamp': stamp}]
+    }
+
+
+def write(hours, subscribers):
+    at = T0 + timedelta(hours=hours)
+    write_snapshot('youtube', payload(at, subscribers), timestamp=at)
+    return snapshot_key(at)
+
+
+@pytest.fixture(params=['files', 'archive'])
+def mode(request, workdir, monkeypatch):
+    os.makedirs('data')
+    monkeypatch.setattr(snapshot_archive, 'SNAPSHOT_MODE', request.param)
+    return request.param
+
+
+def test_unchanged_snapshot_is_stored_as_a_reference(mode):
+    first = write(0, 100)
+    second = write(1, 100)
+
+    raw = load_snapshot('youtube', second, resolved=False)
+    assert is_reference(raw)
+    assert raw['same_as'] == first
+    assert raw['generated_at'] == (T0 + timedelta(hours=1)).isoformat()
+    assert 'channels' not in raw
+    # The head is still the full snapshot the reference points at
+    assert snapshot_head('youtube')[0] == first
+
+
+def test_readers_resolve_references_to_restamped_payloads(mode):
+    keys = [write(0, 100), write(1, 100), write(2, 100), write(3, 120), write(4, 120)]
+    expected = [payload(T0 + timedelta(hours=h), subscribers)
+                for h, subscribers in [(0, 100), (1, 100), (2, 100), (3, 120), (4, 120)]]
+
+    assert [load_snapshot('youtube', key) for key in keys] == expected
+    assert list(iter_snapshots('youtube')) == list(zip(keys, expected))
+    assert list(iter_snapshots('youtube', start=keys[2])) == list(zip(keys[2:], expected[2:]))
+    assert snapshot_at('youtube', T0 + timedelta(hours=2, minutes=30)) == (keys[2], expected[2])
+    assert snapshot_at('youtube', T0 - timedelta(minutes=1)) is None
+
+    times = [T0 + timedelta(minutes=m) for m in (-5, 30, 90, 150, 250)]
+    assert list(snapshots_at('youtube', times)) == [None, expected[0], expected[1], expected[2], expected[4]]
+
+
+def test_changed_snapshot_is_stored_in_full(mode):
+    write(0, 100)
+    write(1, 100)
+    changed = write(2, 101)
+    back = write(3, 100)
+
+    assert not is_reference(load_snapshot('youtube', changed, resolved=False))
+    # Only the last full snapshot is compared, so returning to older content is stored in full too
+    assert not is_reference(load_snapshot('youtube', back, resolved=False))
+    assert snapshot_head('youtube')[0] == back
+
+
+def test_references_to_loose_files_resolve_from_the_archive(workdir, monkeypatch):
+    os.makedirs('data')
+    monkeypatch.setattr(snapshot_archive, 'SNAPSHOT_MODE', 'files')
+    first = write(0, 100)
+    monkeypatch.setattr(snapshot_archive, 'SNAPSHOT_MODE', 'archive')
+    second = write(1, 100)
+    assert load_snapshot('youtube', second, resolved=False)['same_as'] == first
+
+    expected = [payload(T0, 100), payload(T0 + timedelta(hours=1), 100)]
+    assert [p for _, p in iter_snapshots('youtube')] == expected
+
+    # Packing the loose file keeps the reference resolvable
+    compact(delete=True)
+    assert not os.path.exists(f"data/youtube_{first}.json")
+    assert [p for _, p in iter_snapshots('youtube')] == expected
@@ -0,0 +1,129 @@
+"""getUpdates ingestion against the fake Bot API: checkpoints and replayed updates"""
+
+import asyncio
+
+import pytest
+
+import telegram_updates
+from history_store import HistoryStore
+from http_client import AsyncHTTPClient
+from telegram_updates import UpdatesListener, EVENTS_SOURCE, load_checkpoint, load_events
+
+CHANNELS = {'@alpha': {'name': 'Alpha', 'chat': '@alpha_chat'}}
+CHECKPOINT = 'data/telegram_updates.json'
+
+
+@pytest.fixture
+def api(bot_api, workdir):
+    bot_api.chats.update({
+        '@alpha': {'id': -100, 'title': 'Alpha', 'type': 'channel', 'member_count': 500},
+        '@alpha_chat': {'id': -200, 'title': 'Alpha chat', 'type': 'supergroup', 'member_count': 40},
+        '@other': {'id': -300, 'title': 'Other', 'type': 'supergroup', 'member_count': 9}
+    })
+    return bot_api
+
+
+def activity(api):
+    post = api.post('@alpha', 'Hello')
+    api.edit_post('@alpha', post['channel_post']['message_id'])
+    api.member_change('@alpha', joined=True)
+    api.member_change('@alpha', joined=True)
+    api.chat_message('@alpha_chat')
+    # Not a tracked discussion chat: advances the offset but stores nothing
+    return api.chat_message('@other')
+
+
+async def with_listener(action):
+    async with AsyncHTTPClient(max_concurrency=2, timeout=5) as client:
+        listener = UpdatesListener(client, channels=CHANNELS, poll_timeout=0, checkpoint_path=CHECKPOINT)
+        await action(listener)
+    return listener
+
+
+def drain():
+    return asyncio.run(with_listener(lambda listener: listener.run(drain=True)))
+
+
+def test_drain_stores_events_and_checkpoints_the_offset(api):
+    last = activity(api)
+
+    listener = drain()
+
+    events = load_events()
+    assert list(events['kind']) == ['post', 'post_edit', 'member', 'member', 'chat_message']
+    assert set(events['username']) == {'@alpha'}
+    assert events['member_delta'].sum() == 2
+    assert load_checkpoint(CHECKPOINT)['offset'] == last['update_id'] + 1
+    assert load_checkpoint(CHECKPOINT)['events'] == 5
+    assert listener.offset == last['update_id'] + 1
+
+    # One member count per channel whose membership moved, appended to the channel history
+    history = HistoryStore('telegram').load()
+    assert list(history['username']) == ['@alpha']
+    assert list(history['subscribers']) == [502]
+    assert [method for _, method, _ in api.calls].count('getChatMemberCount') == 1
+
+    # The last poll confirmed everything, so nothing comes back
+    drain()
+    assert len(HistoryStore(EVENTS_SOURCE).load()) == 5
+    assert load_checkpoint(CHECKPOINT)['events'] == 5
+
+
+def test_drain_resumes_from_the_checkpoint(api):
+    activity(api)
+    drain()
+    api.post('@alpha', 'Second')
+
+    drain()
+
+    events = load_events()
+    assert list(events['kind']) == ['post', 'post_edit', 'member', 'member', 'chat_message', 'post']
+    assert load_checkpoint(CHECKPOINT)['events'] == 6
+
+
+def test_replayed_updates_are_read_once(api, monkeypatch):
+    activity(api)
+
+    async def crash_before_checkpoint(listener):
+        # Events reach the store, then the process dies before the offset is saved or confirmed
+        listener.ingest(await listener.poll(0))
+        await listener.flush()
+
+    def fail(*args, **kwargs):
+        raise OSError('disk full')
+
+    with monkeypatch.context() as patch, pytest.raises(OSError):
+        patch.setattr(telegram_updates, 'save_checkpoint', fail)
+        asyncio.run(with_listener(crash_before_checkpoint))
+
+    assert load_checkpoint(CHECKPOINT)['offset'] == 0
+    drain()
+
+    # Delivered twice, stored twice, read once
+    stored = HistoryStore(EVENTS_SOURCE).load()
+    assert len(stored) == 10
+    events = load_events()
+    assert len(events) == 5
+    assert events['update_id'].is_unique
+    assert list(events['kind']) == ['post', 'post_edit', 'member', 'member', 'chat_message']
+
+
+def test_flush_waits_for_the_shared_write_lock(api):
+    activity(api)
+
+    async def scenario():
+        lock = asyncio.Lock()
+        async with AsyncHTTPClient(max_concurrency=2, timeout=5) as client:
+            listener = UpdatesListener(client, channels=CHANNELS, poll_timeout=0, checkpoint_path=CHECKPOINT,
+                                       write_lock=lock)
+            # Another writer (a collector save in the daemon) holds the stores
+            async with lock:
+                task = asyncio.create_task(listener.run(drain=True))
+                await asyncio.sleep(0.5)
+                assert not task.done()
+                assert not HistoryStore(EVENTS_SOURCE).exists()
+            await task
+
+    asyncio.run(scenario())
+    assert len(load_events()) == 5
+    assert load_checkpoint(CHECKPOINT)['events'] == 5
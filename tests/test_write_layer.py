@@ -0,0 +1,29 @@
+"""Content-hashed writes: only the top-level generation time is volatile"""
+
+import json
+import os
+
+from write_layer import write_json
+
+
+def dashboard(generated_at, updated_at):
+    return {'generated_at': generated_at,
+            'channels': [{'channel_id': 'UC1', 'subscribers': 100, 'timestamp': updated_at}]}
+
+
+def test_generation_time_alone_skips_the_write(workdir):
+    assert write_json('data/dashboard.json', dashboard('2026-02-01T10:00:00', '2026-02-01T09:00:00'))
+    mtime = os.path.getmtime('data/dashboard.json')
+
+    assert not write_json('data/dashboard.json', dashboard('2026-02-01T11:00:00', '2026-02-01T09:00:00'))
+    assert os.path.getmtime('data/dashboard.json') == mtime
+
+
+def test_nested_timestamp_change_is_written(workdir):
+    write_json('data/dashboard.json', dashboard('2026-02-01T10:00:00', '2026-02-01T09:00:00'))
+
+    assert write_json('data/dashboard.json', dashboard('2026-02-01T11:00:00', '2026-02-01T10:00:00'))
+    with open('data/dashboard.json', encoding='utf-8') as f:
+        stored = json.load(f)
+    assert stored['generated_at'] == '2026-02-01T11:00:00'
+    assert stored['channels'][0]['timestamp'] == '2026-02-01T10:00:00'